@@ -0,0 +1,18 @@
+# Generated by Django 3.0.4 on 2026-10-18 15:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='view_cost_budget',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
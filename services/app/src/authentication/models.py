@@ -104,6 +104,11 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     # similar as a separate field.
     primary_email = models.EmailField(unique=True)
 
+    # Upper bound on the planner's estimated total cost of a materialized view
+    # query, checked with 'EXPLAIN' before the view is created. Falls back to
+    # VIEWS_MAX_ESTIMATED_COST if unset. See 'views/views.py'.
+    view_cost_budget = models.FloatField(null=True, blank=True)
+
     # Default permission levels.
     is_staff = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
@@ -13,6 +13,8 @@ from psycopg2 import sql
 
 from core import app_logging
 from core import utils as core_utils
+from jobs import diffs as job_diffs
+from jobs import models as jobs_models
 from views import models as view_models
 from channels_app import models
 from channels_app import views
@@ -75,16 +77,45 @@ def broker_proc():
                         job_id=job_id
                     )
 
+                    # Refreshes of diff jobs record the rows they changed, and
+                    # the refresh event records which diff that is. Only that
+                    # diff is sent, so that jobs sharing a view never send
+                    # each other's diffs. See 'jobs/diffs.py'.
+                    refresh_diffs = list(
+                        jobs_models.RefreshDiff.objects.filter(
+                            id=payload.get('refresh_diff_id'),
+                            status=jobs_models.EnumStatusTypes.NEW
+                        )
+                    )
+                    event_payloads = [
+                        {
+                            'update_available': 'true',
+                            'view_name': view_name,
+                            **job_diffs.diff_payload(refresh_diff)
+                        }
+                        for refresh_diff
+                        in refresh_diffs
+                    ] or [
+                        {
+                            'update_available': 'true',
+                            'view_name': view_name
+                        }
+                    ]
+
                     for channel in channels:
                         logger.info(
                             'Sending update to channel UUID: ',
                             channel.public_identifier
                         )
-                        django_eventstream.send_event(
-                            str(channel.public_identifier),
-                            'message',
-                            {
-                                'update_available': 'true',
-                                'view_name': view_name
-                            }
-                        )
+                        for event_payload in event_payloads:
+                            django_eventstream.send_event(
+                                str(channel.public_identifier),
+                                'message',
+                                event_payload
+                            )
+
+                    jobs_models.RefreshDiff.objects.filter(
+                        id__in=[refresh_diff.id for refresh_diff in refresh_diffs]
+                    ).update(
+                        status=jobs_models.EnumStatusTypes.SENT
+                    )
@@ -0,0 +1,49 @@
+-- Refresh a view, record the refresh event, and notify subscribed channels, as
+-- the single 'cron.schedule' entry of a job. See 'jobs/views.py'.
+--
+-- The refresh statement is generated per job by 'jobs/utils.py'
+-- refresh_statement_sql(), and passed in as text. It sets 'last_refreshed' of
+-- the view whenever it actually refreshes, and leaves it untouched when the
+-- refresh was skipped because no source relation changed. The event is only
+-- recorded in the former case, along with the RefreshDiff the refresh
+-- recorded, if any, see 'jobs/diffs.py'.
+--
+-- Inserting the event fires the 'refreshes_channel' trigger in
+-- 'trigger_on_refresh.sql', whose 'pg_notify' is delivered when the whole
+-- procedure commits, so channels are never notified before the refresh is
+-- visible, nor of a refresh that failed.
+--
+-- TODO: Like 'trigger_on_refresh.sql', this file is sensitive to changes in
+-- the Django EventRefreshes, CronJob, and MaterializedView models.
+CREATE OR REPLACE PROCEDURE refresh_and_notify(
+    refresh_job_id INTEGER,
+    refresh_view_id INTEGER,
+    refresh_statement TEXT
+)
+AS
+$$
+DECLARE
+    refreshed_before TIMESTAMP WITH TIME ZONE;
+BEGIN
+    SELECT last_refreshed INTO refreshed_before
+        FROM views_materializedview WHERE id = refresh_view_id;
+
+    EXECUTE refresh_statement;
+
+    IF refreshed_before IS NOT DISTINCT FROM (
+        SELECT last_refreshed FROM views_materializedview WHERE id = refresh_view_id
+    ) THEN
+        RETURN;
+    END IF;
+
+    UPDATE jobs_cronjob SET last_notified = NOW() WHERE id = refresh_job_id;
+    INSERT INTO jobs_eventrefreshes (job_id, view_id, refresh_diff_id, created, status)
+        VALUES (
+            refresh_job_id,
+            refresh_view_id,
+            NULLIF(current_setting('jobs.refresh_diff_id', true), '')::INTEGER,
+            NOW(),
+            'NEW'
+        );
+END;
+$$ LANGUAGE plpgsql;
@@ -14,6 +14,14 @@ from core import app_logging
 from core import utils as core_utils
 
 
+# SQL files run at broker startup, in order. 'refresh_and_notify.sql' inserts
+# into the table 'trigger_on_refresh.sql' defines triggers on.
+STORED_PROCEDURE_FILES = (
+    'trigger_on_refresh.sql',
+    'refresh_and_notify.sql',
+)
+
+
 def is_database_synchronized(database):
     """
     This method checks to see whether all database migrations have been run.
@@ -36,8 +44,9 @@ def is_database_synchronized(database):
 
 def execute_storedproc_trigger_on_refresh():
     """
-    Calls the SQL file 'trigger_on_refresh.sql' in order to execute a PostgreSQL
-    trigger upon refresh of the underlying status table.
+    Calls the SQL files in 'STORED_PROCEDURE_FILES' in order to execute a
+    PostgreSQL trigger upon refresh of the underlying status table, and define
+    the procedure cron jobs refresh views with.
 
     NOTE: This method is separate from `apps.py` and `AppConfig().ready()`,
     since resolution for Django ticket #31658
@@ -54,22 +63,23 @@ def execute_storedproc_trigger_on_refresh():
 
     if is_database_synchronized(DEFAULT_DB_ALIAS):
         with core_utils.PostgreSQLCursor() as (psql_conn, psql_cursor):
-            stored_procedure_abspath = os.path.abspath(os.path.join(
-                'channels_app',
-                'storedprocedures',
-                'trigger_on_refresh.sql'
-            ))
+            for stored_procedure_file in STORED_PROCEDURE_FILES:
+                stored_procedure_abspath = os.path.abspath(os.path.join(
+                    'channels_app',
+                    'storedprocedures',
+                    stored_procedure_file
+                ))
 
-            logger.info(
-                f'Found stored procedure abspath: {stored_procedure_abspath}'
-            )
+                logger.info(
+                    f'Found stored procedure abspath: {stored_procedure_abspath}'
+                )
 
-            stored_procedure_fp = open(stored_procedure_abspath)
+                stored_procedure_fp = open(stored_procedure_abspath)
 
-            logger.info('Executing SQL file.')
+                logger.info('Executing SQL file.')
 
-            # Execute SQL file: https://stackoverflow.com/a/50080000
-            psql_cursor.execute(stored_procedure_fp.read())
+                # Execute SQL file: https://stackoverflow.com/a/50080000
+                psql_cursor.execute(stored_procedure_fp.read())
             psql_conn.commit()
 
-            logger.info('Successfully executed SQL file.')
+            logger.info('Successfully executed SQL files.')
@@ -33,3 +33,31 @@ def get_broker_logger():
     logger.addHandler(handler)
 
     return logger
+
+
+@functools.lru_cache
+def get_ingest_worker_logger():
+    """
+    Returns a properly formatted logger for the ingest worker custom
+    'django-admin' process.
+
+    Returns:
+        logging.Logger
+    """
+    logger = logging.getLogger('ingest_worker')
+    logger.setLevel(logging.DEBUG)
+
+    # Create formatter for log message types. Include the process ID, since
+    # several workers log to the same stdout.
+    formatter = logging.Formatter(
+        '%(asctime)s - %(name)s - %(process)d - %(levelname)s - %(message)s'
+    )
+
+    # Create handler to stream logs to stdout.
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setLevel(logging.DEBUG)
+
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+    return logger
@@ -235,6 +235,60 @@ MEDIA_ROOT = os.environ.get(
 )
 
 
+# Tables service settings.
+#
+# Upper bound on the number of connections a single parallel table ingest may
+# open at once.
+TABLES_INGEST_MAX_PARALLELISM = int(os.environ.get(
+    'TABLES_INGEST_MAX_PARALLELISM',
+    4
+))
+
+# Ingests left in phase 'LOADING' without a heartbeat for this many seconds are
+# assumed to belong to a dead worker, and are claimed again. See
+# 'tables/workers.py'.
+TABLES_INGEST_STALE_SECONDS = int(os.environ.get(
+    'TABLES_INGEST_STALE_SECONDS',
+    300
+))
+
+# Upper bound on the size of one chunk of a resumable upload, in bytes. See
+# 'tables/uploads.py'.
+TABLES_UPLOAD_MAX_CHUNK_SIZE = int(os.environ.get(
+    'TABLES_UPLOAD_MAX_CHUNK_SIZE',
+    64 * 1024 * 1024
+))
+
+# Upper bound on the number of views one pipeline refresh refreshes at once. See
+# 'jobs/pipelines.py'.
+VIEWS_PIPELINE_MAX_PARALLELISM = int(os.environ.get(
+    'VIEWS_PIPELINE_MAX_PARALLELISM',
+    4
+))
+
+# Default upper bound on the planner's estimated total cost of a materialized
+# view query, in planner cost units. Tenants may be given their own budget with
+# field 'view_cost_budget' of the CustomUser model. See 'views/views.py'.
+VIEWS_MAX_ESTIMATED_COST = float(os.environ.get(
+    'VIEWS_MAX_ESTIMATED_COST',
+    1e8
+))
+
+# Upper bound on the number of tables one batch ingest may create. See
+# 'tables/batch.py'.
+TABLES_BATCH_MAX_TABLES = int(os.environ.get(
+    'TABLES_BATCH_MAX_TABLES',
+    100
+))
+
+# Upper bound on the number of changed rows a refresh event carries inline.
+# Larger diffs are sent as a reference to fetch instead. See 'jobs/diffs.py'.
+CHANNELS_DIFF_MAX_INLINE_ROWS = int(os.environ.get(
+    'CHANNELS_DIFF_MAX_INLINE_ROWS',
+    100
+))
+
+
 GRIP_URL = os.environ.get(
     'GRIP_URL',
     'http://localhost:5561'
@@ -0,0 +1,157 @@
+"""
+Row-level diff helpers for jobs service.
+
+A refresh event alone only tells channel clients that a view changed, so every
+client re-fetches the whole view to find out what did. Diff jobs instead record
+the rows each refresh changed, keyed on the view's unique key (see
+'views/views.py'), so that clients can patch their copy:
+
+1. Right before the refresh, the key of every row of the view is snapshotted
+   into a temporary table, with an MD5 hash of the whole row rather than the
+   row itself.
+2. Right after, one full outer join of the refreshed view against the snapshot
+   on the key finds inserted rows (no old key), deleted rows (no new row), and
+   updated rows (hashes differ). Only changed rows are stored, in the
+   RefreshDiff model, and deleted rows only by their key. Refreshes that
+   changed nothing store nothing. The ID of the stored diff is kept in the
+   transaction-local setting REFRESH_DIFF_SETTING_NAME, from which the refresh
+   event of the same transaction records it.
+3. When the refresh event fires, the broker sends the diff it records over the
+   job's channels, inline if it holds at most CHANNELS_DIFF_MAX_INLINE_ROWS
+   rows, or else as a reference to fetch from 'jobs/diffs/<id>/'. See
+   'channels_app/broker.py'.
+
+All three statements run in the same transaction as the refresh, so a diff
+always matches the refresh it describes.
+"""
+
+from django.conf import settings
+from psycopg2 import sql
+
+from . import models
+
+
+SNAPSHOT_TABLE_NAME = 'refresh_diff_snapshot'
+
+# NOTE: Also read by procedure 'refresh_and_notify', see
+# 'channels_app/storedprocedures/refresh_and_notify.sql'.
+REFRESH_DIFF_SETTING_NAME = 'jobs.refresh_diff_id'
+
+
+def _row_key_sql(view, alias):
+    """
+    Returns an expression building the unique key of a row of a view as a
+    JSON object, so that multi-column keys compare, and hash join, as one
+    value.
+    """
+    return sql.SQL('jsonb_build_object({pairs})').format(
+        pairs=sql.SQL(', ').join(
+            sql.SQL('{column_name}, {alias}.{column}').format(
+                column_name=sql.Literal(column_name),
+                alias=sql.Identifier(alias),
+                column=sql.Identifier(column_name)
+            )
+            for column_name
+            in view.unique_key
+        )
+    )
+
+
+def diff_refresh_sql(view, refresh):
+    """
+    Returns the statements that snapshot a view, refresh it, and record the
+    RefreshDiff of the refresh, to run within one PL/pgSQL block.
+
+    Args:
+        views.models.MaterializedView: View with a unique key.
+        psycopg2.sql.Composable: Refresh statement.
+
+    Returns:
+        psycopg2.sql.Composed
+    """
+    view_relation = sql.Identifier(str(view.user_id), view.view_name)
+    snapshot = sql.Identifier(SNAPSHOT_TABLE_NAME)
+    refresh_diffs = sql.Identifier('public', models.RefreshDiff._meta.db_table)
+
+    snapshot_statement = sql.SQL(
+        'CREATE TEMPORARY TABLE {snapshot} ON COMMIT DROP AS '
+        'SELECT {row_key} AS row_key, md5(to_jsonb(v)::text) AS row_hash FROM {view_relation} v'
+    ).format(
+        snapshot=snapshot,
+        row_key=_row_key_sql(view, 'v'),
+        view_relation=view_relation
+    )
+
+    # NOTE: Every 'NOT NULL' column must be listed, since Django model
+    # defaults are not database defaults. Runs as a nested block, in order to
+    # capture the ID of the recorded diff, if any.
+    record_statement = sql.SQL(
+        'DECLARE recorded_diff_id INTEGER; BEGIN '
+        'WITH refreshed AS ('
+        'SELECT {row_key} AS row_key, to_jsonb(v) AS row_data FROM {view_relation} v'
+        '), changes AS ('
+        'SELECT a.row_data, b.row_key AS old_key FROM refreshed a FULL JOIN {snapshot} b ON b.row_key = a.row_key '
+        'WHERE a.row_key IS NULL OR b.row_key IS NULL OR md5(a.row_data::text) <> b.row_hash'
+        '), pruned AS ('
+        "DELETE FROM {refresh_diffs} WHERE view_id = {view_id} AND created < NOW() - INTERVAL '1 hour'"
+        ') INSERT INTO {refresh_diffs} (view_id, inserted, updated, deleted, created, status) '
+        'SELECT {view_id}, '
+        "COALESCE(jsonb_agg(row_data) FILTER (WHERE old_key IS NULL), '[]'), "
+        "COALESCE(jsonb_agg(row_data) FILTER (WHERE old_key IS NOT NULL AND row_data IS NOT NULL), '[]'), "
+        "COALESCE(jsonb_agg(old_key) FILTER (WHERE row_data IS NULL), '[]'), "
+        'NOW(), {status} '
+        'FROM changes HAVING count(*) > 0 '
+        'RETURNING id INTO recorded_diff_id; '
+        "PERFORM set_config({setting_name}, COALESCE(recorded_diff_id::text, ''), true); "
+        'END'
+    ).format(
+        row_key=_row_key_sql(view, 'v'),
+        view_relation=view_relation,
+        snapshot=snapshot,
+        refresh_diffs=refresh_diffs,
+        view_id=sql.Literal(view.id),
+        status=sql.Literal(str(models.EnumStatusTypes.NEW)),
+        setting_name=sql.Literal(REFRESH_DIFF_SETTING_NAME)
+    )
+
+    return sql.SQL('{snapshot}; {refresh}; {record}').format(
+        snapshot=snapshot_statement,
+        refresh=refresh,
+        record=record_statement
+    )
+
+
+def recorded_diff_id_sql():
+    """
+    Returns a query for the ID of the RefreshDiff recorded by the current
+    transaction, or NULL if it recorded none.
+    """
+    return sql.SQL(
+        "SELECT NULLIF(current_setting({setting_name}, true), '')::INTEGER"
+    ).format(
+        setting_name=sql.Literal(REFRESH_DIFF_SETTING_NAME)
+    )
+
+
+def diff_payload(refresh_diff):
+    """
+    Returns the part of a channel event describing one RefreshDiff: the
+    changed rows themselves if few enough, or else a reference to fetch them.
+    """
+    counts = {
+        'inserted': len(refresh_diff.inserted),
+        'updated': len(refresh_diff.updated),
+        'deleted': len(refresh_diff.deleted)
+    }
+    if sum(counts.values()) <= settings.CHANNELS_DIFF_MAX_INLINE_ROWS:
+        return {
+            'diff': {
+                'inserted': refresh_diff.inserted,
+                'updated': refresh_diff.updated,
+                'deleted': refresh_diff.deleted
+            }
+        }
+    return {
+        'diff_id': refresh_diff.id,
+        'diff_counts': counts
+    }
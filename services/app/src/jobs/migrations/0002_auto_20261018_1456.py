@@ -0,0 +1,35 @@
+# Generated by Django 3.0.4 on 2026-10-18 14:56
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('views', '0004_auto_20261018_1456'),
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cronjob',
+            name='pipeline',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='PipelineRun',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phase', models.CharField(choices=[('QUEUED', 'Queued by the cron job, waiting for an ingest worker'), ('RUNNING', 'Refreshing views'), ('SUCCEEDED', 'Every view refreshed, refresh event recorded'), ('FAILED', 'A refresh failed; downstream views were not refreshed')], default='QUEUED', max_length=16)),
+                ('refreshed', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=255), blank=True, default=list, size=None)),
+                ('skipped', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=255), blank=True, default=list, size=None)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='jobs.CronJob')),
+                ('view', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='views.MaterializedView')),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.0.4 on 2026-10-18 14:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0002_auto_20261018_1456'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cronjob',
+            name='last_notified',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cronjob',
+            name='skip_unchanged',
+            field=models.BooleanField(default=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.0.4 on 2026-10-18 15:01
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('views', '0005_materializedview_source_signature'),
+        ('jobs', '0003_cronjob_skip_unchanged'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cronjob',
+            name='diff',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='RefreshDiff',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('inserted', django.contrib.postgres.fields.jsonb.JSONField(default=list)),
+                ('updated', django.contrib.postgres.fields.jsonb.JSONField(default=list)),
+                ('deleted', django.contrib.postgres.fields.jsonb.JSONField(default=list)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('status', models.CharField(choices=[('NEW', 'New event, not processed / sent'), ('SENT', 'Processed event already sent')], default='NEW', max_length=16)),
+                ('view', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='views.MaterializedView')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.4 on 2026-10-18 15:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0004_refreshdiff'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cronjob',
+            name='skip_unchanged',
+            field=models.BooleanField(default=False),
+        ),
+    ]
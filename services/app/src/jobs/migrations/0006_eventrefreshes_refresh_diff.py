@@ -0,0 +1,19 @@
+# Generated by Django 3.0.4 on 2026-10-18 15:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0005_alter_cronjob_skip_unchanged'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventrefreshes',
+            name='refresh_diff',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='jobs.RefreshDiff'),
+        ),
+    ]
@@ -21,11 +21,12 @@ class CronJob(models.Model):
     TODO: Figure out whether there's a way in order to extend automatically
     created table 'cron.job' for application-specific purposes.
     """
-    # Due to multiple tasks needed to handle a specific cron job operation, and
-    # the inability to run an '.sql' file with function 'cron.schedule',
-    # establish a one-to-many correlation between this Django model and actual
-    # cron jobs scheduled in table 'cron.job'. Expand size of field and migrate
-    # as necessary.
+    # IDs of the cron jobs scheduled in table 'cron.job'. New jobs schedule a
+    # single cron job, which refreshes the view and records the refresh event
+    # in one transaction through procedure 'refresh_and_notify', see
+    # 'channels_app/storedprocedures/refresh_and_notify.sql'. Jobs created
+    # before the procedure existed scheduled two cron jobs, and still do: one
+    # refreshing the view, and one recording the refresh event.
     #
     # In order to get the channel ID, use the '_id' field for this Django model.
     job_ids = psql_fields.ArrayField(
@@ -45,6 +46,20 @@ class CronJob(models.Model):
         on_delete=models.PROTECT,
         to_field='id'
     )
+    # Pipeline jobs refresh the view together with every view it depends on,
+    # upstream first, through the ingest workers; see 'jobs/pipelines.py'.
+    pipeline = models.BooleanField(default=False)
+    # Skip refreshes, and refresh events, on ticks where no source relation of
+    # the view has changed since the last refresh. Opt-in, since a view that
+    # calls volatile functions like 'now()', or reads foreign tables, can
+    # change without any of its source relations changing.
+    skip_unchanged = models.BooleanField(default=False)
+    # When the last refresh event of the job was recorded; see
+    # 'channels_app/storedprocedures/refresh_and_notify.sql'.
+    last_notified = models.DateTimeField(null=True, blank=True)
+    # Diff jobs record the rows each refresh inserted, updated, and deleted, and
+    # send them over channels; see 'jobs/diffs.py'.
+    diff = models.BooleanField(default=False)
 
 
 # NOTE: Python-based enum.Enum type underneath the hood, that may map to enum
@@ -63,9 +78,10 @@ class EventRefreshes(models.Model):
 
     TODO: While Django migrations will help manage schemas and existing data
     within this table, updating the schema will force an update of the
-    unstructured text query during 'SELECT cron.schedule()' in 'jobs/views.py'.
-    Usage of unstructured queries is necessary because the Django ORM isn't
-    present during cron job execution. Figure out a way in order to generate a
+    unstructured text query in procedure 'refresh_and_notify', see
+    'channels_app/storedprocedures/refresh_and_notify.sql'. Usage of
+    unstructured queries is necessary because the Django ORM isn't present
+    during cron job execution. Figure out a way in order to generate a
     templatable unstructured query to use in 'jobs/views.py'.
 
     This limitation should not significantly impact ability to send arbitrary
@@ -95,3 +111,90 @@ class EventRefreshes(models.Model):
         choices=EnumStatusTypes.choices,
         default=EnumStatusTypes.NEW
     )
+    # Rows the refresh changed, for refreshes of diff jobs that changed any;
+    # see 'jobs/diffs.py'. Carried in the notification payload, so that the
+    # broker sends exactly this diff. Both tables are pruned by raw queries
+    # on their own schedules, so no database constraint is created.
+    refresh_diff = models.ForeignKey(
+        'RefreshDiff',
+        on_delete=models.SET_NULL,
+        to_field='id',
+        null=True,
+        blank=True,
+        db_constraint=False
+    )
+
+
+class EnumPipelinePhases(models.TextChoices):
+    QUEUED = 'QUEUED',_('Queued by the cron job, waiting for an ingest worker')
+    RUNNING = 'RUNNING',_('Refreshing views')
+    SUCCEEDED = 'SUCCEEDED',_('Every view refreshed, refresh event recorded')
+    FAILED = 'FAILED',_('A refresh failed; downstream views were not refreshed')
+
+
+class PipelineRun(models.Model):
+    """
+    Model for one cycle of a pipeline job, refreshing a view's dependency graph.
+    Rows are queued by the job's 'cron.schedule' entry, and claimed by the
+    ingest workers started by 'python manage.py startingestworkers'.
+
+    NOTE: Like EventRefreshes, this table is inserted into by an unstructured
+    query in 'cron.job'. See 'jobs/pipelines.py' queue_pipeline_run_sql().
+    """
+    job = models.ForeignKey(
+        CronJob,
+        on_delete=models.PROTECT,
+        to_field='id'
+    )
+    view = models.ForeignKey(
+        view_models.MaterializedView,
+        on_delete=models.PROTECT,
+        to_field='id'
+    )
+    phase = models.CharField(
+        max_length=16,
+        choices=EnumPipelinePhases.choices,
+        default=EnumPipelinePhases.QUEUED
+    )
+    # Names of the views refreshed by this run, and of the views skipped as
+    # already refreshed during this cycle by another run.
+    refreshed = psql_fields.ArrayField(
+        models.CharField(max_length=255),
+        default=list,
+        blank=True
+    )
+    skipped = psql_fields.ArrayField(
+        models.CharField(max_length=255),
+        default=list,
+        blank=True
+    )
+    error = models.TextField(null=True, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+
+class RefreshDiff(models.Model):
+    """
+    Model for the rows one refresh of a view changed, keyed on the view's
+    unique key, recorded by refreshes of diff jobs and sent over channels by
+    the broker. See 'jobs/diffs.py'.
+
+    NOTE: Like EventRefreshes, this table is inserted into by an unstructured
+    query in 'cron.job', and rows older than an hour are pruned on insert.
+    """
+    view = models.ForeignKey(
+        view_models.MaterializedView,
+        on_delete=models.PROTECT,
+        to_field='id'
+    )
+    # Full rows inserted and updated, and unique keys of rows deleted, as JSON
+    # objects keyed by column name.
+    inserted = psql_fields.JSONField(default=list)
+    updated = psql_fields.JSONField(default=list)
+    deleted = psql_fields.JSONField(default=list)
+    created = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(
+        max_length=16,
+        choices=EnumStatusTypes.choices,
+        default=EnumStatusTypes.NEW
+    )
@@ -0,0 +1,267 @@
+"""
+Pipeline refresh helpers for jobs service.
+
+A pipeline job refreshes a view together with every view it depends on,
+directly or transitively (see 'views/dependencies.py'), instead of refreshing
+the view on its own:
+
+1. The job's single 'cron.schedule' entry queues a PipelineRun and wakes up the
+   ingest workers. A tick that finds the previous run still queued queues
+   nothing, so a backlog never builds up.
+2. An ingest worker claims the run, and refreshes the dependency graph upstream
+   first. Each view starts as soon as all of its upstream views have
+   refreshed, so independent branches refresh in parallel, over up to
+   VIEWS_PIPELINE_MAX_PARALLELISM connections.
+3. Each view is refreshed at most once per cycle: views another run already
+   refreshed since this run was queued are skipped, unless one of their own
+   upstream views was refreshed again by this run. Pipelines of two views that
+   share a source therefore only scan it once.
+4. Unless the job refreshes on every tick, each view is also skipped when none
+   of its source relations changed since its last refresh, see
+   'views/dependencies.py' refresh_if_changed_sql().
+5. Once the whole graph has refreshed, the refresh event is recorded in the
+   EventRefreshes model, whose trigger notifies subscribed channels. A failed
+   refresh stops the run before any downstream view refreshes, and records no
+   event. Neither does a run that skipped every view as unchanged.
+"""
+
+from concurrent import futures
+
+from django.conf import settings
+from django.db import transaction
+from psycopg2 import sql
+
+from core import app_logging
+from core import utils as core_utils
+from tables import utils as table_utils
+from views import dependencies as views_dependencies
+from views import models as view_models
+from . import diffs as job_diffs
+from . import models
+from . import utils as job_utils
+
+
+def queue_pipeline_run_sql(cronjob):
+    """
+    Returns the statement the 'cron.schedule' entry of a pipeline job runs,
+    queueing a PipelineRun unless one is already waiting.
+
+    NOTE: Every 'NOT NULL' column must be listed, since Django model defaults
+    are not database defaults.
+    """
+    pipeline_runs = sql.Identifier('public', models.PipelineRun._meta.db_table)
+    return sql.SQL(
+        'WITH run AS ('
+        'INSERT INTO {pipeline_runs} (job_id, view_id, phase, refreshed, skipped, created, updated) '
+        'SELECT {job_id}, {view_id}, {queued}, {empty}, {empty}, NOW(), NOW() '
+        'WHERE NOT EXISTS (SELECT 1 FROM {pipeline_runs} WHERE job_id = {job_id} AND phase = {queued}) '
+        'RETURNING id'
+        ') SELECT pg_notify({channel}, id::text) FROM run'
+    ).format(
+        pipeline_runs=pipeline_runs,
+        job_id=sql.Literal(cronjob.id),
+        view_id=sql.Literal(cronjob.view_id),
+        queued=sql.Literal(str(models.EnumPipelinePhases.QUEUED)),
+        empty=sql.Literal([]),
+        channel=sql.Literal(table_utils.INGEST_CHANNEL_NAME)
+    )
+
+
+def set_phase(pipeline_run, phase, **fields):
+    """
+    Updates the phase, and any other given fields, of a pipeline run.
+    """
+    pipeline_run.phase = phase
+    for (key, value) in fields.items():
+        setattr(pipeline_run, key, value)
+    pipeline_run.save(update_fields=['phase', 'updated'] + list(fields.keys()))
+
+
+def claim_next_pipeline_run():
+    """
+    Claims the oldest queued pipeline run, if any. See 'tables/workers.py'
+    claim_next_ingest().
+
+    Returns:
+        models.PipelineRun, or None if the queue is empty.
+    """
+    with transaction.atomic():
+        pipeline_run = models.PipelineRun.objects.select_for_update(
+            skip_locked=True
+        ).filter(
+            phase=models.EnumPipelinePhases.QUEUED
+        ).order_by(
+            'created'
+        ).first()
+
+        if pipeline_run is None:
+            return None
+
+        set_phase(pipeline_run, models.EnumPipelinePhases.RUNNING)
+        return pipeline_run
+
+
+def _refresh_view_proc(schema_name, refresh_statement):
+    """
+    Task definition for refreshing one view over its own connection.
+
+    NOTE: Runs on a worker thread, so it must not touch the Django ORM.
+
+    Returns:
+        int: ID of the RefreshDiff the refresh recorded, or None.
+    """
+    with core_utils.PostgreSQLCursor(db_schema=schema_name) as (psql_conn, psql_cursor):
+        psql_cursor.execute(refresh_statement)
+        psql_cursor.execute(job_diffs.recorded_diff_id_sql())
+        refresh_diff_id = psql_cursor.fetchone()[0]
+        psql_conn.commit()
+
+    return refresh_diff_id
+
+
+def refresh_graph(graph, cycle_started, parallelism, skip_unchanged=False, diff_view_id=None):
+    """
+    Refreshes every view of a dependency graph, upstream first, running
+    independent views in parallel.
+
+    Args:
+        dict: Set of upstream view IDs, by view ID, see
+            'views/dependencies.py' upstream_graph().
+        datetime.datetime: Start of the current cycle. Views refreshed since
+            are skipped, unless one of their upstream views is refreshed again.
+        int: Maximum number of views refreshed at once.
+        bool: Skip views whose source relations have not changed since their
+            last refresh. Never applies to views with an upstream view
+            refreshed earlier in the same call.
+        int: ID of the view to record a diff of on refresh, see
+            'jobs/diffs.py'.
+
+    Returns:
+        (list(str), list(str), int): Names of the views refreshed and skipped,
+            and the ID of the RefreshDiff recorded for the diff view, or None.
+
+    Raises:
+        Exception: A refresh failed. Views downstream of it were not refreshed.
+    """
+    # Fails on cycles before anything is refreshed.
+    views_dependencies.topological_order(graph)
+
+    views = view_models.MaterializedView.objects.in_bulk(list(graph.keys()))
+    pending = dict(graph)
+    done = set()
+    refreshed_ids = set()
+    (refreshed, skipped) = ([], [])
+    refresh_diff_id = None
+
+    with futures.ThreadPoolExecutor(max_workers=parallelism) as executor:
+        running = {}
+        while pending or running:
+            ready = sorted(
+                view_id
+                for (view_id, upstream_ids)
+                in pending.items()
+                if upstream_ids <= done
+            )
+            for view_id in ready:
+                del pending[view_id]
+                view = views[view_id]
+                if (
+                    view.last_refreshed is not None and
+                    view.last_refreshed >= cycle_started and
+                    not graph[view_id] & refreshed_ids
+                ):
+                    done.add(view_id)
+                    skipped.append(view.view_name)
+                    continue
+                # Refresh statements are built here, since building them may
+                # query the Django ORM. Views with an upstream view refreshed
+                # this cycle are refreshed unconditionally: the statistics
+                # collector reports modifications with a lag, so the gate may
+                # not see the upstream refresh yet.
+                future = executor.submit(
+                    _refresh_view_proc,
+                    str(view.user_id),
+                    job_utils.refresh_statement_sql(
+                        view,
+                        skip_unchanged=(
+                            skip_unchanged and
+                            not graph[view_id] & refreshed_ids
+                        ),
+                        diff=(view_id == diff_view_id)
+                    )
+                )
+                running[future] = view_id
+
+            if not running:
+                # Skipped views may have unblocked views downstream.
+                continue
+
+            (finished, not_finished) = futures.wait(
+                running,
+                return_when=futures.FIRST_COMPLETED
+            )
+            for future in finished:
+                view_id = running.pop(future)
+                recorded_diff_id = future.result()
+                if view_id == diff_view_id:
+                    refresh_diff_id = recorded_diff_id
+                done.add(view_id)
+                # Refreshes record their own refresh time, which gated
+                # refreshes leave untouched if the view was unchanged.
+                last_refreshed = view_models.MaterializedView.objects.values_list(
+                    'last_refreshed',
+                    flat=True
+                ).get(id=view_id)
+                if last_refreshed == views[view_id].last_refreshed:
+                    skipped.append(views[view_id].view_name)
+                    continue
+                refreshed_ids.add(view_id)
+                refreshed.append(views[view_id].view_name)
+
+    return (refreshed, skipped, refresh_diff_id)
+
+
+def run_pipeline_run(pipeline_run):
+    """
+    Runs one claimed pipeline run to completion, recording success or failure
+    on the PipelineRun model. Never raises, like 'tables/workers.py'
+    run_ingest().
+    """
+    logger = app_logging.get_ingest_worker_logger()
+    logger.info(f'Starting pipeline run {pipeline_run.id} of view {pipeline_run.view.view_name}.')
+
+    try:
+        (refreshed, skipped, refresh_diff_id) = refresh_graph(
+            views_dependencies.upstream_graph(pipeline_run.view),
+            pipeline_run.created,
+            settings.VIEWS_PIPELINE_MAX_PARALLELISM,
+            skip_unchanged=pipeline_run.job.skip_unchanged,
+            diff_view_id=(
+                pipeline_run.view_id
+                if pipeline_run.job.diff
+                else None
+            )
+        )
+        # Inserting the event notifies subscribed channels, see
+        # 'channels_app/storedprocedures/trigger_on_refresh.sql'.
+        if refreshed or not pipeline_run.job.skip_unchanged:
+            models.EventRefreshes.objects.create(
+                job=pipeline_run.job,
+                view=pipeline_run.view,
+                refresh_diff_id=refresh_diff_id,
+                status=models.EnumStatusTypes.NEW
+            )
+        set_phase(
+            pipeline_run,
+            models.EnumPipelinePhases.SUCCEEDED,
+            refreshed=refreshed,
+            skipped=skipped
+        )
+        logger.info(f'Pipeline run {pipeline_run.id} succeeded.')
+    except Exception as e:
+        logger.exception(f'Pipeline run {pipeline_run.id} failed.')
+        set_phase(
+            pipeline_run,
+            models.EnumPipelinePhases.FAILED,
+            error=str(e)
+        )
@@ -12,5 +12,10 @@ urlpatterns = [
         'create/',
         views.CreateJobView().as_view(),
         name='job_create'
+    ),
+    path(
+        'diffs/<int:diff_id>/',
+        views.RefreshDiffView().as_view(),
+        name='job_diff'
     )
 ]
@@ -5,6 +5,9 @@ Utility classes, methods, and variables for jobs service.
 from psycopg2 import sql
 
 from core import utils as core_utils
+from views import dependencies as views_dependencies
+from views import utils as views_utils
+from . import diffs as job_diffs
 
 
 def cron_job_exists(schemaname, job_id):
@@ -26,3 +29,59 @@ def cron_job_exists(schemaname, job_id):
         job_exists = psql_cursor.fetchone()[0]
 
         return job_exists
+
+
+def refresh_statement_sql(view, skip_unchanged=False, diff=False):
+    """
+    Returns the statement a job runs to refresh one view, as a PL/pgSQL
+    block that also records the time and duration of the refresh on the
+    MaterializedView model.
+
+    Args:
+        views.models.MaterializedView
+        bool: Skip the refresh if no source relation of the view changed, see
+            'views/dependencies.py' refresh_if_changed_sql().
+        bool: Record the rows the refresh changed, see 'jobs/diffs.py'.
+
+    Returns:
+        psycopg2.sql.Composed
+    """
+    refresh = views_dependencies.view_refresh_sql(view)
+    if diff:
+        refresh = job_diffs.diff_refresh_sql(view, refresh)
+    refresh = sql.SQL('{refresh}; {record_refresh}').format(
+        refresh=refresh,
+        record_refresh=views_utils.record_refresh_sql(view)
+    )
+    if skip_unchanged:
+        return views_dependencies.refresh_if_changed_sql(view, refresh=refresh)
+    # Runs every statement in one transaction.
+    return sql.SQL('DO $refresh$ BEGIN {refresh}; END $refresh$').format(
+        refresh=refresh
+    )
+
+
+def refresh_and_notify_sql(cronjob, psql_conn):
+    """
+    Returns the statement the single 'cron.schedule' entry of a job runs,
+    refreshing its view and then recording the refresh event, in one
+    transaction. See 'channels_app/storedprocedures/refresh_and_notify.sql'.
+
+    Args:
+        models.CronJob
+        psycopg2.connection: Connection to quote the refresh statement with.
+
+    Returns:
+        psycopg2.sql.Composed
+    """
+    return sql.SQL('CALL public.refresh_and_notify({job_id}, {view_id}, {refresh_statement})').format(
+        job_id=sql.Literal(cronjob.id),
+        view_id=sql.Literal(cronjob.view_id),
+        refresh_statement=sql.Literal(
+            refresh_statement_sql(
+                cronjob.view,
+                skip_unchanged=cronjob.skip_unchanged,
+                diff=cronjob.diff
+            ).as_string(psql_conn)
+        )
+    )
@@ -14,7 +14,8 @@ from views import models as view_models
 from views import utils as views_utils
 
 from . import models
-from . import serializers
+from . import pipelines as job_pipelines
+from . import utils as job_utils
 
 
 class CreateJobView(APIView):
@@ -34,6 +35,24 @@ class CreateJobView(APIView):
             --method POST \
             --data '{"crontab_def", "* * * * *", "view_name": "sample_view"}' \
             https://api.tinydevcrm.com/jobs/create/
+
+        Passing '"pipeline": true' schedules a pipeline refresh instead: each
+        tick refreshes the view together with every view it depends on,
+        upstream first, with independent branches in parallel, and only then
+        records the refresh event that notifies channels. See
+        'jobs/pipelines.py'.
+
+        Passing '"skip_unchanged": true' skips the refresh, and records no
+        refresh event, on ticks where no source relation of the view has
+        changed since its last refresh. Only pass it for views that do not call
+        volatile functions like 'now()' or read foreign tables, since those can
+        change without their sources changing. See 'views/dependencies.py'
+        refresh_if_changed_sql().
+
+        Passing '"diff": true' also records the rows each refresh inserted,
+        updated, and deleted, and sends them with the refresh event, so that
+        channel clients can patch their copy of the view instead of fetching
+        it again. The view needs a unique key. See 'jobs/diffs.py'.
         """
         def _validate(request):
             """
@@ -48,7 +67,8 @@ class CreateJobView(APIView):
             checks = {
                 'all_required_keys_are_present': True,
                 'crontab_def_is_valid': True,
-                'view_exists': True
+                'view_exists': True,
+                'diff_view_has_unique_key': True
             }
 
             if (
@@ -71,11 +91,28 @@ class CreateJobView(APIView):
 
             view_name = request.data.get('view_name')
 
-            checks['view_exists'] = views_utils.materialized_view_exists(
-                str(request.user.id),
-                view_name
+            # Incrementally maintained views are plain result tables.
+            checks['view_exists'] = (
+                views_utils.materialized_view_exists(
+                    str(request.user.id),
+                    view_name
+                ) or
+                view_models.MaterializedView.objects.filter(
+                    user=request.user.id,
+                    view_name=view_name,
+                    refresh_mode=view_models.EnumRefreshModes.INCREMENTAL
+                ).exists()
             )
 
+            # Diffs are keyed on the unique key of the view.
+            if str(request.data.get('diff', 'false')).lower() == 'true':
+                checks['diff_view_has_unique_key'] = view_models.MaterializedView.objects.filter(
+                    user=request.user.id,
+                    view_name=view_name
+                ).exclude(
+                    unique_key=[]
+                ).exists()
+
             return (all(checks.values()), checks)
 
         (request_is_valid, validation_checks) = _validate(request)
@@ -98,84 +135,87 @@ class CreateJobView(APIView):
                 'More than one materialized view with the same schema name and view name present. Data corrupted.',
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-        view_id = view_objects.first().id
+        view = view_objects.first()
+        pipeline = str(request.data.get('pipeline', 'false')).lower() == 'true'
+        skip_unchanged = str(request.data.get('skip_unchanged', 'false')).lower() == 'true'
+        diff = str(request.data.get('diff', 'false')).lower() == 'true'
+
+        # The scheduled query references the CronJob, so the CronJob is created
+        # before its only 'cron.schedule' entry.
+        cronjob = models.CronJob.objects.create(
+            job_ids=[],
+            user=request.user,
+            view=view,
+            pipeline=pipeline,
+            skip_unchanged=skip_unchanged,
+            diff=diff
+        )
 
         with core_utils.PostgreSQLCursor(db_schema=request.user.id) as (psql_conn, psql_cursor):
-            # NOTE: The 'INSERT' query references the EventRefreshes Django
-            # model, and must be updated manually if the model is updated. See
-            # 'jobs/models.py' for more information.
+            # NOTE: Views created with a unique key are refreshed
+            # 'CONCURRENTLY', so reads of the view are never blocked by the
+            # cron refresh. See 'views/views.py'.
+            #
+            # Incrementally maintained views only merge rows appended to their
+            # source since the previous refresh. See 'views/incremental.py'.
             #
-            # TODO: Each channel needs a corrseponding job ID to listen to. That
-            # information must be communicated from the event refreshes table,
-            # since that is what the underlying trigger listens to. The job ID
-            # does not exist until the PostgreSQL function 'cron.schedule' is
-            # run. Therefore, the job creation for materialized view, and
-            # inserting into the event refreshes table must be split into two
-            # components. This may impact the atomicity of operations (e.g. if a
-            # refresh event for a materialized view doesn't work, an event may
-            # still be sent over the channel), which may impact the amount of
-            # work necessary in order to ensure correctness. This might be
-            # prevented if job ID was mapped to a list of cron jobs for the
-            # CronJob Django model.
-            refresh_view_scheduled_query = sql.SQL(
-                'REFRESH MATERIALIZED VIEW {view_name}'
-            ).format(
-                view_name=sql.Identifier(str(request.user.id), view_name)
+            # Refreshing the view and recording the refresh event, which
+            # notifies channels, happen in one transaction of one entry, so
+            # channels are only notified once the refresh is visible. See
+            # 'channels_app/storedprocedures/refresh_and_notify.sql'.
+            scheduled_query = (
+                job_pipelines.queue_pipeline_run_sql(cronjob)
+                if pipeline
+                else job_utils.refresh_and_notify_sql(cronjob, psql_conn)
             )
-            refresh_view_sql_statement = sql.SQL(
-                "SELECT cron.schedule({crontab_def}, '{scheduled_query}')"
-            ).format(
-                crontab_def=sql.Literal(crontab_def),
-                scheduled_query=refresh_view_scheduled_query
+            # NOTE: The scheduled query is passed as a literal, since it may
+            # itself contain quoted literals, e.g. filter values.
+            psql_cursor.execute(
+                sql.SQL('SELECT cron.schedule({crontab_def}, {scheduled_query})').format(
+                    crontab_def=sql.Literal(crontab_def),
+                    scheduled_query=sql.Literal(
+                        scheduled_query.as_string(psql_conn)
+                    )
+                )
             )
-            psql_cursor.execute(refresh_view_sql_statement)
-            # NOTE: This commit is necessary in order to get the job ID
-            # necessary for insertion into the notify_channel_scheduled_query.
             psql_conn.commit()
+            cronjob.job_ids = [psql_cursor.fetchone()[0]]
+            cronjob.save(update_fields=['job_ids'])
 
-            # Create the Django CronJob model.
-            job_id = psql_cursor.fetchone()[0]
-            job_serializer = serializers.CronJobSerializer(
-                data={
-                    'job_ids' : [job_id],
-                    'user' : request.user.id,
-                    'view' : view_id
-                }
-            )
-            if not job_serializer.is_valid():
-                return Response(
-                    job_serializer.errors(),
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
+        return Response(
+            model_to_dict(cronjob),
+            status=status.HTTP_201_CREATED
+        )
 
-            cronjob = job_serializer.save()
 
-            # NOTE: Job ID here refers to the CronJob ID, in order to reference
-            # the foreign key for the appropriate channel to send this event on.
-            notify_channel_scheduled_query = sql.SQL(
-                'INSERT INTO jobs_eventrefreshes(job_id, view_id, created, status) VALUES (\'{job_id}\', \'{view_id}\', NOW(), \'{status}\')'
-            ).format(
-                job_id=sql.Literal(str(cronjob.id)),
-                view_id=sql.Literal(str(cronjob.view.id)),
-                status=sql.Literal(str(models.EnumStatusTypes.NEW))
-            )
-            notify_channel_sql_query = sql.SQL(
-                "SELECT cron.schedule({crontab_def}, '{scheduled_query}')"
-            ).format(
-                crontab_def=sql.Literal(crontab_def),
-                scheduled_query=notify_channel_scheduled_query
-            )
-            psql_cursor.execute(notify_channel_sql_query)
-            psql_conn.commit()
+class RefreshDiffView(APIView):
+    """
+    Handles fetching the rows one refresh of a diff job changed via API, for
+    diffs too large to send over channels inline. See 'jobs/diffs.py'.
+    """
 
-            # Update existing cronjob field.
-            job2_id = psql_cursor.fetchone()[0]
-            cronjob.job_ids = cronjob.job_ids + [job2_id]
-            cronjob.save(update_fields=['job_ids'])
+    def get(self, request, diff_id, *args, **kwargs):
+        """
+        Handles the HTTP GET request.
+
+        Example usage:
 
-        job_data = model_to_dict(cronjob)
+        - curl \
+            --header "Authorization: JWT $JWT_ACCESS_TOKEN" \
+            https://api.tinydevcrm.com/jobs/diffs/1/
+        """
+        refresh_diff = models.RefreshDiff.objects.filter(
+            id=diff_id,
+            view__user=request.user.id
+        ).first()
+
+        if refresh_diff is None:
+            return Response(
+                f'Refresh diff {diff_id} does not exist.',
+                status=status.HTTP_404_NOT_FOUND
+            )
 
         return Response(
-            job_data,
-            status=status.HTTP_201_CREATED
+            model_to_dict(refresh_diff),
+            status=status.HTTP_200_OK
         )
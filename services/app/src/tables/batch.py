@@ -0,0 +1,307 @@
+"""
+Batch ingest helpers for tables service.
+
+Onboarding a tenant usually means loading tens of related files at once. A
+batch ingest ('tables/create/batch/') takes every file with its table
+definition in one multipart request, and creates all of the tables or none of
+them:
+
+1. Every definition is validated, and every Parquet footer checked, before any
+   data is read. Name conflicts are found with one catalog query for the whole
+   batch, rather than one 'table_exists()' connection per table.
+2. Each file is loaded into its own staging table over its own connection, with
+   at most 'parallelism' files in flight at once. Each staging table is
+   analyzed, flipped to 'LOGGED', and indexed on that same connection, so the
+   expensive post-load steps run in parallel too.
+3. One final transaction renames every staging table to its requested name.
+   Renames only touch the catalog, so the commit that makes the whole batch
+   visible is near instant, and a conflict on any one name rolls back every
+   rename.
+
+If any step fails, every staging table is dropped, so a tenant is never left
+half onboarded.
+
+NOTE: Files are loaded on threads rather than processes, since small uploads
+are held in memory by Django and cannot be reopened by path. Only part of each
+load runs outside the GIL: decoding Parquet row groups in Arrow, most of the
+bulk numpy work of the binary 'COPY' encoder (see 'tables/ingest.py'
+_encode_batch()), and waiting on the PostgreSQL backends while psycopg2 sends
+'COPY' data. Columns encoded one value at a time in Python, column profiling,
+and the Python glue between numpy calls hold it, so CPU-bound loads scale with
+'parallelism' only as far as those steps allow. Files saved on disk can be
+loaded across processes with 'copy_parquet_parallel()' instead.
+"""
+
+import collections
+from concurrent import futures
+
+from psycopg2 import sql
+
+from core import utils as core_utils
+from . import ingest as table_ingest
+from . import partitioning as table_partitioning
+
+
+# Keys accepted in each table definition of the '-F tables' JSON contract.
+BATCH_TABLE_KEYS = (
+    'file',
+    'table_name',
+    'columns',
+    'indexes',
+    'unlogged',
+    'partitioning',
+    'compression',
+)
+
+BatchTable = collections.namedtuple(
+    'BatchTable',
+    [
+        'file',
+        'table_name',
+        'staging_table_name',
+        'column_data',
+        'columns',
+        'parquet_file',
+        'indexes',
+        'unlogged',
+        'partition',
+    ]
+)
+
+
+def validate_batch_definitions(table_data):
+    """
+    Checks the structure of the '-F tables' JSON contract, before any file is
+    opened.
+
+    The contract is a list of dicts like {"file": "orders", "table_name":
+    "orders", "columns": [...], "indexes": [...], "unlogged": true,
+    "partitioning": {...}, "compression": "gzip"}, where "file" is the form
+    field the Parquet file was uploaded under. Only "file" and "table_name" are
+    required; columns are inferred from the Parquet footer if omitted.
+
+    Raises:
+        ValueError: Contract is malformed.
+    """
+    if type(table_data) is not list or not table_data:
+        raise ValueError('Tables must be a non-empty list.')
+
+    for item in table_data:
+        if type(item) is not dict:
+            raise ValueError('Each table definition must be a dict.')
+        if set(item.keys()) - set(BATCH_TABLE_KEYS):
+            raise ValueError(f'Unrecognized table definition keys: {item}')
+        if not item.get('file') or not item.get('table_name'):
+            raise ValueError(f'Table definition requires file and table_name: {item}')
+        if type(item.get('unlogged', False)) is not bool:
+            raise ValueError(f'Unlogged must be a boolean: {item}')
+
+    table_names = [item['table_name'] for item in table_data]
+    if len(set(table_names)) != len(table_names):
+        raise ValueError('Table names must be unique within a batch.')
+
+
+def parse_batch_table(item, parquet_file, staging_table_name):
+    """
+    Converts one validated table definition into a BatchTable, checking it
+    against the footer of its Parquet file.
+
+    Args:
+        dict: Table definition, see validate_batch_definitions().
+        pyarrow.parquet.ParquetFile: Opened upload.
+        str: Name of the staging table to load into.
+
+    Returns:
+        BatchTable
+
+    Raises:
+        ValueError: The definition does not match the file.
+    """
+    column_data = (
+        item['columns']
+        if item.get('columns')
+        else table_ingest.infer_columns(parquet_file)
+    )
+    if type(column_data) is not list:
+        raise ValueError('Columns must be a list.')
+    for column_def in column_data:
+        if type(column_def) is not dict or sorted(column_def.keys()) != ['column_name', 'column_type']:
+            raise ValueError(f'Malformed column definition: {column_def}')
+    columns = table_ingest.parse_columns(column_data)
+
+    indexes = table_ingest.parse_indexes(
+        item.get('indexes', []),
+        [column.column_name for column in columns]
+    )
+    unlogged = item.get('unlogged', False)
+
+    partition = None
+    if item.get('partitioning'):
+        partition = table_partitioning.parse_partitioning(
+            item['partitioning'],
+            columns
+        )
+        if unlogged:
+            raise ValueError('Partitioned tables cannot be loaded unlogged.')
+        for index in indexes:
+            if index.unique and partition.column_name not in index.columns:
+                raise ValueError(f'Unique indexes must include partition column {partition.column_name}.')
+
+    missing_columns = table_ingest.missing_parquet_columns(
+        parquet_file,
+        columns
+    )
+    if missing_columns:
+        raise ValueError(f'Columns not present in Parquet file: {str(missing_columns)}')
+
+    incompatible_columns = table_ingest.incompatible_parquet_columns(
+        parquet_file,
+        columns
+    )
+    if incompatible_columns:
+        raise ValueError(f'Column types do not match Parquet file: {str(incompatible_columns)}')
+
+    return BatchTable(
+        file=item['file'],
+        table_name=item['table_name'],
+        staging_table_name=staging_table_name,
+        column_data=column_data,
+        columns=columns,
+        parquet_file=parquet_file,
+        indexes=indexes,
+        unlogged=unlogged,
+        partition=partition
+    )
+
+
+def _load_staging_table(db_schema, batch_table, profiler):
+    """
+    Task definition for one file of a batch. Creates, loads, and finalizes its
+    staging table over its own connection, and commits.
+
+    Returns:
+        int: Number of rows copied.
+    """
+    with core_utils.PostgreSQLCursor(db_schema=db_schema) as (psql_conn, psql_cursor):
+        table_ingest.create_table(
+            psql_cursor,
+            batch_table.staging_table_name,
+            batch_table.columns,
+            unlogged=batch_table.unlogged,
+            partition=batch_table.partition,
+            parquet_file=batch_table.parquet_file,
+            partition_prefix=batch_table.table_name
+        )
+        rows_copied = table_ingest.copy_parquet(
+            psql_cursor,
+            batch_table.staging_table_name,
+            batch_table.columns,
+            batch_table.parquet_file,
+            profiler=profiler
+        )
+        table_ingest.finalize_table(
+            psql_cursor,
+            batch_table.staging_table_name,
+            indexes=batch_table.indexes,
+            unlogged=batch_table.unlogged,
+            index_prefix=batch_table.table_name
+        )
+        psql_conn.commit()
+    return rows_copied
+
+
+def drop_staging_tables(db_schema, batch_tables):
+    """
+    Drops the staging tables of the given tables of a batch.
+    """
+    if not batch_tables:
+        return
+
+    with core_utils.PostgreSQLCursor(db_schema=db_schema) as (psql_conn, psql_cursor):
+        psql_cursor.execute(
+            sql.SQL('DROP TABLE IF EXISTS {staging_table_names}').format(
+                staging_table_names=sql.SQL(', ').join(
+                    sql.Identifier(batch_table.staging_table_name)
+                    for batch_table
+                    in batch_tables
+                )
+            )
+        )
+        psql_conn.commit()
+
+
+def load_batch(db_schema, batch_tables, parallelism, profilers=None):
+    """
+    Loads every table of a batch, all or nothing.
+
+    Args:
+        str: User schema name.
+        list(BatchTable): Validated tables.
+        int: Maximum number of files loaded at once.
+        list(profiles.ColumnProfiler): One profiler per table, filled while
+            its file is copied.
+
+    Returns:
+        list(int): Number of rows copied into each table.
+
+    Raises:
+        Exception: Any load, or the final rename, failed. No table of the
+            batch exists afterwards.
+    """
+    profilers = profilers or [None] * len(batch_tables)
+
+    results = []
+    try:
+        with futures.ThreadPoolExecutor(max_workers=parallelism) as executor:
+            results = [
+                executor.submit(
+                    _load_staging_table,
+                    str(db_schema),
+                    batch_table,
+                    profiler
+                )
+                for (batch_table, profiler)
+                in zip(batch_tables, profilers)
+            ]
+            # After the first failure, files not yet started are skipped.
+            # Leaving this block still waits for loads already running, so
+            # that none commits a staging table after the cleanup below.
+            (done, pending) = futures.wait(
+                results,
+                return_when=futures.FIRST_EXCEPTION
+            )
+            for result in pending:
+                result.cancel()
+            for result in done:
+                if result.exception() is not None:
+                    raise result.exception()
+            rows_copied = [
+                result.result()
+                for result
+                in results
+            ]
+
+        with core_utils.PostgreSQLCursor(db_schema=db_schema) as (psql_conn, psql_cursor):
+            for batch_table in batch_tables:
+                psql_cursor.execute(
+                    sql.SQL('ALTER TABLE {staging_table_name} RENAME TO {table_name}').format(
+                        staging_table_name=sql.Identifier(batch_table.staging_table_name),
+                        table_name=sql.Identifier(batch_table.table_name)
+                    )
+                )
+            psql_conn.commit()
+    except Exception:
+        # Each load commits its staging table only once it has succeeded, so
+        # these are exactly the staging tables this call created.
+        drop_staging_tables(
+            db_schema,
+            [
+                batch_table
+                for (batch_table, result)
+                in zip(batch_tables, results)
+                if not result.cancelled() and result.exception() is None
+            ]
+        )
+        raise
+
+    return rows_copied
@@ -0,0 +1,449 @@
+"""
+Bulk export helpers for tables service.
+
+The inverse of 'tables/ingest.py'. Tables and materialized views are read back
+out of a user schema with 'COPY ... TO STDOUT', and streamed to the client a
+bounded chunk at a time, so that application memory stays constant regardless
+of relation size:
+
+- CSV is passed through as PostgreSQL produces it.
+- Parquet is decoded from 'COPY ... TO STDOUT (FORMAT binary)' and re-encoded
+  one row group at a time.
+
+'psycopg2' only supports 'COPY ... TO STDOUT' by writing into a file-like
+object, so 'COPY' runs on a separate thread and hands chunks over through a
+bounded queue. A slow client blocks the 'COPY' instead of buffering the
+relation in memory.
+
+See: https://www.postgresql.org/docs/12/sql-copy.html#id-1.9.3.55.9.4
+"""
+
+import collections
+import queue
+import struct
+import threading
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from psycopg2 import sql
+
+from core import utils as core_utils
+from . import ingest as table_ingest
+
+
+EXPORT_FORMATS = (
+    'csv',
+    'parquet',
+)
+
+# Number of 'COPY' chunks buffered between the database and the client.
+# Together with 'table_ingest.COPY_BUFFER_SIZE', bounds memory for one export.
+EXPORT_QUEUE_SIZE = 8
+
+# Default and maximum number of rows per Parquet row group.
+DEFAULT_ROW_GROUP_SIZE = table_ingest.COPY_BATCH_SIZE
+MAX_ROW_GROUP_SIZE = 1 << 20
+
+# How long the 'COPY' thread waits on a full queue before checking whether the
+# client has gone away.
+QUEUE_TIMEOUT_SECONDS = 1
+
+# Unix epoch as an offset from the PostgreSQL epoch, in days and microseconds.
+POSTGRESQL_EPOCH_DAYS = 10957
+POSTGRESQL_EPOCH_MICROSECONDS = POSTGRESQL_EPOCH_DAYS * 86400 * 1000000
+
+_INT16 = struct.Struct('!h')
+_INT32 = struct.Struct('!i')
+
+# PGCOPY signature, flags field, and header extension length field.
+_PGCOPY_HEADER_SIZE = 19
+
+
+def _struct_decoder(fmt):
+    unpacker = struct.Struct(fmt)
+    return lambda value: unpacker.unpack(value)[0]
+
+
+def _decode_text(value):
+    return bytes(value).decode('utf-8')
+
+
+def _decode_date(value):
+    return _INT32.unpack(value)[0] + POSTGRESQL_EPOCH_DAYS
+
+
+def _decode_timestamp(value):
+    return struct.unpack('!q', value)[0] + POSTGRESQL_EPOCH_MICROSECONDS
+
+
+# Binary 'COPY' decoders and Arrow types by PostgreSQL type OID, for the column
+# types in the 'tables/ingest.py' whitelist. Dates and timestamps decode to
+# integer offsets from the Unix epoch, which Arrow accepts as-is.
+#
+# Columns of any other type (e.g. 'numeric' in a materialized view) are cast to
+# 'text' by the export query.
+ExportType = collections.namedtuple(
+    'ExportType',
+    ['arrow_type', 'decoder']
+)
+
+TEXT_OID = 25
+
+EXPORT_TYPES = {
+    16: ExportType(pa.bool_(), _struct_decoder('!?')),
+    20: ExportType(pa.int64(), _struct_decoder('!q')),
+    21: ExportType(pa.int16(), _struct_decoder('!h')),
+    23: ExportType(pa.int32(), _struct_decoder('!i')),
+    TEXT_OID: ExportType(pa.string(), _decode_text),
+    700: ExportType(pa.float32(), _struct_decoder('!f')),
+    701: ExportType(pa.float64(), _struct_decoder('!d')),
+    1042: ExportType(pa.string(), _decode_text),
+    1043: ExportType(pa.string(), _decode_text),
+    1082: ExportType(pa.date32(), _decode_date),
+    1114: ExportType(pa.timestamp('us'), _decode_timestamp),
+    1184: ExportType(pa.timestamp('us', tz='UTC'), _decode_timestamp),
+}
+
+
+class ExportCancelled(Exception):
+    """
+    Raised within the 'COPY' thread once the client has gone away.
+    """
+    pass
+
+
+# Sentinel marking the end of a 'COPY' on the chunk queue.
+_END_OF_COPY = object()
+
+
+def _put(chunk_queue, cancelled, item):
+    """
+    Puts an item on the chunk queue, giving up once the export is cancelled.
+    """
+    while True:
+        if cancelled.is_set():
+            raise ExportCancelled()
+        try:
+            chunk_queue.put(item, timeout=QUEUE_TIMEOUT_SECONDS)
+            return
+        except queue.Full:
+            continue
+
+
+class QueueWriter(object):
+    """
+    File-like object for 'copy_expert()' that hands chunks of at least
+    'table_ingest.COPY_BUFFER_SIZE' bytes to a queue.
+
+    NOTE: 'psycopg2' calls write() once per row; rows are coalesced here so
+    that the queue carries large chunks instead.
+    """
+
+    def __init__(self, chunk_queue, cancelled):
+        self.chunk_queue = chunk_queue
+        self.cancelled = cancelled
+        self.buffer = bytearray()
+
+    def write(self, data):
+        self.buffer += data
+        if len(self.buffer) >= table_ingest.COPY_BUFFER_SIZE:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        if self.buffer:
+            _put(self.chunk_queue, self.cancelled, bytes(self.buffer))
+            self.buffer = bytearray()
+
+
+def _copy_to_proc(db_schema, copy_sql_query, chunk_queue, cancelled):
+    """
+    Thread target running one 'COPY ... TO STDOUT' into a chunk queue. Ends the
+    queue with _END_OF_COPY, or with the exception that stopped the 'COPY'.
+    """
+    try:
+        with core_utils.PostgreSQLCursor(db_schema=db_schema) as (psql_conn, psql_cursor):
+            writer = QueueWriter(chunk_queue, cancelled)
+            psql_cursor.copy_expert(
+                copy_sql_query,
+                writer,
+                size=table_ingest.COPY_BUFFER_SIZE
+            )
+            writer.flush()
+        _put(chunk_queue, cancelled, _END_OF_COPY)
+    except ExportCancelled:
+        pass
+    except Exception as e:
+        try:
+            _put(chunk_queue, cancelled, e)
+        except ExportCancelled:
+            pass
+
+
+def copy_to_chunks(db_schema, copy_sql_query):
+    """
+    Yields the output of a 'COPY ... TO STDOUT' command, in chunks of roughly
+    'table_ingest.COPY_BUFFER_SIZE' bytes.
+
+    Closing the generator early (e.g. when the client disconnects) stops the
+    'COPY' and closes its connection.
+
+    Args:
+        str: User schema.
+        psycopg2.sql.Composable: 'COPY ... TO STDOUT' command.
+
+    Yields:
+        bytes
+    """
+    chunk_queue = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+    cancelled = threading.Event()
+    thread = threading.Thread(
+        target=_copy_to_proc,
+        args=(db_schema, copy_sql_query, chunk_queue, cancelled),
+        daemon=True
+    )
+    thread.start()
+
+    try:
+        while True:
+            item = chunk_queue.get()
+            if item is _END_OF_COPY:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        cancelled.set()
+
+
+def binary_copy_rows(chunks):
+    """
+    Parses PostgreSQL binary 'COPY' data into rows of raw field values.
+
+    Args:
+        iterable(bytes): Binary 'COPY' data, split at arbitrary boundaries.
+
+    Yields:
+        list: One 'bytes' value (or None for NULL) per field.
+    """
+    buffer = b''
+    position = 0
+    header_parsed = False
+
+    for chunk in chunks:
+        buffer = buffer[position:] + chunk
+        position = 0
+
+        if not header_parsed:
+            if len(buffer) < _PGCOPY_HEADER_SIZE:
+                continue
+            extension_length = _INT32.unpack_from(buffer, 15)[0]
+            if len(buffer) < _PGCOPY_HEADER_SIZE + extension_length:
+                continue
+            position = _PGCOPY_HEADER_SIZE + extension_length
+            header_parsed = True
+
+        while len(buffer) - position >= 2:
+            row_start = position
+            num_fields = _INT16.unpack_from(buffer, position)[0]
+            if num_fields == -1:
+                return
+            position += 2
+
+            row = []
+            for index in range(num_fields):
+                if len(buffer) - position < 4:
+                    break
+                length = _INT32.unpack_from(buffer, position)[0]
+                position += 4
+                if length == -1:
+                    row.append(None)
+                    continue
+                if len(buffer) - position < length:
+                    break
+                row.append(buffer[position:position + length])
+                position += length
+
+            if len(row) < num_fields:
+                # Row is split across chunks; wait for the next one.
+                position = row_start
+                break
+            yield row
+
+
+def relation_columns(db_schema, relation_name):
+    """
+    Returns the column names and type OIDs of a table or materialized view.
+
+    Returns:
+        list((str, int))
+    """
+    with core_utils.PostgreSQLCursor(db_schema=db_schema) as (psql_conn, psql_cursor):
+        psql_cursor.execute(
+            sql.SQL('SELECT * FROM {relation_name} LIMIT 0').format(
+                relation_name=sql.Identifier(relation_name)
+            )
+        )
+        return [
+            (column.name, column.type_code)
+            for column
+            in psql_cursor.description
+        ]
+
+
+def export_csv_chunks(db_schema, relation_name):
+    """
+    Yields a table or materialized view as CSV, with a header line.
+    """
+    # NOTE: 'COPY {relation} TO' only accepts plain tables, so materialized
+    # views have to be read through a query.
+    copy_sql_query = sql.SQL('COPY (SELECT * FROM {relation_name}) TO STDOUT WITH (FORMAT csv, HEADER true)').format(
+        relation_name=sql.Identifier(relation_name)
+    )
+    return copy_to_chunks(db_schema, copy_sql_query)
+
+
+class ParquetSink(object):
+    """
+    Write-only file-like object for 'pyarrow.parquet.ParquetWriter' that
+    collects output until drained.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def export_parquet_chunks(db_schema, relation_name, row_group_size=DEFAULT_ROW_GROUP_SIZE):
+    """
+    Yields a table or materialized view as a Parquet file, one row group at a
+    time. At most one row group of decoded values is held in memory.
+
+    Columns whose type has no entry in EXPORT_TYPES are exported as strings.
+
+    Args:
+        str: User schema.
+        str: Table or materialized view name.
+        int: Maximum number of rows per row group.
+
+    Yields:
+        bytes
+    """
+    columns = relation_columns(db_schema, relation_name)
+    select_list = []
+    fields = []
+    decoders = []
+    for (column_name, type_oid) in columns:
+        if type_oid in EXPORT_TYPES:
+            select_list.append(sql.Identifier(column_name))
+        else:
+            select_list.append(
+                sql.SQL('{column_name}::text').format(
+                    column_name=sql.Identifier(column_name)
+                )
+            )
+            type_oid = TEXT_OID
+        fields.append(pa.field(column_name, EXPORT_TYPES[type_oid].arrow_type))
+        decoders.append(EXPORT_TYPES[type_oid].decoder)
+    schema = pa.schema(fields)
+
+    copy_sql_query = sql.SQL('COPY (SELECT {select_list} FROM {relation_name}) TO STDOUT WITH (FORMAT binary)').format(
+        select_list=sql.SQL(', ').join(select_list),
+        relation_name=sql.Identifier(relation_name)
+    )
+
+    def _row_group(values):
+        return pa.Table.from_arrays(
+            [
+                pa.array(column_values, type=field.type)
+                for (column_values, field)
+                in zip(values, fields)
+            ],
+            schema=schema
+        )
+
+    sink = ParquetSink()
+    writer = pq.ParquetWriter(sink, schema)
+    values = [[] for column in columns]
+    num_rows = 0
+
+    for row in binary_copy_rows(copy_to_chunks(db_schema, copy_sql_query)):
+        for (index, value) in enumerate(row):
+            values[index].append(
+                decoders[index](value)
+                if value is not None
+                else None
+            )
+        num_rows += 1
+
+        if num_rows == row_group_size:
+            writer.write_table(_row_group(values))
+            values = [[] for column in columns]
+            num_rows = 0
+            yield sink.drain()
+
+    if num_rows:
+        writer.write_table(_row_group(values))
+    writer.close()
+    yield sink.drain()
+
+
+def arrow_stream_writer(sink, description):
+    """
+    Opens an Arrow IPC stream for rows fetched by 'psycopg2', typed from the
+    cursor description.
+
+    Args:
+        pyarrow.NativeFile: Output stream.
+        list: 'psycopg2' column descriptions of the columns to write.
+
+    Returns:
+        (pyarrow.RecordBatchStreamWriter, callable): Writer, and a function
+            that writes one batch given a list of column value lists.
+    """
+    fields = []
+    converters = []
+    for column in description:
+        if column.type_code in EXPORT_TYPES:
+            fields.append(pa.field(column.name, EXPORT_TYPES[column.type_code].arrow_type))
+            converters.append(None)
+        else:
+            # E.g. 'numeric', which 'psycopg2' returns as 'decimal.Decimal'.
+            fields.append(pa.field(column.name, pa.string()))
+            converters.append(str)
+    schema = pa.schema(fields)
+    writer = pa.RecordBatchStreamWriter(sink, schema)
+
+    def write_columns(columns):
+        arrays = []
+        for (values, field, converter) in zip(columns, fields, converters):
+            if converter is not None:
+                values = [
+                    converter(value) if value is not None else None
+                    for value
+                    in values
+                ]
+            arrays.append(pa.array(values, type=field.type))
+        writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+
+    return (writer, write_columns)
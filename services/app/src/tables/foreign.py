@@ -0,0 +1,84 @@
+"""
+Foreign table and hot slice helpers for tables service.
+
+Foreign tables keep their Parquet file underneath MEDIA_ROOT and read it in
+place through 'parquet_fdw', instead of copying every row into a heap table.
+This halves storage for large, rarely queried archival data, at the cost of
+slower reads: every query decodes Parquet again. 'parquet_fdw' skips row groups
+whose footer statistics rule out the 'WHERE' clause, so queries bounded on a
+column the file is clustered by only read the matching row groups.
+
+Frequently queried subsets of a foreign table can be cached as a "hot slice":
+a materialized view over a projection and filter of the foreign table, built
+through that same row group filtering and refreshed on demand. Hot slices are
+ordinary materialized views, so 'tables/rows/', 'tables/export/', and indexes
+all work on them.
+
+See: https://github.com/adjust/parquet_fdw
+"""
+
+from psycopg2 import sql
+
+from . import query as table_query
+
+
+def hot_slice_sql(view_name, table_name, projection, filters):
+    """
+    Returns a 'CREATE MATERIALIZED VIEW' statement for a hot slice.
+
+    Args:
+        str: Materialized view name.
+        str: Foreign table name.
+        list(str): Columns to keep; all columns if empty.
+        list(psycopg2.sql.Composable): Compiled filters, see
+            'tables/query.py' parse_filter().
+
+    Returns:
+        psycopg2.sql.Composed
+    """
+    return sql.SQL('CREATE MATERIALIZED VIEW {view_name} AS SELECT {projection} FROM {table_name} WHERE {conditions} WITH DATA').format(
+        view_name=sql.Identifier(view_name),
+        projection=(
+            sql.SQL(', ').join(
+                sql.Identifier(column_name)
+                for column_name
+                in projection
+            )
+            if projection
+            else sql.SQL('*')
+        ),
+        table_name=sql.Identifier(table_name),
+        conditions=(
+            sql.SQL(' AND ').join(filters)
+            if filters
+            else sql.SQL('TRUE')
+        )
+    )
+
+
+def compile_filters(expressions, column_names):
+    """
+    Compiles 'column:operator:value' filter expressions of a hot slice.
+
+    Raises:
+        ValueError: An expression is malformed, see parse_filter().
+    """
+    if type(expressions) is not list:
+        raise ValueError('Filters must be a list.')
+    return [
+        table_query.parse_filter(str(expression), column_names)
+        for expression
+        in expressions
+    ]
+
+
+def refresh_hot_slice_sql(view_name):
+    """
+    Returns a 'REFRESH MATERIALIZED VIEW' statement for a hot slice.
+
+    NOTE: Not 'CONCURRENTLY', which would require a unique index; the slice is
+    locked against reads while it re-reads the foreign table.
+    """
+    return sql.SQL('REFRESH MATERIALIZED VIEW {view_name}').format(
+        view_name=sql.Identifier(view_name)
+    )
@@ -0,0 +1,247 @@
+"""
+Index management helpers for tables service.
+
+Indexes on user tables and materialized views are built and dropped with
+'CONCURRENTLY', so that cron refreshes and reads against the relation are not
+blocked for the length of the build. 'CONCURRENTLY' cannot run inside a
+transaction block, so every helper here runs in autocommit mode on its own
+connection.
+
+NOTE: A concurrent build that fails leaves an 'INVALID' index behind, which
+still slows down writes. build_index() drops it again before re-raising, but
+only if that index is its own: builds of the same index name are serialized
+with an advisory lock, and each one checks that the name is still free once it
+holds the lock. Otherwise two queued builds with the same default name would
+both pass the request-time check, and the second would drop the index the
+first one built.
+
+See: https://www.postgresql.org/docs/12/sql-createindex.html#SQL-CREATEINDEX-CONCURRENTLY
+"""
+
+from psycopg2 import sql
+
+from core import utils as core_utils
+from . import ingest as table_ingest
+
+
+# 'pg_class.relkind' values of relations that can be indexed via API: tables
+# and materialized views.
+#
+# NOTE: PostgreSQL 12 cannot build indexes 'CONCURRENTLY' on partitioned tables
+# ('p'). Declare those indexes with '-F indexes' when creating the table.
+INDEXABLE_RELKINDS = (
+    'r',
+    'm',
+)
+
+
+def _set_autocommit(psql_conn):
+    """
+    Switches a 'core_utils.PostgreSQLCursor' connection to autocommit mode,
+    keeping the 'search_path' it was opened with.
+    """
+    # Commit first; switching modes mid-transaction would roll back the
+    # 'SET search_path' issued on connect.
+    psql_conn.commit()
+    psql_conn.autocommit = True
+
+
+def relation_kind(schema_name, relation_name):
+    """
+    Returns the 'pg_class.relkind' of a relation in a user schema, or None if
+    it does not exist.
+    """
+    with core_utils.PostgreSQLCursor(db_schema=schema_name) as (psql_conn, psql_cursor):
+        psql_cursor.execute(
+            sql.SQL('SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace WHERE n.nspname = {schemaname} AND c.relname = {relation_name}').format(
+                schemaname=sql.Literal(str(schema_name)),
+                relation_name=sql.Literal(relation_name)
+            )
+        )
+        row = psql_cursor.fetchone()
+        return row[0] if row else None
+
+
+def index_exists(schema_name, index_name):
+    """
+    Checks whether an index exists in a user schema.
+    """
+    return relation_kind(schema_name, index_name) in ('i', 'I')
+
+
+def _index_is_valid(psql_cursor, schema_name, index_name):
+    """
+    Returns 'pg_index.indisvalid' of an index in a user schema, or None if it
+    does not exist.
+    """
+    psql_cursor.execute(
+        sql.SQL('SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid JOIN pg_namespace n ON n.oid = c.relnamespace WHERE n.nspname = {schemaname} AND c.relname = {index_name}').format(
+            schemaname=sql.Literal(str(schema_name)),
+            index_name=sql.Literal(index_name)
+        )
+    )
+    row = psql_cursor.fetchone()
+    return row[0] if row else None
+
+
+def build_index(schema_name, relation_name, index, index_name, on_started=None):
+    """
+    Runs 'CREATE INDEX CONCURRENTLY' to completion.
+
+    Args:
+        str: User schema.
+        str: Table or materialized view name.
+        table_ingest.IndexDefinition: Validated index definition.
+        str: Index name.
+        callable: Called with the PostgreSQL backend PID running the build,
+            before it starts, e.g. to report progress.
+
+    Raises:
+        ValueError: The index name was taken by the time the build started.
+        psycopg2.Error: The build failed. The invalid index has been dropped.
+    """
+    with core_utils.PostgreSQLCursor(db_schema=schema_name) as (psql_conn, psql_cursor):
+        _set_autocommit(psql_conn)
+
+        # Session-level, since every statement here commits on its own.
+        lock_key = sql.Literal(f'{str(schema_name)}.{index_name}')
+        psql_cursor.execute(
+            sql.SQL('SELECT pg_advisory_lock(hashtext({lock_key}))').format(
+                lock_key=lock_key
+            )
+        )
+        try:
+            if _index_is_valid(psql_cursor, schema_name, index_name) is not None:
+                raise ValueError(f'Index {index_name} already exists.')
+
+            if on_started:
+                psql_cursor.execute('SELECT pg_backend_pid()')
+                on_started(psql_cursor.fetchone()[0])
+
+            try:
+                psql_cursor.execute(
+                    table_ingest.create_index_sql(
+                        relation_name,
+                        index,
+                        concurrently=True,
+                        name=index_name
+                    )
+                )
+            except Exception:
+                if _index_is_valid(psql_cursor, schema_name, index_name) is False:
+                    psql_cursor.execute(
+                        sql.SQL('DROP INDEX CONCURRENTLY {index_name}').format(
+                            index_name=sql.Identifier(str(schema_name), index_name)
+                        )
+                    )
+                raise
+        finally:
+            psql_cursor.execute(
+                sql.SQL('SELECT pg_advisory_unlock(hashtext({lock_key}))').format(
+                    lock_key=lock_key
+                )
+            )
+
+
+def drop_index(schema_name, index_name):
+    """
+    Runs 'DROP INDEX CONCURRENTLY'.
+
+    NOTE: The index name is schema-qualified, since 'pg_catalog' is searched
+    before the user schema.
+    """
+    with core_utils.PostgreSQLCursor(db_schema=schema_name) as (psql_conn, psql_cursor):
+        _set_autocommit(psql_conn)
+        psql_cursor.execute(
+            sql.SQL('DROP INDEX CONCURRENTLY {index_name}').format(
+                index_name=sql.Identifier(str(schema_name), index_name)
+            )
+        )
+
+
+def index_build_progress(backend_pid):
+    """
+    Returns the live progress of the 'CREATE INDEX' running on a backend, from
+    'pg_stat_progress_create_index', or None if no build is running there.
+    """
+    with core_utils.PostgreSQLCursor() as (psql_conn, psql_cursor):
+        psql_cursor.execute(
+            sql.SQL('SELECT phase, blocks_total, blocks_done, tuples_total, tuples_done FROM pg_stat_progress_create_index WHERE pid = {backend_pid}').format(
+                backend_pid=sql.Literal(backend_pid)
+            )
+        )
+        row = psql_cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip(
+            ['phase', 'blocks_total', 'blocks_done', 'tuples_total', 'tuples_done'],
+            row
+        ))
+
+
+def index_usage_report(schema_name, relation_name=None):
+    """
+    Reports the size and usage of every index in a user schema, least used
+    first, from 'pg_stat_user_indexes'.
+
+    'idx_scan' counts index scans since statistics were last reset. Indexes
+    with no scans that do not enforce uniqueness are flagged 'unused', as
+    candidates to drop.
+
+    Args:
+        str: User schema.
+        str: Only report indexes on this table or materialized view.
+
+    Returns:
+        list(dict)
+    """
+    conditions = [
+        sql.SQL('s.schemaname = {schemaname}').format(
+            schemaname=sql.Literal(str(schema_name))
+        )
+    ]
+    if relation_name:
+        conditions.append(
+            sql.SQL('s.relname = {relation_name}').format(
+                relation_name=sql.Literal(relation_name)
+            )
+        )
+
+    columns = [
+        'relation_name',
+        'index_name',
+        'method',
+        'size_bytes',
+        'idx_scan',
+        'idx_tup_read',
+        'idx_tup_fetch',
+        'is_unique',
+        'is_valid',
+        'definition',
+    ]
+
+    with core_utils.PostgreSQLCursor(db_schema=schema_name) as (psql_conn, psql_cursor):
+        psql_cursor.execute(
+            sql.SQL(
+                'SELECT s.relname, s.indexrelname, am.amname, pg_relation_size(s.indexrelid), '
+                's.idx_scan, s.idx_tup_read, s.idx_tup_fetch, i.indisunique, i.indisvalid, '
+                'pg_get_indexdef(s.indexrelid) '
+                'FROM pg_stat_user_indexes s '
+                'JOIN pg_index i ON i.indexrelid = s.indexrelid '
+                'JOIN pg_class c ON c.oid = s.indexrelid '
+                'JOIN pg_am am ON am.oid = c.relam '
+                'WHERE {conditions} '
+                'ORDER BY s.idx_scan, pg_relation_size(s.indexrelid) DESC'
+            ).format(
+                conditions=sql.SQL(' AND ').join(conditions)
+            )
+        )
+        report = [
+            dict(zip(columns, row))
+            for row
+            in psql_cursor.fetchall()
+        ]
+
+    for item in report:
+        item['unused'] = item['idx_scan'] == 0 and not item['is_unique']
+    return report
@@ -0,0 +1,1562 @@
+"""
+Bulk ingest helpers for tables service.
+
+Rather than staging an upload underneath MEDIA_ROOT and scanning it through
+'parquet_fdw', these helpers decode the uploaded data a bounded chunk at a time
+and pipe it into PostgreSQL using 'COPY ... FROM STDIN'. Only one Parquet record
+batch (or one upload chunk, for CSV) is held in application memory at any point
+in time, and the database only ever sees the data once.
+
+See: https://www.postgresql.org/docs/12/sql-copy.html#id-1.9.3.55.9.4
+"""
+
+import collections
+from concurrent import futures
+import os
+import re
+import struct
+import tempfile
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from psycopg2 import sql
+
+from core import utils as core_utils
+from . import partitioning as table_partitioning
+
+
+# Number of Parquet rows encoded into PostgreSQL binary COPY format at one time.
+# Bounds application memory for row groups that are much larger than the
+# default.
+COPY_BATCH_SIZE = 65536
+
+# Number of bytes 'psycopg2' asks for during each 'copy_expert()' read. Also
+# used as the chunk size when reading text uploads.
+COPY_BUFFER_SIZE = 1 << 20
+
+# Delimiters for text formats accepted by 'COPY ... WITH (FORMAT csv)'.
+CSV_DELIMITERS = {
+    'csv': ',',
+    'tsv': '\t',
+}
+
+# Compression codecs accepted for uploads, by 'compression' form field value,
+# and the file name suffixes they are recognized by otherwise. Uploads are
+# decompressed with the codecs bundled with 'pyarrow'.
+UPLOAD_COMPRESSIONS = (
+    'gzip',
+    'zstd',
+)
+
+COMPRESSION_SUFFIXES = {
+    '.gz': 'gzip',
+    '.gzip': 'gzip',
+    '.zst': 'zstd',
+    '.zstd': 'zstd',
+}
+
+PGCOPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('!ii', 0, 0)
+PGCOPY_TRAILER = struct.pack('!h', -1)
+PGCOPY_NULL_FIELD = struct.pack('!i', -1)
+
+# PostgreSQL binary formats for dates and timestamps are offsets from the
+# PostgreSQL epoch, not the Unix epoch.
+POSTGRESQL_EPOCH_DAYS = 10957
+POSTGRESQL_EPOCH_MICROSECONDS = POSTGRESQL_EPOCH_DAYS * 86400 * 1000000
+MILLISECONDS_PER_DAY = 86400 * 1000
+
+# Little-endian numpy dtypes of the data buffers of fixed-width Arrow types,
+# by Arrow type name. Timestamps of every unit are 64-bit integers.
+ARROW_NUMPY_DTYPES = {
+    'int8': 'i1',
+    'int16': '<i2',
+    'int32': '<i4',
+    'int64': '<i8',
+    'uint8': 'u1',
+    'uint16': '<u2',
+    'uint32': '<u4',
+    'uint64': '<u8',
+    'halffloat': '<f2',
+    'float': '<f4',
+    'double': '<f8',
+    'date32[day]': '<i4',
+    'date64[ms]': '<i8',
+}
+
+# Big-endian numpy dtypes of the binary COPY representation of fixed-width
+# column types, by canonical type name.
+BINARY_DTYPES = {
+    'SMALLINT': '>i2',
+    'INTEGER': '>i4',
+    'BIGINT': '>i8',
+    'REAL': '>f4',
+    'DOUBLE PRECISION': '>f8',
+    'BOOLEAN': 'u1',
+}
+
+
+def _encode_text(value):
+    return str(value).encode('utf-8')
+
+
+# Whitelist of column types accepted through the 'columns' JSON schema contract.
+# Keys are lowercased type names a client may send; values are the canonical
+# PostgreSQL type name and whether the type takes a length modifier.
+#
+# NOTE: Since column types are not identifiers or literals, they cannot be
+# templated by 'psycopg2.sql'. Only canonical type names from this whitelist,
+# plus a validated integer length modifier, are ever interpolated into SQL.
+#
+# Each type also belongs to a family, used to check a requested column type
+# against the type stored in a Parquet file before any data is scanned.
+ColumnType = collections.namedtuple(
+    'ColumnType',
+    ['sql_name', 'has_length', 'family']
+)
+
+_INT2 = ColumnType('SMALLINT', False, 'integer')
+_INT4 = ColumnType('INTEGER', False, 'integer')
+_INT8 = ColumnType('BIGINT', False, 'integer')
+_FLOAT4 = ColumnType('REAL', False, 'float')
+_FLOAT8 = ColumnType('DOUBLE PRECISION', False, 'float')
+_BOOL = ColumnType('BOOLEAN', False, 'boolean')
+_TEXT = ColumnType('TEXT', False, 'text')
+_VARCHAR = ColumnType('VARCHAR', True, 'text')
+_CHAR = ColumnType('CHAR', True, 'text')
+_DATE = ColumnType('DATE', False, 'date')
+_TIMESTAMP = ColumnType('TIMESTAMP', False, 'timestamp')
+_TIMESTAMPTZ = ColumnType('TIMESTAMPTZ', False, 'timestamp')
+
+COLUMN_TYPES = {
+    'smallint': _INT2,
+    'int2': _INT2,
+    'int': _INT4,
+    'integer': _INT4,
+    'int4': _INT4,
+    'bigint': _INT8,
+    'int8': _INT8,
+    'real': _FLOAT4,
+    'float4': _FLOAT4,
+    'double precision': _FLOAT8,
+    'float8': _FLOAT8,
+    'boolean': _BOOL,
+    'bool': _BOOL,
+    'text': _TEXT,
+    'varchar': _VARCHAR,
+    'character varying': _VARCHAR,
+    'char': _CHAR,
+    'character': _CHAR,
+    'date': _DATE,
+    'timestamp': _TIMESTAMP,
+    'timestamp without time zone': _TIMESTAMP,
+    'timestamptz': _TIMESTAMPTZ,
+    'timestamp with time zone': _TIMESTAMPTZ,
+}
+
+COLUMN_TYPE_PATTERN = re.compile(
+    r'^\s*(?P<name>[a-z][a-z0-9 ]*?)\s*(?:\(\s*(?P<length>\d+)\s*\))?\s*$'
+)
+
+ColumnDefinition = collections.namedtuple(
+    'ColumnDefinition',
+    ['column_name', 'column_type', 'family']
+)
+
+# Requested column type families each Parquet column type family may be loaded
+# into. Integers may widen to floats, and anything may be loaded as text.
+# Narrowing within a family (e.g. Parquet int64 into 'int') is allowed, and
+# fails during the load only if a value is actually out of range.
+COMPATIBLE_FAMILIES = {
+    'integer': ('integer', 'float', 'text'),
+    'float': ('float', 'text'),
+    'boolean': ('boolean', 'text'),
+    'text': ('text',),
+    'date': ('date', 'text'),
+    'timestamp': ('timestamp', 'text'),
+}
+
+# Whitelist of index access methods accepted through the 'indexes' JSON
+# contract.
+#
+# NOTE: GIN indexes on the scalar column types above rely on the 'btree_gin'
+# extension, see 'tables/migrations/0012_btree_gin_extension.py'.
+INDEX_METHODS = (
+    'btree',
+    'brin',
+    'gin',
+    'hash',
+)
+
+IndexDefinition = collections.namedtuple(
+    'IndexDefinition',
+    ['columns', 'method', 'unique']
+)
+
+
+def parse_column_type(column_type):
+    """
+    Validates a client-supplied column type against the whitelist.
+
+    Args:
+        str: Column type, e.g. 'int' or 'varchar(256)'.
+
+    Returns:
+        (str, str): Canonical PostgreSQL column type and type family.
+
+    Raises:
+        ValueError: Column type is not recognized.
+    """
+    match = COLUMN_TYPE_PATTERN.match(str(column_type).lower())
+    if not match:
+        raise ValueError(f'Unrecognized column type: {column_type}')
+
+    name = ' '.join(match.group('name').split())
+    length = match.group('length')
+    if name not in COLUMN_TYPES:
+        raise ValueError(f'Unsupported column type: {column_type}')
+
+    definition = COLUMN_TYPES[name]
+    if length is not None and not definition.has_length:
+        raise ValueError(f'Column type does not take a length: {column_type}')
+
+    sql_name = (
+        f'{definition.sql_name}({int(length)})'
+        if length is not None
+        else definition.sql_name
+    )
+    return (sql_name, definition.family)
+
+
+def parse_columns(column_data):
+    """
+    Converts the 'columns' JSON schema contract into column definitions.
+
+    Args:
+        list: List of {'column_name': ..., 'column_type': ...} dicts.
+
+    Returns:
+        list(ColumnDefinition)
+
+    Raises:
+        ValueError: A column type is not recognized.
+    """
+    columns = []
+    for column_def in column_data:
+        (column_type, family) = parse_column_type(
+            column_def['column_type']
+        )
+        columns.append(
+            ColumnDefinition(
+                column_def['column_name'],
+                column_type,
+                family
+            )
+        )
+    return columns
+
+
+def column_definitions_sql(columns):
+    """
+    Returns the column definition list of a 'CREATE TABLE' or 'CREATE FOREIGN
+    TABLE' statement for validated column definitions.
+
+    Args:
+        list(ColumnDefinition): Validated column definitions.
+
+    Returns:
+        psycopg2.sql.Composed
+    """
+    return sql.SQL(', ').join([
+        sql.SQL('{} {}').format(
+            sql.Identifier(column.column_name),
+            # Whitelisted by 'parse_column_type()'.
+            sql.SQL(column.column_type)
+        )
+        for column
+        in columns
+    ])
+
+
+def create_table_sql(table_name, columns, unlogged=False, partition=None):
+    """
+    Returns a 'CREATE TABLE' statement for validated column definitions.
+
+    Args:
+        str: Table name.
+        list(ColumnDefinition): Validated column definitions.
+        bool: Create an 'UNLOGGED' table, see 'finalize_table()'.
+        partitioning.PartitionDefinition: Create a partitioned parent table.
+
+    Returns:
+        psycopg2.sql.Composed
+    """
+    return sql.SQL('CREATE {unlogged}TABLE {table_name} ({columns}){partition_by}').format(
+        unlogged=sql.SQL('UNLOGGED ' if unlogged else ''),
+        table_name=sql.Identifier(table_name),
+        columns=column_definitions_sql(columns),
+        partition_by=(
+            sql.SQL(' ') + table_partitioning.partition_by_sql(partition)
+            if partition is not None
+            else sql.SQL('')
+        )
+    )
+
+
+def create_table(psql_cursor, table_name, columns, unlogged=False, partition=None, parquet_file=None, partition_prefix=None):
+    """
+    Creates the table a binary 'COPY' load goes into, within the caller's
+    transaction. With a partition definition, the table is created as a
+    partitioned parent, with child partitions derived from the Parquet file
+    about to be loaded (see 'tables/partitioning.py').
+
+    Args:
+        psycopg2.extensions.cursor: Cursor within the load transaction.
+        str: Table name.
+        list(ColumnDefinition): Validated column definitions.
+        bool: Create an 'UNLOGGED' table. Not supported with partitioning.
+        partitioning.PartitionDefinition: Partitioning, if any.
+        pyarrow.parquet.ParquetFile: File to derive child partitions from.
+        str: Table name to derive child partition names from, if not
+            'table_name' (e.g. for a staging table that is renamed later).
+    """
+    psql_cursor.execute(
+        create_table_sql(
+            table_name,
+            columns,
+            unlogged=unlogged,
+            partition=partition
+        )
+    )
+    if partition is None:
+        return
+
+    for statement in table_partitioning.create_partitions_sql(
+        table_name,
+        partition_prefix or table_name,
+        table_partitioning.partition_bounds(partition, parquet_file)
+    ):
+        psql_cursor.execute(statement)
+
+
+def parse_indexes(index_data, column_names):
+    """
+    Converts the 'indexes' JSON contract into index definitions.
+
+    Each index is a dict like {"columns": ["SomeNumber"], "method": "btree",
+    "unique": false}, where 'method' and 'unique' are optional.
+
+    Args:
+        list: List of index dicts.
+        list(str): Column names of the table being indexed.
+
+    Returns:
+        list(IndexDefinition)
+
+    Raises:
+        ValueError: An index is malformed, or references an unknown column.
+    """
+    if type(index_data) is not list:
+        raise ValueError('Indexes must be a list.')
+
+    indexes = []
+    for item in index_data:
+        if type(item) is not dict or not item.get('columns'):
+            raise ValueError(f'Malformed index: {item}')
+        if set(item.keys()) - {'columns', 'method', 'unique'}:
+            raise ValueError(f'Unrecognized index keys: {item}')
+
+        index_columns = item['columns']
+        if type(index_columns) is not list:
+            raise ValueError(f'Index columns must be a list: {item}')
+        for column_name in index_columns:
+            if column_name not in column_names:
+                raise ValueError(f'Index references unknown column: {column_name}')
+
+        method = str(item.get('method', 'btree')).lower()
+        if method not in INDEX_METHODS:
+            raise ValueError(f'Unsupported index method: {method}')
+
+        unique = bool(item.get('unique', False))
+        if unique and method != 'btree':
+            raise ValueError('Only B-tree indexes may be unique.')
+
+        indexes.append(IndexDefinition(index_columns, method, unique))
+    return indexes
+
+
+def index_name(table_name, index_columns):
+    """
+    Returns a deterministic index name, truncated to PostgreSQL's 63 byte
+    identifier limit.
+    """
+    name = '_'.join([table_name] + list(index_columns) + ['idx'])
+    return name.encode('utf-8')[:63].decode('utf-8', 'ignore')
+
+
+def create_index_sql(table_name, index, concurrently=False, name=None):
+    """
+    Returns a 'CREATE INDEX' statement for a validated index definition.
+
+    Args:
+        str: Table (or materialized view) name.
+        IndexDefinition: Validated index definition.
+        bool: Build the index with 'CONCURRENTLY'.
+        str: Index name; defaults to 'index_name()'.
+
+    Returns:
+        psycopg2.sql.Composed
+    """
+    return sql.SQL(
+        'CREATE {unique}INDEX {concurrently}{index_name} ON {table_name} USING {method} ({columns})'
+    ).format(
+        unique=sql.SQL('UNIQUE ' if index.unique else ''),
+        concurrently=sql.SQL('CONCURRENTLY ' if concurrently else ''),
+        index_name=sql.Identifier(name or index_name(table_name, index.columns)),
+        table_name=sql.Identifier(table_name),
+        # Whitelisted by 'parse_indexes()'.
+        method=sql.SQL(index.method),
+        columns=sql.SQL(', ').join([
+            sql.Identifier(column_name)
+            for column_name
+            in index.columns
+        ])
+    )
+
+
+def finalize_table(psql_cursor, table_name, indexes=(), unlogged=False, index_prefix=None):
+    """
+    Runs the post-load steps of the staged ingest pipeline on a freshly loaded
+    table, within the caller's transaction.
+
+    1. 'ANALYZE', so the first queries and materialized view refreshes against
+       the table get sensible plans, rather than waiting for autovacuum. Its
+       statistics also back the distinct counts in 'tables/profiles.py'.
+    2. 'ALTER TABLE ... SET LOGGED', if the table was loaded 'UNLOGGED'. Rows
+       copied into an unlogged table skip per-tuple WAL records; the flip writes
+       the heap out once as whole pages instead.
+    3. 'CREATE INDEX' for each requested index, as one bulk sort per index
+       instead of incremental maintenance during the load.
+
+    NOTE: Indexes are built after 'SET LOGGED', not before, because flipping
+    persistence rewrites the heap and rebuilds every index on it.
+
+    Index names are derived from 'index_prefix' if given, e.g. the final name
+    of a staging table that is renamed later; renaming a table keeps the names
+    of its indexes.
+    """
+    psql_cursor.execute(
+        sql.SQL('ANALYZE {table_name}').format(
+            table_name=sql.Identifier(table_name)
+        )
+    )
+
+    if unlogged:
+        psql_cursor.execute(
+            sql.SQL('ALTER TABLE {table_name} SET LOGGED').format(
+                table_name=sql.Identifier(table_name)
+            )
+        )
+
+    for index in indexes:
+        psql_cursor.execute(
+            create_index_sql(
+                table_name,
+                index,
+                name=index_name(index_prefix or table_name, index.columns)
+            )
+        )
+
+
+def copy_from_stdin_sql(table_name, columns, options):
+    """
+    Returns a 'COPY ... FROM STDIN' statement for the given column definitions.
+
+    Args:
+        str: Table name.
+        list(ColumnDefinition): Column definitions, in stream order.
+        psycopg2.sql.Composable: 'WITH' options, e.g. 'FORMAT binary'.
+
+    Returns:
+        psycopg2.sql.Composed
+    """
+    return sql.SQL('COPY {table_name} ({columns}) FROM STDIN WITH ({options})').format(
+        table_name=sql.Identifier(table_name),
+        columns=sql.SQL(', ').join([
+            sql.Identifier(column.column_name)
+            for column
+            in columns
+        ]),
+        options=options
+    )
+
+
+class CopyStream(object):
+    """
+    File-like object over an iterator of byte chunks, suitable for passing to
+    'psycopg2' 'cursor.copy_expert()'.
+
+    'psycopg2' only ever calls 'read(size)', so the stream buffers at most one
+    chunk plus one read worth of bytes.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = bytearray()
+        self.bytes_sent = 0
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            self.buffer += chunk
+
+        if size < 0:
+            size = len(self.buffer)
+
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        self.bytes_sent += len(data)
+        return data
+
+
+def parse_compression(compression, file_name=''):
+    """
+    Determines the compression codec of an upload, from the 'compression' form
+    field if given, or else from the file name suffix.
+
+    Returns:
+        str: One of UPLOAD_COMPRESSIONS, or None if uncompressed.
+
+    Raises:
+        ValueError: Compression is not recognized.
+    """
+    if compression:
+        compression = str(compression).lower()
+        if compression == 'none':
+            return None
+        if compression not in UPLOAD_COMPRESSIONS:
+            raise ValueError(f'Unsupported compression: {compression}')
+        return compression
+    return COMPRESSION_SUFFIXES.get(
+        os.path.splitext(str(file_name))[1].lower()
+    )
+
+
+def decompressed_chunks(fp, compression, on_progress=None):
+    """
+    Yields a compressed file decompressed, COPY_BUFFER_SIZE bytes at a time, so
+    that no decompressed copy of the file is ever held or written.
+
+    Args:
+        file-like: Compressed file, opened for binary reading.
+        str: One of UPLOAD_COMPRESSIONS.
+        callable: Called with (rows, bytes) after each chunk, bytes being
+            compressed bytes consumed. Rows are always reported as 0.
+
+    Yields:
+        bytes
+    """
+    stream = pa.CompressedInputStream(
+        pa.PythonFile(fp, mode='r'),
+        compression
+    )
+    position = fp.tell()
+    while True:
+        chunk = stream.read(COPY_BUFFER_SIZE)
+        if not chunk:
+            break
+        yield chunk
+        if on_progress:
+            on_progress(0, fp.tell() - position)
+            position = fp.tell()
+
+
+def spool_decompressed_parquet(fp, compression):
+    """
+    Decompresses a compressed Parquet file into an anonymous temporary file,
+    one chunk at a time.
+
+    Parquet readers need random access, starting from the footer at the end of
+    the file, so a compressed stream cannot be decoded in place. The temporary
+    file lives in the system temporary directory, never underneath
+    MEDIA_ROOT, and is deleted as soon as it is closed.
+
+    NOTE: Parquet pages are usually compressed internally already; writing
+    files with e.g. 'compression="zstd"' avoids this step entirely.
+
+    Returns:
+        pyarrow.parquet.ParquetFile
+    """
+    spool = tempfile.TemporaryFile()
+    for chunk in decompressed_chunks(fp, compression):
+        spool.write(chunk)
+    spool.seek(0)
+    return pq.ParquetFile(spool)
+
+
+def open_parquet_upload(uploaded_file, compression=None):
+    """
+    Opens an uploaded Parquet file without copying it underneath MEDIA_ROOT.
+
+    Django spools large uploads to FILE_UPLOAD_TEMP_DIR and keeps small uploads
+    in memory. Spooled uploads are memory-mapped, so only the footer and the row
+    groups being decoded are paged in.
+
+    Args:
+        django.core.files.uploadedfile.UploadedFile
+        str: Compression of the upload, see spool_decompressed_parquet().
+
+    Returns:
+        pyarrow.parquet.ParquetFile
+    """
+    if compression is not None:
+        uploaded_file.seek(0)
+        return spool_decompressed_parquet(uploaded_file.file, compression)
+    if hasattr(uploaded_file, 'temporary_file_path'):
+        return pq.ParquetFile(
+            uploaded_file.temporary_file_path(),
+            memory_map=True
+        )
+    uploaded_file.seek(0)
+    return pq.ParquetFile(uploaded_file.file)
+
+
+def open_parquet_path(file_abspath, compression=None):
+    """
+    Opens a Parquet file stored on local disk, e.g. a DataFile underneath
+    MEDIA_ROOT. The file is memory-mapped, so only the footer and the row groups
+    being decoded are paged in.
+
+    Compressed files are kept compressed on disk, and decompressed with
+    spool_decompressed_parquet() instead.
+
+    Returns:
+        pyarrow.parquet.ParquetFile
+    """
+    if compression is not None:
+        with open(file_abspath, 'rb') as fp:
+            return spool_decompressed_parquet(fp, compression)
+    return pq.ParquetFile(file_abspath, memory_map=True)
+
+
+def read_file_chunks(file_abspath, on_progress=None, compression=None):
+    """
+    Yields a local file in COPY_BUFFER_SIZE chunks, decompressed on the fly if
+    it is compressed.
+
+    Args:
+        str: Absolute path of the file.
+        callable: Called with (rows, bytes) after each chunk. Rows are unknown
+            until text 'COPY' finishes, so are always reported as 0.
+        str: One of UPLOAD_COMPRESSIONS, or None if uncompressed.
+
+    Yields:
+        bytes
+    """
+    with open(file_abspath, 'rb') as fp:
+        if compression is not None:
+            yield from decompressed_chunks(fp, compression, on_progress)
+            return
+        while True:
+            chunk = fp.read(COPY_BUFFER_SIZE)
+            if not chunk:
+                break
+            yield chunk
+            if on_progress:
+                on_progress(0, len(chunk))
+
+
+def missing_parquet_columns(parquet_file, columns):
+    """
+    Returns requested column names that are absent from the Parquet schema.
+    """
+    available = set(parquet_file.schema.names)
+    return [
+        column.column_name
+        for column
+        in columns
+        if column.column_name not in available
+    ]
+
+
+def arrow_column_type(arrow_type):
+    """
+    Maps an Apache Arrow type, as read from a Parquet footer, to a whitelisted
+    column type.
+
+    Args:
+        pyarrow.DataType
+
+    Returns:
+        str: Key of COLUMN_TYPES.
+
+    Raises:
+        ValueError: No whitelisted column type can hold the Arrow type.
+    """
+    if pa.types.is_dictionary(arrow_type):
+        return arrow_column_type(arrow_type.value_type)
+    if pa.types.is_boolean(arrow_type):
+        return 'boolean'
+    if (
+        pa.types.is_int8(arrow_type) or
+        pa.types.is_int16(arrow_type) or
+        pa.types.is_uint8(arrow_type)
+    ):
+        return 'smallint'
+    if pa.types.is_int32(arrow_type) or pa.types.is_uint16(arrow_type):
+        return 'integer'
+    if pa.types.is_int64(arrow_type) or pa.types.is_uint32(arrow_type):
+        return 'bigint'
+    if pa.types.is_float16(arrow_type) or pa.types.is_float32(arrow_type):
+        return 'real'
+    if pa.types.is_float64(arrow_type):
+        return 'double precision'
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return 'text'
+    if pa.types.is_date(arrow_type):
+        return 'date'
+    if pa.types.is_timestamp(arrow_type):
+        return 'timestamptz' if arrow_type.tz else 'timestamp'
+    raise ValueError(f'No supported column type for Parquet type: {arrow_type}')
+
+
+def infer_columns(parquet_file):
+    """
+    Infers the 'columns' JSON schema contract from a Parquet file footer.
+
+    Only the footer metadata is read; with 'open_parquet_upload()' or
+    'open_parquet_path()' the file is memory-mapped, so no row groups are paged
+    in.
+
+    Args:
+        pyarrow.parquet.ParquetFile
+
+    Returns:
+        list: List of {'column_name': ..., 'column_type': ...} dicts.
+
+    Raises:
+        ValueError: A column has no whitelisted equivalent. The message names
+            every such column.
+    """
+    column_data = []
+    errors = []
+    for field in parquet_file.schema.to_arrow_schema():
+        try:
+            column_data.append({
+                'column_name': field.name,
+                'column_type': arrow_column_type(field.type)
+            })
+        except ValueError as e:
+            errors.append(f'{field.name}: {str(e)}')
+
+    if errors:
+        raise ValueError('; '.join(errors))
+    return column_data
+
+
+def incompatible_parquet_columns(parquet_file, columns):
+    """
+    Returns requested columns whose type cannot hold the type stored in the
+    Parquet file, e.g. 'int' requested for a string column.
+
+    Args:
+        pyarrow.parquet.ParquetFile
+        list(ColumnDefinition): Column definitions, all present in the file.
+
+    Returns:
+        list(str): Human readable descriptions of each mismatch.
+    """
+    arrow_schema = parquet_file.schema.to_arrow_schema()
+    mismatches = []
+    for column in columns:
+        arrow_type = arrow_schema[
+            arrow_schema.get_field_index(column.column_name)
+        ].type
+        try:
+            parquet_family = COLUMN_TYPES[arrow_column_type(arrow_type)].family
+        except ValueError as e:
+            mismatches.append(f'{column.column_name}: {str(e)}')
+            continue
+
+        if column.family not in COMPATIBLE_FAMILIES[parquet_family]:
+            mismatches.append(
+                f'{column.column_name}: {column.column_type} cannot hold Parquet type {arrow_type}'
+            )
+    return mismatches
+
+
+def arrow_validity(array):
+    """
+    Returns which values of a 'pyarrow.Array' are not null, unpacked from its
+    validity bitmap.
+
+    Returns:
+        numpy.ndarray: Boolean mask, one entry per value.
+    """
+    bitmap = array.buffers()[0]
+    if bitmap is None or array.null_count == 0:
+        return np.ones(len(array), dtype=bool)
+    bits = np.unpackbits(
+        np.frombuffer(bitmap, dtype=np.uint8),
+        bitorder='little'
+    )
+    return bits[array.offset:array.offset + len(array)].astype(bool)
+
+
+def arrow_values(array):
+    """
+    Returns the values of a fixed-width 'pyarrow.Array' (booleans, integers,
+    floats, dates, and timestamps) as a numpy view of its data buffer, without
+    converting each value to Python. Values under nulls are undefined.
+
+    NOTE: Reads buffers directly, rather than through 'Array.to_numpy()' or
+    'pyarrow.compute', neither of which handle nulls in 'pyarrow' 0.17.
+
+    Returns:
+        numpy.ndarray
+
+    Raises:
+        ValueError: The array is not of a fixed-width type.
+    """
+    (start, end) = (array.offset, array.offset + len(array))
+    data = array.buffers()[1]
+    if pa.types.is_boolean(array.type):
+        bits = np.unpackbits(
+            np.frombuffer(data, dtype=np.uint8),
+            bitorder='little'
+        )
+        return bits[start:end].astype(bool)
+
+    dtype = ARROW_NUMPY_DTYPES.get(str(array.type))
+    if dtype is None and pa.types.is_timestamp(array.type):
+        dtype = '<i8'
+    if dtype is None:
+        raise ValueError(f'Not a fixed-width Arrow type: {array.type}')
+    return np.frombuffer(data, dtype=dtype, count=end)[start:end]
+
+
+def arrow_strings(array):
+    """
+    Returns the UTF-8 data of a string 'pyarrow.Array' as numpy views of its
+    offsets and data buffers.
+
+    Returns:
+        (numpy.ndarray, numpy.ndarray, numpy.ndarray): Start offset and byte
+            length of each value within the data, and the data bytes.
+    """
+    (start, end) = (array.offset, array.offset + len(array))
+    offsets = np.frombuffer(
+        array.buffers()[1],
+        dtype=(
+            '<i8'
+            if pa.types.is_large_string(array.type)
+            else '<i4'
+        ),
+        count=end + 1
+    )[start:end + 1].astype(np.int64)
+    data = array.buffers()[2]
+    data = (
+        np.frombuffer(data, dtype=np.uint8)
+        if data is not None
+        else np.zeros(0, dtype=np.uint8)
+    )
+    return (offsets[:-1], np.diff(offsets), data)
+
+
+def _microseconds(values, arrow_type):
+    """
+    Converts Arrow timestamp values to microseconds since the Unix epoch. Arrow
+    stores timezone-aware timestamps in UTC already.
+    """
+    values = values.astype(np.int64)
+    if arrow_type.unit == 's':
+        return values * 1000000
+    if arrow_type.unit == 'ms':
+        return values * 1000
+    if arrow_type.unit == 'ns':
+        return values // 1000
+    return values
+
+
+def _binary_values(array, column):
+    """
+    Converts the values of a fixed-width 'pyarrow.Array' to the big-endian
+    binary COPY representation of a column's type.
+
+    Returns:
+        numpy.ndarray: One fixed-width value per row.
+
+    Raises:
+        ValueError: An integer does not fit the column type.
+    """
+    values = arrow_values(array)
+    if column.family == 'date':
+        if pa.types.is_date64(array.type):
+            values = values // MILLISECONDS_PER_DAY
+        return (values.astype(np.int64) - POSTGRESQL_EPOCH_DAYS).astype('>i4')
+    if column.family == 'timestamp':
+        return (
+            _microseconds(values, array.type) - POSTGRESQL_EPOCH_MICROSECONDS
+        ).astype('>i8')
+
+    dtype = np.dtype(BINARY_DTYPES[column.column_type.split('(')[0]])
+    if column.family == 'integer' and len(values):
+        valid = arrow_validity(array)
+        if valid.any():
+            limits = np.iinfo(dtype)
+            (low, high) = (values[valid].min(), values[valid].max())
+            if low < limits.min or high > limits.max:
+                raise ValueError(f'Value out of range for {column.column_type}: {column.column_name}')
+    return values.astype(dtype)
+
+
+def _encode_fields(array, column):
+    """
+    Encodes one column of a record batch into binary COPY field data.
+
+    Dictionary-encoded columns are encoded once per dictionary value, then
+    gathered by index. Columns loaded as text from non-string Parquet types are
+    the only ones still converted one value at a time in Python.
+
+    Returns:
+        (numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray): Which
+            rows are not null, the start offset and byte length of each field
+            within the data, and the data bytes.
+    """
+    if pa.types.is_dictionary(array.type):
+        (_, starts, lengths, data) = _encode_fields(array.dictionary, column)
+        indices = arrow_values(array.indices).astype(np.int64)
+        valid = arrow_validity(array.indices)
+        indices[~valid] = 0
+        return (valid, starts[indices], lengths[indices], data)
+
+    valid = arrow_validity(array)
+    if column.family != 'text':
+        values = _binary_values(array, column)
+        width = values.dtype.itemsize
+        return (
+            valid,
+            np.arange(len(array), dtype=np.int64) * width,
+            np.full(len(array), width, dtype=np.int64),
+            values.view(np.uint8)
+        )
+
+    if pa.types.is_string(array.type) or pa.types.is_large_string(array.type):
+        (starts, lengths, data) = arrow_strings(array)
+        return (valid, starts, lengths, data)
+
+    encoded = [
+        _encode_text(value) if value is not None else b''
+        for value
+        in array.to_pylist()
+    ]
+    lengths = np.array([len(data) for data in encoded], dtype=np.int64)
+    return (
+        valid,
+        np.cumsum(lengths) - lengths,
+        lengths,
+        np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    )
+
+
+def _scatter(out, destinations, data, sources, lengths):
+    """
+    Copies byte ranges of 'data' into 'out': range i is 'lengths[i]' bytes
+    long, and moves from 'sources[i]' to 'destinations[i]'.
+
+    Ranges no wider than the widest binary value (8 bytes) are copied in one
+    gather, whose index arrays are bounded by the number of rows. Anything else
+    is sliced one row at a time, so that no index array ever grows with the
+    number of data bytes.
+    """
+    if not len(lengths):
+        return
+    width = int(lengths[0])
+    if width <= 8 and (lengths == width).all():
+        if width:
+            byte_offsets = np.arange(width, dtype=np.int64)
+            out[destinations[:, None] + byte_offsets] = data[
+                sources[:, None] + byte_offsets
+            ]
+        return
+
+    out_view = memoryview(out)
+    data_view = memoryview(data)
+    for (destination, source, length) in zip(
+        destinations.tolist(),
+        sources.tolist(),
+        lengths.tolist()
+    ):
+        out_view[destination:destination + length] = data_view[source:source + length]
+
+
+def _encode_batch(batch, columns):
+    """
+    Encodes one 'pyarrow.RecordBatch' into PostgreSQL binary COPY tuples.
+
+    Each column is converted to big-endian binary values with numpy in one
+    pass, and the tuples are then laid out in one preallocated buffer: every
+    field is a 4-byte length prefix (-1 for NULL) followed by its data, and
+    every tuple a 2-byte field count followed by its fields.
+    """
+    num_rows = batch.num_rows
+    fields = [
+        _encode_fields(batch.column(index), column)
+        for (index, column)
+        in enumerate(columns)
+    ]
+
+    row_lengths = np.full(num_rows, 2 + 4 * len(columns), dtype=np.int64)
+    for (valid, starts, lengths, data) in fields:
+        row_lengths += np.where(valid, lengths, 0)
+    positions = np.cumsum(row_lengths) - row_lengths
+
+    out = np.empty(int(row_lengths.sum()), dtype=np.uint8)
+    byte_offsets = np.arange(2, dtype=np.int64)
+    out[positions[:, None] + byte_offsets] = np.frombuffer(
+        struct.pack('!h', len(columns)),
+        dtype=np.uint8
+    )
+    positions = positions + 2
+
+    byte_offsets = np.arange(4, dtype=np.int64)
+    for (valid, starts, lengths, data) in fields:
+        out[positions[:, None] + byte_offsets] = np.where(
+            valid,
+            lengths,
+            -1
+        ).astype('>i4').view(np.uint8).reshape(num_rows, 4)
+        positions = positions + 4
+        _scatter(
+            out,
+            positions[valid],
+            data,
+            starts[valid],
+            lengths[valid]
+        )
+        positions = positions + np.where(valid, lengths, 0)
+
+    return out.tobytes()
+
+
+def row_group_compressed_size(parquet_file, row_group):
+    """
+    Returns the on-disk (compressed) size of one Parquet row group, in bytes.
+    """
+    metadata = parquet_file.metadata.row_group(row_group)
+    return sum(
+        metadata.column(index).total_compressed_size
+        for index
+        in range(metadata.num_columns)
+    )
+
+
+def parquet_copy_chunks(parquet_file, columns, row_groups=None, on_progress=None, profiler=None):
+    """
+    Yields PostgreSQL binary COPY data decoded from Parquet row groups.
+
+    Args:
+        pyarrow.parquet.ParquetFile: Opened Parquet file.
+        list(ColumnDefinition): Column definitions, matched by name.
+        list(int): Row groups to decode; all row groups if None.
+        callable: Called with (rows, bytes) after each encoded batch. Bytes are
+            the compressed size of the row group, reported with its first
+            batch.
+        profiles.ColumnProfiler: Updated with each batch before it is encoded.
+
+    Yields:
+        bytes
+    """
+    column_names = [column.column_name for column in columns]
+    if row_groups is None:
+        row_groups = range(parquet_file.num_row_groups)
+
+    yield PGCOPY_HEADER
+    for row_group in row_groups:
+        num_bytes = row_group_compressed_size(parquet_file, row_group)
+        table = parquet_file.read_row_group(row_group, columns=column_names)
+        for batch in table.to_batches(COPY_BATCH_SIZE):
+            if profiler is not None:
+                profiler.update(batch)
+            yield _encode_batch(batch, columns)
+            if on_progress:
+                on_progress(batch.num_rows, num_bytes)
+            num_bytes = 0
+    yield PGCOPY_TRAILER
+
+
+def copy_parquet(psql_cursor, table_name, columns, parquet_file, row_groups=None, on_progress=None, profiler=None):
+    """
+    Streams Parquet row groups into an existing table with binary 'COPY'.
+
+    Returns:
+        int: Number of rows copied.
+    """
+    stream = CopyStream(
+        parquet_copy_chunks(
+            parquet_file,
+            columns,
+            row_groups=row_groups,
+            on_progress=on_progress,
+            profiler=profiler
+        )
+    )
+    psql_cursor.copy_expert(
+        copy_from_stdin_sql(table_name, columns, sql.SQL('FORMAT binary')),
+        stream,
+        size=COPY_BUFFER_SIZE
+    )
+    return copied_row_count(psql_cursor)
+
+
+def split_row_groups(parquet_file, parallelism):
+    """
+    Splits the row groups of a Parquet file into at most 'parallelism' buckets
+    of roughly equal compressed size, largest row groups first.
+
+    Returns:
+        list(list(int)): Row group indexes per bucket, in file order.
+    """
+    num_buckets = max(1, min(parallelism, parquet_file.num_row_groups))
+    buckets = [[] for index in range(num_buckets)]
+    bucket_sizes = [0] * num_buckets
+
+    row_group_sizes = sorted(
+        (
+            (row_group_compressed_size(parquet_file, row_group), row_group)
+            for row_group
+            in range(parquet_file.num_row_groups)
+        ),
+        reverse=True
+    )
+    for (size, row_group) in row_group_sizes:
+        index = bucket_sizes.index(min(bucket_sizes))
+        buckets[index].append(row_group)
+        bucket_sizes[index] += size
+
+    return [
+        sorted(bucket)
+        for bucket
+        in buckets
+        if bucket
+    ]
+
+
+def _copy_row_groups_proc(db_schema, table_name, column_data, file_abspath, row_groups, profiler_class=None):
+    """
+    Task definition for one parallel load process. Opens its own connection and
+    its own memory map of the Parquet file, copies its row groups into the
+    staging table, and commits.
+
+    NOTE: Arguments and results must be picklable, since this runs in a
+    separate process.
+
+    Returns:
+        (int, profiles.ColumnProfiler): Number of rows copied, and the profile
+            of those rows if a profiler class was given.
+    """
+    columns = parse_columns(column_data)
+    profiler = (
+        profiler_class([column.column_name for column in columns])
+        if profiler_class is not None
+        else None
+    )
+    with core_utils.PostgreSQLCursor(db_schema=db_schema) as (psql_conn, psql_cursor):
+        rows_copied = copy_parquet(
+            psql_cursor,
+            table_name,
+            columns,
+            open_parquet_path(file_abspath),
+            row_groups=row_groups,
+            profiler=profiler
+        )
+        psql_conn.commit()
+    return (rows_copied, profiler)
+
+
+def copy_parquet_parallel(db_schema, table_name, column_data, file_abspath, parallelism, temp_table_name, indexes=(), unlogged=False, partition=None, profiler=None):
+    """
+    Creates a table from a Parquet file on local disk, loading row groups
+    concurrently over several connections.
+
+    Row groups are split into buckets, and each bucket is decoded in its own
+    process and copied over its own connection into a shared staging table.
+    Since encoding binary 'COPY' data is CPU-bound, processes rather than
+    threads are used. Once every bucket has committed, the staging table is
+    renamed to the requested table name, so the table only ever becomes visible
+    fully loaded. On failure, the staging table is dropped.
+
+    The rename and 'finalize_table()' run in one transaction, so an 'UNLOGGED'
+    staging table is only ever visible under its final name once it is logged
+    and indexed.
+
+    Args:
+        str: User schema name.
+        str: Table name.
+        list: 'columns' JSON schema contract, with whitelisted column types.
+        str: Absolute path of the Parquet file.
+        int: Maximum number of concurrent connections.
+        str: Name of the staging table.
+        list(IndexDefinition): Indexes to build after loading.
+        bool: Load into an 'UNLOGGED' staging table.
+        partitioning.PartitionDefinition: Partitioning, if any. Child
+            partitions are named after the final table name.
+        profiles.ColumnProfiler: Merged with the profile of each process.
+
+    Returns:
+        int: Number of rows copied.
+    """
+    columns = parse_columns(column_data)
+    parquet_file = open_parquet_path(file_abspath)
+    row_group_buckets = split_row_groups(parquet_file, parallelism)
+
+    with core_utils.PostgreSQLCursor(db_schema=db_schema) as (psql_conn, psql_cursor):
+        create_table(
+            psql_cursor,
+            temp_table_name,
+            columns,
+            unlogged=unlogged,
+            partition=partition,
+            parquet_file=parquet_file,
+            partition_prefix=table_name
+        )
+        psql_conn.commit()
+
+    try:
+        with futures.ProcessPoolExecutor(max_workers=len(row_group_buckets)) as executor:
+            results = [
+                executor.submit(
+                    _copy_row_groups_proc,
+                    str(db_schema),
+                    temp_table_name,
+                    column_data,
+                    file_abspath,
+                    row_groups,
+                    type(profiler) if profiler is not None else None
+                )
+                for row_groups
+                in row_group_buckets
+            ]
+            rows_copied = 0
+            for result in results:
+                (bucket_rows_copied, bucket_profiler) = result.result()
+                rows_copied += bucket_rows_copied
+                if profiler is not None:
+                    profiler.merge(bucket_profiler)
+
+        with core_utils.PostgreSQLCursor(db_schema=db_schema) as (psql_conn, psql_cursor):
+            psql_cursor.execute(
+                sql.SQL('ALTER TABLE {temp_table_name} RENAME TO {table_name}').format(
+                    temp_table_name=sql.Identifier(temp_table_name),
+                    table_name=sql.Identifier(table_name)
+                )
+            )
+            finalize_table(
+                psql_cursor,
+                table_name,
+                indexes=indexes,
+                unlogged=unlogged
+            )
+            psql_conn.commit()
+    except Exception:
+        with core_utils.PostgreSQLCursor(db_schema=db_schema) as (psql_conn, psql_cursor):
+            psql_cursor.execute(
+                sql.SQL('DROP TABLE IF EXISTS {temp_table_name}').format(
+                    temp_table_name=sql.Identifier(temp_table_name)
+                )
+            )
+            psql_conn.commit()
+        raise
+
+    return rows_copied
+
+
+def create_foreign_table_sql(table_name, columns, file_abspath, sorted_columns=()):
+    """
+    Returns a 'CREATE FOREIGN TABLE' statement over a Parquet file through
+    'parquet_fdw'.
+
+    Args:
+        str: Foreign table name.
+        list(ColumnDefinition): Validated column definitions.
+        str: Absolute path of the Parquet file, readable by the database.
+        list(str): Columns the file is sorted by, if any. Lets the planner
+            skip sorting on them, see the 'parquet_fdw' 'sorted' option.
+
+    Returns:
+        psycopg2.sql.Composed
+    """
+    options = [
+        sql.SQL('filename {file_abspath}').format(
+            file_abspath=sql.Literal(file_abspath)
+        )
+    ]
+    if sorted_columns:
+        options.append(
+            sql.SQL('sorted {sorted_columns}').format(
+                sorted_columns=sql.Literal(' '.join(sorted_columns))
+            )
+        )
+
+    return sql.SQL('CREATE FOREIGN TABLE {table_name} ({columns}) SERVER parquet_srv OPTIONS ({options})').format(
+        table_name=sql.Identifier(table_name),
+        columns=column_definitions_sql(columns),
+        options=sql.SQL(', ').join(options)
+    )
+
+
+def copy_parquet_fdw(psql_cursor, table_name, columns, file_abspath, temp_table_name, unlogged=False):
+    """
+    Creates a table from a Parquet file staged underneath MEDIA_ROOT, by way of
+    a temporary 'parquet_fdw' foreign table.
+
+    Args:
+        psycopg2.extensions.cursor: Cursor within the load transaction.
+        str: Table name.
+        list(ColumnDefinition): Validated column definitions.
+        str: Absolute path of the Parquet file, readable by the database.
+        str: Name of the temporary foreign table.
+        bool: Create an 'UNLOGGED' table, see 'finalize_table()'.
+
+    Returns:
+        int: Number of rows copied.
+    """
+    create_foreign_table_sql_query = create_foreign_table_sql(
+        temp_table_name,
+        columns,
+        file_abspath
+    )
+
+    copy_table_sql_query = sql.SQL(
+        'CREATE {unlogged}TABLE {table_name} AS TABLE {temp_table_name} WITH DATA'
+    ).format(
+        unlogged=sql.SQL('UNLOGGED ' if unlogged else ''),
+        table_name=sql.Identifier(table_name),
+        temp_table_name=sql.Identifier(temp_table_name)
+    )
+
+    drop_temp_table_sql_query = sql.SQL(
+        'DROP FOREIGN TABLE {temp_table_name}'
+    ).format(
+        temp_table_name=sql.Identifier(temp_table_name)
+    )
+
+    psql_cursor.execute(create_foreign_table_sql_query)
+    psql_cursor.execute(copy_table_sql_query)
+    rows_copied = psql_cursor.rowcount
+    psql_cursor.execute(drop_temp_table_sql_query)
+    return rows_copied
+
+
+def clone_table(psql_cursor, source_table_name, table_name, unlogged=False):
+    """
+    Creates a table as a server-side copy of an existing table, within the
+    caller's transaction. Column types, defaults, and 'CHECK' / 'NOT NULL'
+    constraints are carried over; indexes are not, so that they can be built
+    once afterwards by 'finalize_table()'.
+
+    Returns:
+        int: Number of rows copied.
+    """
+    psql_cursor.execute(
+        sql.SQL('CREATE {unlogged}TABLE {table_name} (LIKE {source_table_name} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)').format(
+            unlogged=sql.SQL('UNLOGGED ' if unlogged else ''),
+            table_name=sql.Identifier(table_name),
+            source_table_name=sql.Identifier(source_table_name)
+        )
+    )
+    psql_cursor.execute(
+        sql.SQL('INSERT INTO {table_name} SELECT * FROM {source_table_name}').format(
+            table_name=sql.Identifier(table_name),
+            source_table_name=sql.Identifier(source_table_name)
+        )
+    )
+    return psql_cursor.rowcount
+
+
+def copied_row_count(psql_cursor):
+    """
+    Returns the number of rows reported by the last 'COPY' command.
+
+    NOTE: Older 'psycopg2' releases do not populate 'cursor.rowcount' after
+    'copy_expert()', but the command status tag is always 'COPY <count>'.
+    """
+    if psql_cursor.rowcount is not None and psql_cursor.rowcount >= 0:
+        return psql_cursor.rowcount
+    return int((psql_cursor.statusmessage or 'COPY 0').split()[-1])
+
+
+def copy_csv(psql_cursor, table_name, columns, chunks, delimiter=',', header=True):
+    """
+    Streams delimited text into an existing table with text 'COPY'.
+
+    Values are coerced into column types by PostgreSQL itself as they are
+    parsed, so malformed values fail the whole 'COPY' (and the transaction)
+    with the offending line number in the error message.
+
+    Args:
+        psycopg2.extensions.cursor: Cursor within the load transaction.
+        str: Table name.
+        list(ColumnDefinition): Column definitions, in file order.
+        iterable(bytes): Raw upload chunks, e.g. 'UploadedFile.chunks()'.
+        str: Field delimiter; one of CSV_DELIMITERS.values().
+        bool: Whether the first line is a header line to skip.
+
+    Returns:
+        int: Number of rows copied.
+    """
+    options = sql.SQL('FORMAT csv, HEADER {header}, DELIMITER {delimiter}').format(
+        header=sql.SQL('true' if header else 'false'),
+        delimiter=sql.Literal(delimiter)
+    )
+    psql_cursor.copy_expert(
+        copy_from_stdin_sql(table_name, columns, options),
+        CopyStream(chunks),
+        size=COPY_BUFFER_SIZE
+    )
+    return copied_row_count(psql_cursor)
+
+
+def upsert_sql(table_name, columns, staging_table_name, upsert_keys):
+    """
+    Composes the merge of a staging table into a target table, keyed on
+    'upsert_keys', returning the number of inserted and updated rows.
+
+    Only the last occurrence of each key within the staging table is merged, as
+    'ON CONFLICT DO UPDATE' cannot touch the same row twice in one command.
+    Existing rows whose values are unchanged are skipped entirely by the 'WHERE'
+    clause, so they are neither rewritten nor counted.
+
+    NOTE: '(xmax = 0)' is true only for freshly inserted row versions, which is
+    what distinguishes inserts from updates in 'RETURNING'.
+    """
+    column_list = sql.SQL(', ').join(
+        sql.Identifier(column.column_name)
+        for column
+        in columns
+    )
+    key_list = sql.SQL(', ').join(
+        sql.Identifier(key)
+        for key
+        in upsert_keys
+    )
+    update_columns = [
+        column.column_name
+        for column
+        in columns
+        if column.column_name not in upsert_keys
+    ]
+
+    if update_columns:
+        conflict_action = sql.SQL('DO UPDATE SET {assignments} WHERE ({target_values}) IS DISTINCT FROM ({excluded_values})').format(
+            assignments=sql.SQL(', ').join(
+                sql.SQL('{column} = EXCLUDED.{column}').format(
+                    column=sql.Identifier(column_name)
+                )
+                for column_name
+                in update_columns
+            ),
+            target_values=sql.SQL(', ').join(
+                sql.Identifier(table_name, column_name)
+                for column_name
+                in update_columns
+            ),
+            excluded_values=sql.SQL(', ').join(
+                sql.SQL('EXCLUDED.{column}').format(
+                    column=sql.Identifier(column_name)
+                )
+                for column_name
+                in update_columns
+            )
+        )
+    else:
+        conflict_action = sql.SQL('DO NOTHING')
+
+    return sql.SQL(
+        'WITH merged AS ('
+        'INSERT INTO {table_name} ({columns}) '
+        'SELECT DISTINCT ON ({keys}) {columns} FROM {staging_table_name} ORDER BY {keys}, ctid DESC '
+        'ON CONFLICT ({keys}) {conflict_action} '
+        'RETURNING (xmax = 0) AS inserted'
+        ') '
+        'SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM merged'
+    ).format(
+        table_name=sql.Identifier(table_name),
+        columns=column_list,
+        keys=key_list,
+        staging_table_name=sql.Identifier(staging_table_name),
+        conflict_action=conflict_action
+    )
+
+
+def merge_parquet(psql_cursor, table_name, columns, parquet_file, staging_table_name, upsert_keys=None, on_progress=None, profiler=None):
+    """
+    Loads Parquet row groups into an existing table, within the caller's
+    transaction.
+
+    Appends (no 'upsert_keys') are copied straight into the target table, as
+    there is nothing to merge. Upserts are copied into a temporary staging
+    table first, which is dropped on commit, and then merged with 'INSERT ...
+    ON CONFLICT' so that only new and changed rows are written to the target.
+    Either way, the target is analyzed again afterwards.
+
+    Args:
+        psycopg2.extensions.cursor: Cursor within the load transaction.
+        str: Existing table name.
+        list(ColumnDefinition): Columns to load; a subset of the table columns.
+        pyarrow.parquet.ParquetFile: Opened Parquet file.
+        str: Name for the temporary staging table.
+        list(str): Conflict columns, backed by a unique index on the table.
+        callable: Progress callback, see 'parquet_copy_chunks()'.
+        profiles.ColumnProfiler: Profiles the loaded rows.
+
+    Returns:
+        (int, int, int): Rows copied, inserted, and updated.
+    """
+    analyze_sql_query = sql.SQL('ANALYZE {table_name}').format(
+        table_name=sql.Identifier(table_name)
+    )
+
+    if not upsert_keys:
+        rows_copied = copy_parquet(
+            psql_cursor,
+            table_name,
+            columns,
+            parquet_file,
+            on_progress=on_progress,
+            profiler=profiler
+        )
+        psql_cursor.execute(analyze_sql_query)
+        return (rows_copied, rows_copied, 0)
+
+    # 'LIKE' carries over column types and defaults, but not indexes, so the
+    # staging table is as cheap to load as possible.
+    psql_cursor.execute(
+        sql.SQL('CREATE TEMPORARY TABLE {staging_table_name} (LIKE {table_name} INCLUDING DEFAULTS) ON COMMIT DROP').format(
+            staging_table_name=sql.Identifier(staging_table_name),
+            table_name=sql.Identifier(table_name)
+        )
+    )
+    rows_copied = copy_parquet(
+        psql_cursor,
+        staging_table_name,
+        columns,
+        parquet_file,
+        on_progress=on_progress,
+        profiler=profiler
+    )
+    # Autovacuum never analyzes temporary tables, so give the planner row
+    # estimates for the merge join.
+    psql_cursor.execute(
+        sql.SQL('ANALYZE {staging_table_name}').format(
+            staging_table_name=sql.Identifier(staging_table_name)
+        )
+    )
+    psql_cursor.execute(
+        upsert_sql(table_name, columns, staging_table_name, upsert_keys)
+    )
+    (rows_inserted, rows_updated) = psql_cursor.fetchone()
+    psql_cursor.execute(analyze_sql_query)
+    return (rows_copied, rows_inserted, rows_updated)
@@ -0,0 +1,46 @@
+"""
+Custom 'django-admin' command in order to start a pool of background processes
+that load queued table ingests.
+
+Like 'startbroker', the queue lives in the database (the 'tables_ingest' table),
+so no message broker like Celery / RabbitMQ / Redis is needed. Running the pool
+as its own top-level command lets a Docker container extend the base image and
+scale ingest capacity separately from the webapp processes serving HTTP.
+"""
+
+import multiprocessing
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from tables import workers
+
+
+class Command(BaseCommand):
+    help = 'Starts background processes that load queued table ingests into PostgreSQL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=multiprocessing.cpu_count(),
+            help='Number of ingest worker processes to run.'
+        )
+
+    def handle(self, *args, **kwargs):
+        # NOTE: Django database connections must not be shared across forked
+        # processes. Each worker opens its own on first use.
+        connections.close_all()
+
+        processes = [
+            multiprocessing.Process(
+                target=workers.ingest_worker_proc,
+                name=f'ingest-worker-{index}'
+            )
+            for index
+            in range(kwargs['workers'])
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
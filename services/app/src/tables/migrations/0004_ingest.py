@@ -0,0 +1,37 @@
+# Generated by Django 3.0.4 on 2026-10-18 09:12
+
+from django.conf import settings
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tables', '0003_auto_20200525_1631'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ingest',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table_name', models.CharField(max_length=255)),
+                ('columns', django.contrib.postgres.fields.jsonb.JSONField()),
+                ('file_format', models.CharField(choices=[('parquet', 'Apache Parquet'), ('csv', 'Comma or tab delimited text')], default='parquet', max_length=16)),
+                ('ingest_mode', models.CharField(choices=[('fdw', 'Stage upload under MEDIA_ROOT and copy through parquet_fdw'), ('stream', 'Stream Parquet row groups through binary COPY')], default='fdw', max_length=16)),
+                ('options', django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=dict)),
+                ('phase', models.CharField(choices=[('QUEUED', 'Upload saved, waiting for an ingest worker'), ('LOADING', 'Copying rows into the table'), ('FINALIZING', 'Committing the table and removing the upload'), ('SUCCEEDED', 'Table created'), ('FAILED', 'Ingest failed, see error')], default='QUEUED', max_length=16)),
+                ('bytes_total', models.BigIntegerField(default=0)),
+                ('bytes_read', models.BigIntegerField(default=0)),
+                ('rows_copied', models.BigIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('datafile', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='tables.DataFile')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
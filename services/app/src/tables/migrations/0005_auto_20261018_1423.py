@@ -0,0 +1,18 @@
+# Generated by Django 3.0.4 on 2026-10-18 14:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tables', '0004_ingest'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ingest',
+            name='ingest_mode',
+            field=models.CharField(choices=[('fdw', 'Stage upload under MEDIA_ROOT and copy through parquet_fdw'), ('stream', 'Stream Parquet row groups through binary COPY'), ('parallel', 'Copy Parquet row groups concurrently over several connections')], default='fdw', max_length=16),
+        ),
+    ]
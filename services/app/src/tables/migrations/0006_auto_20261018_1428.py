@@ -0,0 +1,33 @@
+# Generated by Django 3.0.4 on 2026-10-18 14:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tables', '0005_auto_20261018_1423'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingest',
+            name='rows_inserted',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ingest',
+            name='rows_updated',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ingest',
+            name='write_mode',
+            field=models.CharField(choices=[('create', 'Create a new table'), ('append', 'Append rows to an existing table'), ('upsert', 'Insert or update rows of an existing table by key')], default='create', max_length=16),
+        ),
+        migrations.AlterField(
+            model_name='ingest',
+            name='phase',
+            field=models.CharField(choices=[('QUEUED', 'Upload saved, waiting for an ingest worker'), ('LOADING', 'Copying rows into the table'), ('FINALIZING', 'Committing the table and removing the upload'), ('SUCCEEDED', 'Table created or rows merged'), ('FAILED', 'Ingest failed, see error')], default='QUEUED', max_length=16),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.0.4 on 2026-10-18 14:37
+
+from django.conf import settings
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tables', '0007_auto_20261018_1430'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexBuild',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('relation_name', models.CharField(max_length=255)),
+                ('index_name', models.CharField(max_length=63)),
+                ('definition', django.contrib.postgres.fields.jsonb.JSONField()),
+                ('phase', models.CharField(choices=[('QUEUED', 'Waiting for an ingest worker'), ('BUILDING', 'Running CREATE INDEX CONCURRENTLY'), ('SUCCEEDED', 'Index built'), ('FAILED', 'Build failed and the invalid index was dropped, see error')], default='QUEUED', max_length=16)),
+                ('backend_pid', models.IntegerField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
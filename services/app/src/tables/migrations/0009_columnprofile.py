@@ -0,0 +1,35 @@
+# Generated by Django 3.0.4 on 2026-10-18 14:42
+
+import django.contrib.postgres.fields.jsonb
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tables', '0008_indexbuild'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ColumnProfile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('column_name', models.CharField(max_length=63)),
+                ('column_type', models.CharField(max_length=64)),
+                ('row_count', models.BigIntegerField(default=0)),
+                ('null_count', models.BigIntegerField(default=0)),
+                ('null_fraction', models.FloatField(blank=True, null=True)),
+                ('distinct_count', models.BigIntegerField(blank=True, null=True)),
+                ('min_value', django.contrib.postgres.fields.jsonb.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('max_value', django.contrib.postgres.fields.jsonb.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('table', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='column_profiles', to='tables.Table')),
+            ],
+            options={
+                'unique_together': {('table', 'column_name')},
+            },
+        ),
+    ]
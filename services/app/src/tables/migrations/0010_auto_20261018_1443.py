@@ -0,0 +1,32 @@
+# Generated by Django 3.0.4 on 2026-10-18 14:43
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tables', '0009_columnprofile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='table',
+            name='datafile',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='tables.DataFile'),
+        ),
+        migrations.CreateModel(
+            name='HotSlice',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('view_name', models.CharField(max_length=63)),
+                ('columns', django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=list)),
+                ('filters', django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=list)),
+                ('refreshed', models.DateTimeField(blank=True, null=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('table', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hot_slices', to='tables.Table')),
+            ],
+        ),
+    ]
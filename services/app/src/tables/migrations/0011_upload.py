@@ -0,0 +1,34 @@
+# Generated by Django 3.0.4 on 2026-10-18 14:45
+
+from django.conf import settings
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tables', '0010_auto_20261018_1443'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Upload',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_name', models.CharField(blank=True, default='', max_length=255)),
+                ('total_size', models.BigIntegerField()),
+                ('content_hash', models.CharField(blank=True, default='', max_length=64)),
+                ('chunks', django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=list)),
+                ('bytes_received', models.BigIntegerField(default=0)),
+                ('phase', models.CharField(choices=[('RECEIVING', 'Waiting for byte ranges of the file'), ('COMPLETE', 'Every byte received and the file queued for ingest')], default='RECEIVING', max_length=16)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('datafile', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='tables.DataFile')),
+                ('ingest', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='tables.Ingest')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
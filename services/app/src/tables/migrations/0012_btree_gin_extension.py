@@ -0,0 +1,15 @@
+# Generated by Django 3.0.4 on 2026-10-18 15:40
+
+from django.contrib.postgres.operations import BtreeGinExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tables', '0011_upload'),
+    ]
+
+    operations = [
+        BtreeGinExtension(),
+    ]
@@ -5,7 +5,10 @@ Django models for tables service.
 import os
 
 from django.conf import settings
+from django.contrib.postgres import fields as psql_fields
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils.translation import gettext_lazy as _
 
 from authentication import models as auth_models
 
@@ -17,6 +20,31 @@ TABLE_ROOT = os.path.join(
 )
 
 
+class EnumIngestModes(models.TextChoices):
+    FDW = 'fdw',_('Stage upload under MEDIA_ROOT and copy through parquet_fdw')
+    STREAM = 'stream',_('Stream Parquet row groups through binary COPY')
+    PARALLEL = 'parallel',_('Copy Parquet row groups concurrently over several connections')
+
+
+class EnumFileFormats(models.TextChoices):
+    PARQUET = 'parquet',_('Apache Parquet')
+    CSV = 'csv',_('Comma or tab delimited text')
+
+
+class EnumWriteModes(models.TextChoices):
+    CREATE = 'create',_('Create a new table')
+    APPEND = 'append',_('Append rows to an existing table')
+    UPSERT = 'upsert',_('Insert or update rows of an existing table by key')
+
+
+class EnumIngestPhases(models.TextChoices):
+    QUEUED = 'QUEUED',_('Upload saved, waiting for an ingest worker')
+    LOADING = 'LOADING',_('Copying rows into the table')
+    FINALIZING = 'FINALIZING',_('Committing the table and removing the upload')
+    SUCCEEDED = 'SUCCEEDED',_('Table created or rows merged')
+    FAILED = 'FAILED',_('Ingest failed, see error')
+
+
 class DataFile(models.Model):
     """
     Model for data files uploaded to TinyDevCRM.
@@ -37,6 +65,14 @@ class DataFile(models.Model):
         blank=False,
         null=False
     )
+    # SHA-256 hex digest of the upload, computed while it streams in. See
+    # 'tables/upload_handlers.py'.
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        db_index=True
+    )
 
     def __str__(self):
         return str(self.file.name)
@@ -61,3 +97,227 @@ class Table(models.Model):
         to_field='id',
         on_delete=models.PROTECT
     )
+    # SHA-256 hex digest of the upload this table was loaded from, and the
+    # 'columns' JSON schema contract it was loaded with, so that re-uploads of
+    # the same file can be short-circuited. Empty for tables not loaded from an
+    # upload.
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        db_index=True
+    )
+    source_columns = psql_fields.JSONField(null=True, blank=True)
+    # Parquet file backing a foreign table created via 'tables/create/foreign/'.
+    # Foreign tables read this file in place, so it is kept for as long as the
+    # table is. Null for heap tables.
+    datafile = models.ForeignKey(
+        DataFile,
+        on_delete=models.PROTECT,
+        to_field='file_id',
+        null=True,
+        blank=True
+    )
+
+
+class HotSlice(models.Model):
+    """
+    Model for hot slices: materialized views caching a projection and filter of
+    a foreign table, refreshed on demand. See 'tables/foreign.py'.
+    """
+    table = models.ForeignKey(
+        Table,
+        on_delete=models.CASCADE,
+        related_name='hot_slices'
+    )
+    view_name = models.CharField(max_length=63)
+    # Projected column names; empty for all columns.
+    columns = psql_fields.JSONField(default=list, blank=True)
+    # 'column:operator:value' filter expressions, see 'tables/query.py'.
+    filters = psql_fields.JSONField(default=list, blank=True)
+    refreshed = models.DateTimeField(null=True, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+
+class ColumnProfile(models.Model):
+    """
+    Model for the profile of one column of a table, recorded after every
+    ingest into the table. See 'tables/profiles.py'.
+
+    Minimum and maximum values are stored as JSON, with dates and timestamps as
+    ISO 8601 strings, so one model covers every column type.
+    """
+    table = models.ForeignKey(
+        Table,
+        on_delete=models.CASCADE,
+        related_name='column_profiles'
+    )
+    column_name = models.CharField(max_length=63)
+    column_type = models.CharField(max_length=64)
+    row_count = models.BigIntegerField(default=0)
+    null_count = models.BigIntegerField(default=0)
+    null_fraction = models.FloatField(null=True, blank=True)
+    # Planner estimate from 'pg_stats', not an exact count.
+    distinct_count = models.BigIntegerField(null=True, blank=True)
+    min_value = psql_fields.JSONField(
+        null=True,
+        blank=True,
+        encoder=DjangoJSONEncoder
+    )
+    max_value = psql_fields.JSONField(
+        null=True,
+        blank=True,
+        encoder=DjangoJSONEncoder
+    )
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('table', 'column_name')
+
+
+class Ingest(models.Model):
+    """
+    Model for tracking asynchronous table ingests.
+
+    The table itself is tracked by the Table model once the ingest succeeds.
+    This model exists so that the HTTP request can return as soon as the upload
+    is saved, and so that clients can poll 'tables/ingests/<id>/' for progress
+    while an ingest worker (see 'tables/workers.py') loads the data.
+
+    Rows in this table double as the work queue. Workers claim 'QUEUED' ingests
+    with 'SELECT ... FOR UPDATE SKIP LOCKED', so no separate message broker is
+    necessary. Running ingests touch 'updated' periodically; ingests left in
+    phase 'LOADING' by a worker that died stop doing so, and are claimed again
+    once TABLES_INGEST_STALE_SECONDS have passed.
+    """
+    table_name = models.CharField(max_length=255)
+    # 'columns' JSON schema contract, as sent by the client.
+    columns = psql_fields.JSONField()
+    file_format = models.CharField(
+        max_length=16,
+        choices=EnumFileFormats.choices,
+        default=EnumFileFormats.PARQUET
+    )
+    ingest_mode = models.CharField(
+        max_length=16,
+        choices=EnumIngestModes.choices,
+        default=EnumIngestModes.FDW
+    )
+    write_mode = models.CharField(
+        max_length=16,
+        choices=EnumWriteModes.choices,
+        default=EnumWriteModes.CREATE
+    )
+    # Format-specific options, e.g. CSV delimiter and header.
+    options = psql_fields.JSONField(default=dict, blank=True)
+    datafile = models.ForeignKey(
+        DataFile,
+        on_delete=models.SET_NULL,
+        to_field='file_id',
+        null=True
+    )
+    user = models.ForeignKey(
+        auth_models.CustomUser,
+        on_delete=models.PROTECT,
+        to_field='id'
+    )
+    phase = models.CharField(
+        max_length=16,
+        choices=EnumIngestPhases.choices,
+        default=EnumIngestPhases.QUEUED
+    )
+    bytes_total = models.BigIntegerField(default=0)
+    bytes_read = models.BigIntegerField(default=0)
+    rows_copied = models.BigIntegerField(default=0)
+    # Only meaningful for appends and upserts into existing tables.
+    rows_inserted = models.BigIntegerField(default=0)
+    rows_updated = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+
+class EnumIndexBuildPhases(models.TextChoices):
+    QUEUED = 'QUEUED',_('Waiting for an ingest worker')
+    BUILDING = 'BUILDING',_('Running CREATE INDEX CONCURRENTLY')
+    SUCCEEDED = 'SUCCEEDED',_('Index built')
+    FAILED = 'FAILED',_('Build failed and the invalid index was dropped, see error')
+
+
+class IndexBuild(models.Model):
+    """
+    Model for tracking asynchronous 'CREATE INDEX CONCURRENTLY' builds.
+
+    Builds are queued and claimed exactly like Ingest models, and run by the
+    same ingest workers (see 'tables/workers.py'). While a build runs, the
+    worker's PostgreSQL backend PID is recorded, so that
+    'tables/indexes/builds/<id>/' can report live progress from
+    'pg_stat_progress_create_index'.
+    """
+    relation_name = models.CharField(max_length=255)
+    index_name = models.CharField(max_length=63)
+    # 'indexes' JSON contract entry, see 'tables/ingest.py' 'parse_indexes()'.
+    definition = psql_fields.JSONField()
+    user = models.ForeignKey(
+        auth_models.CustomUser,
+        on_delete=models.PROTECT,
+        to_field='id'
+    )
+    phase = models.CharField(
+        max_length=16,
+        choices=EnumIndexBuildPhases.choices,
+        default=EnumIndexBuildPhases.QUEUED
+    )
+    backend_pid = models.IntegerField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+
+class EnumUploadPhases(models.TextChoices):
+    RECEIVING = 'RECEIVING',_('Waiting for byte ranges of the file')
+    COMPLETE = 'COMPLETE',_('Every byte received and the file queued for ingest')
+
+
+class Upload(models.Model):
+    """
+    Model for tracking resumable chunked uploads. See 'tables/uploads.py'.
+
+    The file is assembled in place in its DataFile, which is handed over to an
+    Ingest once the upload completes.
+
+    TODO: Uploads abandoned in phase 'RECEIVING' keep their DataFile forever.
+    Expire them after a while.
+    """
+    user = models.ForeignKey(
+        auth_models.CustomUser,
+        on_delete=models.PROTECT,
+        to_field='id'
+    )
+    # File name as sent by the client, for reference only.
+    file_name = models.CharField(max_length=255, blank=True, default='')
+    total_size = models.BigIntegerField()
+    # Expected SHA-256 hex digest of the whole file, if the client sent one.
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    # Received byte ranges, each {'start', 'end', 'sha256'}, ordered by offset.
+    chunks = psql_fields.JSONField(default=list, blank=True)
+    bytes_received = models.BigIntegerField(default=0)
+    phase = models.CharField(
+        max_length=16,
+        choices=EnumUploadPhases.choices,
+        default=EnumUploadPhases.RECEIVING
+    )
+    datafile = models.ForeignKey(
+        DataFile,
+        on_delete=models.SET_NULL,
+        to_field='file_id',
+        null=True
+    )
+    ingest = models.ForeignKey(
+        Ingest,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True
+    )
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
@@ -0,0 +1,390 @@
+"""
+Declarative partitioning helpers for tables service.
+
+A table created with the 'partitioning' JSON contract is created as a
+partitioned parent, and its child partitions are derived from the data about
+to be loaded:
+
+- 'range' partitions cover the span between the minimum and maximum of the
+  partition column, as recorded in the Parquet footer statistics, in steps of
+  'interval' (an integer, or 'day' / 'month' / 'year' for dates and
+  timestamps).
+- 'list' partitions hold one distinct value of the partition column each. Only
+  that one column is read from the Parquet file to find them.
+- 'hash' partitions split rows evenly over 'modulus' partitions.
+
+Range and list tables also get a 'DEFAULT' partition, so that rows appended
+later (see 'tables/append/') that fall outside the original partitions still
+have somewhere to go.
+
+'COPY' into the parent routes each row to its partition, so the bulk load
+itself is unchanged. Queries and materialized views that filter on the
+partition column only scan the matching partitions.
+
+See: https://www.postgresql.org/docs/12/ddl-partitioning.html
+"""
+
+import collections
+import datetime
+
+import pyarrow as pa
+from psycopg2 import sql
+
+
+PARTITION_METHODS = (
+    'range',
+    'list',
+    'hash',
+)
+
+# Calendar intervals for range partitions on date and timestamp columns.
+CALENDAR_INTERVALS = (
+    'day',
+    'month',
+    'year',
+)
+
+# Upper bound on the number of partitions one table may be created with, so
+# that e.g. a daily interval over a century of data is rejected up front.
+MAX_PARTITIONS = 1000
+
+# Column families (see 'tables/ingest.py' COLUMN_TYPES) each method accepts.
+PARTITION_METHOD_FAMILIES = {
+    'range': ('integer', 'date', 'timestamp'),
+    'list': ('integer', 'boolean', 'text', 'date'),
+    'hash': ('integer', 'boolean', 'text', 'date', 'timestamp'),
+}
+
+PartitionDefinition = collections.namedtuple(
+    'PartitionDefinition',
+    ['column_name', 'method', 'interval', 'modulus']
+)
+
+
+def parse_partitioning(partitioning_data, columns):
+    """
+    Converts the 'partitioning' JSON contract into a partition definition.
+
+    The contract is a dict like {"column": "created", "method": "range",
+    "interval": "month"}, {"column": "region", "method": "list"}, or
+    {"column": "id", "method": "hash", "modulus": 8}.
+
+    Args:
+        dict: Partitioning dict.
+        list(ColumnDefinition): Column definitions of the table.
+
+    Returns:
+        PartitionDefinition
+
+    Raises:
+        ValueError: Partitioning is malformed, or does not suit the column.
+    """
+    if type(partitioning_data) is not dict:
+        raise ValueError('Partitioning must be a dict.')
+    if set(partitioning_data.keys()) - {'column', 'method', 'interval', 'modulus'}:
+        raise ValueError(f'Unrecognized partitioning keys: {partitioning_data}')
+
+    method = str(partitioning_data.get('method', '')).lower()
+    if method not in PARTITION_METHODS:
+        raise ValueError(f'Unsupported partitioning method: {method}')
+
+    column_name = partitioning_data.get('column')
+    matching_columns = [
+        column
+        for column
+        in columns
+        if column.column_name == column_name
+    ]
+    if not matching_columns:
+        raise ValueError(f'Partitioning references unknown column: {column_name}')
+    family = matching_columns[0].family
+    if family not in PARTITION_METHOD_FAMILIES[method]:
+        raise ValueError(f'Cannot {method} partition a column of type {matching_columns[0].column_type}')
+
+    interval = None
+    modulus = None
+    if method == 'range':
+        interval = partitioning_data.get('interval')
+        if family == 'integer':
+            if type(interval) is not int or interval < 1:
+                raise ValueError('Integer range partitioning requires a positive integer interval.')
+        elif interval not in CALENDAR_INTERVALS:
+            raise ValueError(f'Date range partitioning requires an interval of {CALENDAR_INTERVALS}')
+    elif 'interval' in partitioning_data:
+        raise ValueError('Only range partitioning takes an interval.')
+
+    if method == 'hash':
+        modulus = partitioning_data.get('modulus')
+        if type(modulus) is not int or not 2 <= modulus <= MAX_PARTITIONS:
+            raise ValueError(f'Hash partitioning requires a modulus between 2 and {MAX_PARTITIONS}.')
+    elif 'modulus' in partitioning_data:
+        raise ValueError('Only hash partitioning takes a modulus.')
+
+    return PartitionDefinition(column_name, method, interval, modulus)
+
+
+def partition_by_sql(partition):
+    """
+    Returns the 'PARTITION BY' clause for a validated partition definition.
+    """
+    return sql.SQL('PARTITION BY {method} ({column_name})').format(
+        # Whitelisted by 'parse_partitioning()'.
+        method=sql.SQL(partition.method.upper()),
+        column_name=sql.Identifier(partition.column_name)
+    )
+
+
+def partition_name(table_name, suffix):
+    """
+    Returns a child partition name, truncating the parent name so that the
+    whole fits PostgreSQL's 63 byte identifier limit.
+    """
+    suffix = f'_{suffix}'
+    prefix = table_name.encode('utf-8')[:63 - len(suffix)].decode('utf-8', 'ignore')
+    return prefix + suffix
+
+
+def partition_names(table_name, partition):
+    """
+    Returns the name of every child partition a partition definition may
+    create for a table. Which range and list partitions are created depends on
+    the data, so every name up to MAX_PARTITIONS is included.
+
+    Returns:
+        list(str)
+    """
+    if partition.method == 'hash':
+        suffixes = [f'h{remainder}' for remainder in range(partition.modulus)]
+    else:
+        suffixes = [f'p{index}' for index in range(MAX_PARTITIONS)] + ['default']
+    return [
+        partition_name(table_name, suffix)
+        for suffix
+        in suffixes
+    ]
+
+
+def _statistic_value(value, arrow_type):
+    """
+    Normalizes a Parquet footer statistic to a Python value of the column's
+    logical type. Depending on the 'pyarrow' version, statistics of date and
+    timestamp columns are reported as their physical integer values.
+    """
+    if isinstance(value, int) and (
+        pa.types.is_date(arrow_type) or pa.types.is_timestamp(arrow_type)
+    ):
+        physical_type = pa.int32() if pa.types.is_date32(arrow_type) else pa.int64()
+        return pa.array([value], type=physical_type).cast(arrow_type)[0].as_py()
+    return value
+
+
+def parquet_column_range(parquet_file, column_name):
+    """
+    Returns the minimum and maximum non-null values of a Parquet column.
+
+    Footer statistics are used for every row group that has them, so no data
+    is read; for any other row group, the column alone is scanned.
+
+    Returns:
+        (object, object): Minimum and maximum, or (None, None) if the column
+            holds no values.
+    """
+    arrow_schema = parquet_file.schema.to_arrow_schema()
+    arrow_type = arrow_schema[arrow_schema.get_field_index(column_name)].type
+    column_index = parquet_file.schema.names.index(column_name)
+
+    minimum = None
+    maximum = None
+    for row_group in range(parquet_file.num_row_groups):
+        metadata = parquet_file.metadata.row_group(row_group)
+        if metadata.num_rows == 0:
+            continue
+
+        statistics = metadata.column(column_index).statistics
+        if statistics is not None and statistics.has_min_max:
+            values = [
+                _statistic_value(statistics.min, arrow_type),
+                _statistic_value(statistics.max, arrow_type)
+            ]
+        else:
+            values = [
+                value
+                for value
+                in parquet_file.read_row_group(
+                    row_group,
+                    columns=[column_name]
+                ).column(0).to_pylist()
+                if value is not None
+            ]
+
+        for value in values:
+            if minimum is None or value < minimum:
+                minimum = value
+            if maximum is None or value > maximum:
+                maximum = value
+    return (minimum, maximum)
+
+
+def parquet_column_values(parquet_file, column_name):
+    """
+    Returns the distinct non-null values of a Parquet column, reading only
+    that column, one row group at a time.
+
+    Raises:
+        ValueError: The column has more than MAX_PARTITIONS distinct values.
+    """
+    values = set()
+    for row_group in range(parquet_file.num_row_groups):
+        column = parquet_file.read_row_group(
+            row_group,
+            columns=[column_name]
+        ).column(0)
+        values.update(
+            value
+            for value
+            in column.to_pylist()
+            if value is not None
+        )
+        if len(values) > MAX_PARTITIONS:
+            raise ValueError(f'Column {column_name} has more than {MAX_PARTITIONS} distinct values to list partition by.')
+    return sorted(values)
+
+
+def _truncate(value, interval):
+    """
+    Truncates a date or timestamp to the start of its calendar interval.
+    """
+    if interval == 'year':
+        value = value.replace(month=1, day=1)
+    elif interval == 'month':
+        value = value.replace(day=1)
+    if isinstance(value, datetime.datetime):
+        value = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    return value
+
+
+def _next(value, interval):
+    """
+    Returns the start of the calendar interval after the one 'value' starts.
+    """
+    if interval == 'year':
+        return value.replace(year=value.year + 1)
+    if interval == 'month':
+        if value.month == 12:
+            return value.replace(year=value.year + 1, month=1)
+        return value.replace(month=value.month + 1)
+    return value + datetime.timedelta(days=1)
+
+
+def _bound_literal(value):
+    """
+    Returns a partition bound literal. Dates and timestamps are sent as ISO 8601
+    strings, since bounds must be plain literals rather than cast expressions.
+    """
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return sql.Literal(value.isoformat())
+    return sql.Literal(value)
+
+
+def range_bounds(minimum, maximum, interval):
+    """
+    Returns consecutive [lower, upper) bounds covering [minimum, maximum].
+
+    Raises:
+        ValueError: More than MAX_PARTITIONS bounds would be needed.
+    """
+    if minimum is None:
+        return []
+
+    if isinstance(interval, int):
+        lower = (minimum // interval) * interval
+        step = lambda value: value + interval
+    else:
+        lower = _truncate(minimum, interval)
+        step = lambda value: _next(value, interval)
+
+    bounds = []
+    while lower <= maximum:
+        upper = step(lower)
+        bounds.append((lower, upper))
+        lower = upper
+        if len(bounds) > MAX_PARTITIONS:
+            raise ValueError(f'Range partitioning would create more than {MAX_PARTITIONS} partitions; use a larger interval.')
+    return bounds
+
+
+def partition_bounds(partition, parquet_file):
+    """
+    Derives child partitions for a partition definition from the data in a
+    Parquet file.
+
+    Returns:
+        list((str, psycopg2.sql.Composable)): Name suffix and 'FOR VALUES' /
+            'DEFAULT' bound clause of each child partition.
+    """
+    if partition.method == 'hash':
+        return [
+            (
+                f'h{remainder}',
+                sql.SQL('FOR VALUES WITH (MODULUS {modulus}, REMAINDER {remainder})').format(
+                    modulus=sql.Literal(partition.modulus),
+                    remainder=sql.Literal(remainder)
+                )
+            )
+            for remainder
+            in range(partition.modulus)
+        ]
+
+    if partition.method == 'list':
+        children = [
+            (
+                f'p{index}',
+                sql.SQL('FOR VALUES IN ({value})').format(
+                    value=_bound_literal(value)
+                )
+            )
+            for (index, value)
+            in enumerate(parquet_column_values(parquet_file, partition.column_name))
+        ]
+    else:
+        (minimum, maximum) = parquet_column_range(
+            parquet_file,
+            partition.column_name
+        )
+        children = [
+            (
+                f'p{index}',
+                sql.SQL('FOR VALUES FROM ({lower}) TO ({upper})').format(
+                    lower=_bound_literal(lower),
+                    upper=_bound_literal(upper)
+                )
+            )
+            for (index, (lower, upper))
+            in enumerate(range_bounds(minimum, maximum, partition.interval))
+        ]
+
+    return children + [('default', sql.SQL('DEFAULT'))]
+
+
+def create_partitions_sql(table_name, partition_prefix, bounds):
+    """
+    Returns one 'CREATE TABLE ... PARTITION OF' statement per child partition.
+
+    Args:
+        str: Partitioned parent table name.
+        str: Table name to derive child partition names from; differs from the
+            parent name while the parent is a staging table.
+        list: Output of partition_bounds().
+
+    Returns:
+        list(psycopg2.sql.Composed)
+    """
+    return [
+        sql.SQL('CREATE TABLE {partition_name} PARTITION OF {table_name} {bound}').format(
+            partition_name=sql.Identifier(partition_name(partition_prefix, suffix)),
+            table_name=sql.Identifier(table_name),
+            bound=bound
+        )
+        for (suffix, bound)
+        in bounds
+    ]
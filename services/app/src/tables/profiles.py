@@ -0,0 +1,427 @@
+"""
+Column profile helpers for tables service.
+
+Every ingest records a profile of each column of the table it loaded (row
+count, minimum and maximum, null count and fraction, and an approximate number
+of distinct values) in the ColumnProfile model, so that clients can pick filter
+and index columns from 'tables/profiles/' instead of running
+'SELECT COUNT(DISTINCT ...)' over the whole table.
+
+- Minimum, maximum, and null counts of Parquet loads are accumulated while the
+  data streams through binary 'COPY', one Arrow record batch at a time, with
+  numpy over the Arrow buffers. CSV and 'parquet_fdw' loads, and
+  upserts, which can overwrite existing values, fall back to a single aggregate
+  scan of the table instead.
+- Foreign tables are profiled from the Parquet footer statistics of their
+  backing file, without reading any rows.
+- Distinct counts are read from the 'pg_stats' estimates left behind by the
+  'ANALYZE' every ingest runs before committing, so they cost nothing extra.
+
+See: https://www.postgresql.org/docs/12/view-pg-stats.html
+"""
+
+import datetime
+import math
+
+import numpy as np
+import pyarrow as pa
+from psycopg2 import sql
+
+from core import utils as core_utils
+from . import ingest as table_ingest
+from . import models
+from . import partitioning as table_partitioning
+from . import utils as table_utils
+
+
+def _min_max(array):
+    """
+    Returns the minimum and maximum non-null value of a 'pyarrow.Array' as
+    Python values, or (None, None) if it has none. NaN is ignored.
+
+    NOTE: 'pyarrow' 0.17 has no 'pyarrow.compute.min_max()', so fixed-width
+    values are compared with numpy, and only the two results are converted to
+    Python.
+    """
+    if pa.types.is_dictionary(array.type):
+        indices = table_ingest.arrow_values(array.indices)[
+            table_ingest.arrow_validity(array.indices)
+        ]
+        dictionary = array.dictionary.to_pylist()
+        values = [
+            dictionary[index]
+            for index
+            in np.unique(indices)
+            if dictionary[index] is not None
+        ]
+    elif pa.types.is_string(array.type) or pa.types.is_large_string(array.type):
+        values = [value for value in array.to_pylist() if value is not None]
+    else:
+        keys = table_ingest.arrow_values(array)
+        valid = table_ingest.arrow_validity(array)
+        if pa.types.is_floating(array.type):
+            valid &= ~np.isnan(keys)
+        positions = np.flatnonzero(valid)
+        if not len(positions):
+            return (None, None)
+        keys = keys[positions]
+        return (
+            array[int(positions[np.argmin(keys)])].as_py(),
+            array[int(positions[np.argmax(keys)])].as_py()
+        )
+
+    if not values:
+        return (None, None)
+    return (min(values), max(values))
+
+
+def _normalize(value):
+    """
+    Converts timezone-aware timestamps to naive UTC, like the binary 'COPY'
+    encoder does, so that values from Arrow, PostgreSQL, and stored profiles
+    can be compared with each other.
+    """
+    if isinstance(value, datetime.datetime) and value.tzinfo is not None:
+        return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class ColumnProfiler(object):
+    """
+    Accumulates per-column row counts, null counts, and minimum and maximum
+    values over Arrow record batches.
+
+    Profilers only hold plain Python values, so that parallel load processes
+    can each profile their own row groups and pickle the result back to be
+    combined with merge().
+    """
+
+    def __init__(self, column_names):
+        self.row_count = 0
+        self.columns = {
+            column_name: {
+                'null_count': 0,
+                'min_value': None,
+                'max_value': None
+            }
+            for column_name
+            in column_names
+        }
+
+    def _extend(self, column_name, null_count, min_value, max_value):
+        profile = self.columns[column_name]
+        min_value = _normalize(min_value)
+        max_value = _normalize(max_value)
+        profile['null_count'] += null_count
+        if min_value is not None and (
+            profile['min_value'] is None or min_value < profile['min_value']
+        ):
+            profile['min_value'] = min_value
+        if max_value is not None and (
+            profile['max_value'] is None or max_value > profile['max_value']
+        ):
+            profile['max_value'] = max_value
+
+    def update(self, batch):
+        """
+        Profiles one 'pyarrow.RecordBatch', whose columns are in the order the
+        profiler was created with.
+        """
+        self.row_count += batch.num_rows
+        for (index, column_name) in enumerate(self.columns.keys()):
+            array = batch.column(index)
+            if array.null_count == len(array):
+                self._extend(column_name, array.null_count, None, None)
+                continue
+            (min_value, max_value) = _min_max(array)
+            self._extend(column_name, array.null_count, min_value, max_value)
+
+    def merge(self, other):
+        """
+        Combines the profile of another profiler over the same columns, e.g.
+        one returned by a parallel load process.
+        """
+        self.row_count += other.row_count
+        for (column_name, profile) in other.columns.items():
+            self._extend(
+                column_name,
+                profile['null_count'],
+                profile['min_value'],
+                profile['max_value']
+            )
+
+
+def parquet_footer_profiler(parquet_file, column_names):
+    """
+    Profiles Parquet columns from the footer statistics of each row group.
+    Only row groups without statistics have the column read.
+
+    Returns:
+        ColumnProfiler
+    """
+    profiler = ColumnProfiler(column_names)
+    profiler.row_count = parquet_file.metadata.num_rows
+    for column_name in column_names:
+        column_index = parquet_file.schema.names.index(column_name)
+        null_count = 0
+        for row_group in range(parquet_file.num_row_groups):
+            statistics = parquet_file.metadata.row_group(row_group).column(
+                column_index
+            ).statistics
+            # NOTE: 'pyarrow' 0.17 has no 'Statistics.has_null_count'; the
+            # null count is written together with the minimum and maximum.
+            if statistics is not None and statistics.has_min_max:
+                null_count += statistics.null_count
+            else:
+                null_count += parquet_file.read_row_group(
+                    row_group,
+                    columns=[column_name]
+                ).column(0).null_count
+
+        (min_value, max_value) = table_partitioning.parquet_column_range(
+            parquet_file,
+            column_name
+        )
+        profiler._extend(column_name, null_count, min_value, max_value)
+    return profiler
+
+
+def profile_scan_sql(table_name, columns):
+    """
+    Returns one aggregate query that profiles every column in a single scan of
+    the table: the row count, then the non-null count, minimum, and maximum of
+    each column in turn.
+
+    NOTE: PostgreSQL has no 'min()' / 'max()' for booleans; 'bool_and()' and
+    'bool_or()' are equivalent.
+    """
+    aggregates = [sql.SQL('count(*)')]
+    for column in columns:
+        (min_function, max_function) = (
+            ('bool_and', 'bool_or')
+            if column.family == 'boolean'
+            else ('min', 'max')
+        )
+        aggregates.extend([
+            sql.SQL('count({column_name})').format(
+                column_name=sql.Identifier(column.column_name)
+            ),
+            sql.SQL(min_function + '({column_name})').format(
+                column_name=sql.Identifier(column.column_name)
+            ),
+            sql.SQL(max_function + '({column_name})').format(
+                column_name=sql.Identifier(column.column_name)
+            ),
+        ])
+
+    return sql.SQL('SELECT {aggregates} FROM {table_name}').format(
+        aggregates=sql.SQL(', ').join(aggregates),
+        table_name=sql.Identifier(table_name)
+    )
+
+
+def scan_table(psql_cursor, table_name, columns):
+    """
+    Profiles an existing table with profile_scan_sql().
+
+    Returns:
+        ColumnProfiler
+    """
+    psql_cursor.execute(profile_scan_sql(table_name, columns))
+    row = psql_cursor.fetchone()
+
+    profiler = ColumnProfiler([column.column_name for column in columns])
+    profiler.row_count = row[0]
+    for (index, column) in enumerate(columns):
+        (non_null_count, min_value, max_value) = row[1 + 3 * index:4 + 3 * index]
+        profiler._extend(
+            column.column_name,
+            row[0] - non_null_count,
+            min_value,
+            max_value
+        )
+    return profiler
+
+
+def estimated_distinct_counts(psql_cursor, schema_name, table_name, row_count):
+    """
+    Returns the planner's estimate of the number of distinct non-null values of
+    each column, from 'pg_stats'.
+
+    'n_distinct' is either a count, or, if negative, minus the fraction of rows
+    that are distinct, to be scaled by the row count. Partitioned tables only
+    have statistics over their partitions ('inherited').
+
+    Returns:
+        dict: Estimate by column name. Columns without statistics, e.g. of an
+            empty table, are left out.
+    """
+    psql_cursor.execute(
+        sql.SQL('SELECT DISTINCT ON (attname) attname, n_distinct FROM pg_stats WHERE schemaname = {schemaname} AND tablename = {table_name} ORDER BY attname, inherited DESC').format(
+            schemaname=sql.Literal(str(schema_name)),
+            table_name=sql.Literal(table_name)
+        )
+    )
+    return {
+        column_name: int(
+            n_distinct
+            if n_distinct >= 0
+            else round(-n_distinct * row_count)
+        )
+        for (column_name, n_distinct)
+        in psql_cursor.fetchall()
+        if n_distinct is not None
+    }
+
+
+def _json_value(value):
+    """
+    Returns a profile value that can be stored in a JSONField. Non-finite
+    floats have no JSON representation.
+    """
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _stored_value(value, family):
+    """
+    Converts a stored profile value back from its JSON form. Dates and
+    timestamps are stored as ISO 8601 strings.
+    """
+    if value is None:
+        return None
+    if family == 'date':
+        return datetime.date.fromisoformat(value)
+    if family == 'timestamp':
+        if value.endswith('Z'):
+            value = value[:-1] + '+00:00'
+        return _normalize(datetime.datetime.fromisoformat(value))
+    return value
+
+
+def stored_profiler(table):
+    """
+    Rebuilds a ColumnProfiler from the ColumnProfile models of a table, so that
+    rows appended later only need to be profiled on their own.
+
+    Returns:
+        ColumnProfiler, or None if the table has not been profiled.
+    """
+    column_profiles = list(table.column_profiles.all())
+    if not column_profiles:
+        return None
+
+    profiler = ColumnProfiler([
+        column_profile.column_name
+        for column_profile
+        in column_profiles
+    ])
+    profiler.row_count = column_profiles[0].row_count
+    for column_profile in column_profiles:
+        (column_type, family) = table_ingest.parse_column_type(
+            column_profile.column_type
+        )
+        profiler.columns[column_profile.column_name] = {
+            'null_count': column_profile.null_count,
+            'min_value': _stored_value(column_profile.min_value, family),
+            'max_value': _stored_value(column_profile.max_value, family)
+        }
+    return profiler
+
+
+def save_column_profiles(table, profiler=None):
+    """
+    Records the ColumnProfile models of a table, replacing any earlier ones.
+
+    Run after the ingest has committed, so that the statistics of its
+    'ANALYZE' are visible.
+
+    Args:
+        models.Table: Loaded table.
+        ColumnProfiler: Profile accumulated during the load, covering every
+            row of the table. If None, the table is scanned once instead.
+    """
+    columns = table_ingest.parse_columns(
+        table_utils.table_columns(str(table.user_id), table.table_name)
+    )
+
+    with core_utils.PostgreSQLCursor(db_schema=table.user_id) as (psql_conn, psql_cursor):
+        if profiler is None:
+            profiler = scan_table(psql_cursor, table.table_name, columns)
+        distinct_counts = estimated_distinct_counts(
+            psql_cursor,
+            table.user_id,
+            table.table_name,
+            profiler.row_count
+        )
+
+    column_profiles = []
+    for column in columns:
+        profile = profiler.columns.get(column.column_name)
+        if profile is None:
+            # Columns not covered by the load, e.g. left out of an append, are
+            # profiled on the next full scan.
+            continue
+        non_null_count = profiler.row_count - profile['null_count']
+        distinct_count = distinct_counts.get(column.column_name)
+        column_profiles.append(
+            models.ColumnProfile(
+                table=table,
+                column_name=column.column_name,
+                column_type=column.column_type,
+                row_count=profiler.row_count,
+                null_count=profile['null_count'],
+                null_fraction=(
+                    profile['null_count'] / profiler.row_count
+                    if profiler.row_count
+                    else None
+                ),
+                distinct_count=(
+                    min(distinct_count, non_null_count)
+                    if distinct_count is not None
+                    else None
+                ),
+                min_value=_json_value(profile['min_value']),
+                max_value=_json_value(profile['max_value'])
+            )
+        )
+
+    models.ColumnProfile.objects.filter(table=table).delete()
+    models.ColumnProfile.objects.bulk_create(column_profiles)
+    return column_profiles
+
+
+def profile_merged_rows(schema_name, table_name, profiler=None):
+    """
+    Updates the ColumnProfile models of a tracked table after an append or
+    upsert.
+
+    Appends only add rows, so the profile of the appended rows is combined
+    with the stored profile. Upserts may overwrite the current minimum or
+    maximum, so they pass no profiler, and the table is scanned again.
+
+    Args:
+        str: User schema.
+        str: Table name.
+        ColumnProfiler: Profile of the appended rows.
+    """
+    table = models.Table.objects.filter(
+        user=schema_name,
+        table_name=table_name
+    ).order_by('-id').first()
+    if table is None:
+        return
+
+    stored = (
+        stored_profiler(table)
+        if profiler is not None
+        else None
+    )
+    if stored is not None:
+        stored.merge(profiler)
+        # Columns the append left out gained one NULL per appended row.
+        for (column_name, profile) in stored.columns.items():
+            if column_name not in profiler.columns:
+                profile['null_count'] += profiler.row_count
+    save_column_profiles(table, stored)
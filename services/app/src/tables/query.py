@@ -0,0 +1,251 @@
+"""
+Read query helpers for tables service.
+
+Compiles the query parameters of 'tables/rows/' (projection, filters, ordering,
+and keyset cursor) into a single 'SELECT' composed with 'psycopg2.sql'. Column
+names are only ever interpolated as identifiers, after being checked against
+the relation, and filter values only ever as literals.
+
+Pagination is keyset-based: each page continues strictly after the ordering
+values of the last row of the previous page, e.g.:
+
+    WHERE ("created", "id") > ('2020-05-25 16:20:00', 42)
+    ORDER BY "created", "id"
+    LIMIT 101
+
+so that, with an index on the ordering columns, fetching any page costs the
+same as fetching the first one. 'OFFSET' would have to scan and discard every
+preceding row instead.
+
+The ordering columns must be covered by a unique index, so that no two rows
+share ordering values and pages never skip or repeat rows. 'ctid' cannot break
+ties instead: it changes whenever a row is updated, and every row of a
+materialized view gets a new one on refresh.
+
+See: https://www.postgresql.org/docs/12/functions-comparisons.html#ROW-WISE-COMPARISON
+"""
+
+import base64
+import json
+
+from psycopg2 import sql
+
+
+# Default and maximum page size.
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Maximum page size for columnar formats, which skip building per-row objects,
+# and the number of rows converted from the cursor at one time for them.
+MAX_COLUMNAR_PAGE_SIZE = 100000
+FETCH_BATCH_SIZE = 10000
+
+# Filters are sent as 'column:operator:value'. Binary operators compare the
+# column against a value, which PostgreSQL coerces into the column type.
+BINARY_FILTER_OPERATORS = {
+    'eq': '=',
+    'ne': '<>',
+    'lt': '<',
+    'lte': '<=',
+    'gt': '>',
+    'gte': '>=',
+    'like': 'LIKE',
+    'ilike': 'ILIKE',
+}
+
+# 'in' takes '|'-separated values; 'isnull' and 'notnull' take no value.
+FILTER_OPERATORS = tuple(BINARY_FILTER_OPERATORS.keys()) + (
+    'in',
+    'isnull',
+    'notnull',
+)
+
+IN_FILTER_SEPARATOR = '|'
+
+
+def parse_filter(expression, column_names):
+    """
+    Compiles one 'column:operator:value' filter expression.
+
+    The column name is everything before the first ':' and the value
+    everything after the second, so values may themselves contain ':'.
+
+    Args:
+        str: Filter expression, e.g. 'SomeNumber:gte:5'.
+        list(str): Columns of the relation.
+
+    Returns:
+        psycopg2.sql.Composable: Boolean SQL expression.
+
+    Raises:
+        ValueError: Expression is malformed or names an unknown column.
+    """
+    parts = expression.split(':', 2)
+    if len(parts) < 2:
+        raise ValueError(f'Filter is not of the form column:operator:value: {expression}')
+
+    (column_name, operator) = parts[:2]
+    value = parts[2] if len(parts) == 3 else None
+
+    if column_name not in column_names:
+        raise ValueError(f'Unknown filter column: {column_name}')
+    if operator not in FILTER_OPERATORS:
+        raise ValueError(f'Unknown filter operator: {operator}')
+
+    column = sql.Identifier(column_name)
+
+    if operator in ('isnull', 'notnull'):
+        if value:
+            raise ValueError(f'Filter operator {operator} takes no value')
+        return sql.SQL('{column} IS {negation}NULL').format(
+            column=column,
+            negation=sql.SQL('NOT ' if operator == 'notnull' else '')
+        )
+
+    if value is None:
+        raise ValueError(f'Filter operator {operator} requires a value')
+
+    if operator == 'in':
+        return sql.SQL('{column} IN {values}').format(
+            column=column,
+            values=sql.Literal(tuple(value.split(IN_FILTER_SEPARATOR)))
+        )
+
+    return sql.SQL('{column} {operator} {value}').format(
+        column=column,
+        operator=sql.SQL(BINARY_FILTER_OPERATORS[operator]),
+        value=sql.Literal(value)
+    )
+
+
+def encode_cursor(values):
+    """
+    Encodes the ordering values of the last row of a page as an opaque cursor.
+
+    Values that are not JSON types (dates, timestamps, decimals, ...) are sent
+    back as their string form, which PostgreSQL coerces into the column type
+    again when the cursor is used.
+    """
+    return base64.urlsafe_b64encode(
+        json.dumps(values, default=str).encode('utf-8')
+    ).decode('ascii')
+
+
+def decode_cursor(cursor, num_values):
+    """
+    Decodes a cursor from encode_cursor().
+
+    Raises:
+        ValueError: Cursor is malformed, or was made for another ordering.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception as e:
+        raise ValueError(f'Malformed cursor: {str(e)}')
+
+    if type(values) is not list or len(values) != num_values:
+        raise ValueError('Cursor does not match the requested ordering')
+    return values
+
+
+def rows_query(relation_name, projection, order_by, descending=False, filters=(), cursor_values=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Composes one keyset-paginated page query.
+
+    Rows are ordered by the given columns, which must be covered by a unique
+    index (see 'tables/utils.py' has_unique_index()). Rows with NULL ordering
+    values are excluded, as they cannot be compared, and a unique index does
+    not keep them apart.
+
+    The query selects the projected columns, then the ordering columns, and
+    fetches one row beyond 'limit' to tell whether there is a next page.
+
+    Args:
+        str: Table or materialized view name.
+        list(str): Columns to return.
+        list(str): Columns to order by.
+        bool: Order descending instead of ascending.
+        list(psycopg2.sql.Composable): Compiled filters, see parse_filter().
+        list: Decoded cursor; ordering values of the last row of the previous
+            page.
+        int: Page size.
+
+    Returns:
+        psycopg2.sql.Composable
+    """
+    order_columns = [sql.Identifier(column_name) for column_name in order_by]
+
+    conditions = list(filters) + [
+        sql.SQL('{column} IS NOT NULL').format(column=column)
+        for column
+        in order_columns
+    ]
+    if cursor_values is not None:
+        conditions.append(
+            sql.SQL('({keyset}) {comparison} ({values})').format(
+                keyset=sql.SQL(', ').join(order_columns),
+                comparison=sql.SQL('<' if descending else '>'),
+                values=sql.SQL(', ').join(
+                    sql.Literal(value)
+                    for value
+                    in cursor_values
+                )
+            )
+        )
+
+    direction = sql.SQL(' DESC' if descending else '')
+
+    return sql.SQL('SELECT {projection}, {order_columns} FROM {relation_name} WHERE {conditions} ORDER BY {ordering} LIMIT {limit}').format(
+        projection=sql.SQL(', ').join(
+            sql.Identifier(column_name)
+            for column_name
+            in projection
+        ),
+        order_columns=sql.SQL(', ').join(order_columns),
+        relation_name=sql.Identifier(relation_name),
+        conditions=sql.SQL(' AND ').join(conditions),
+        ordering=sql.SQL(', ').join(
+            sql.Composed([column, direction])
+            for column
+            in order_columns
+        ),
+        limit=sql.Literal(limit + 1)
+    )
+
+
+def fetch_columnar_page(psql_cursor, num_columns, limit, on_batch):
+    """
+    Fetches a page from an executed rows_query() in batches of
+    FETCH_BATCH_SIZE rows, handing each batch on as column lists, so that
+    neither per-row objects nor the whole page of Python values are ever held
+    at once.
+
+    Args:
+        psycopg2.extensions.cursor: Cursor that executed rows_query().
+        int: Number of projected columns.
+        int: Page size, as passed to rows_query().
+        callable: Called with a list of 'num_columns' value lists per batch.
+
+    Returns:
+        list: Ordering values of the last row, to encode as the next cursor, or
+            None if this is the last page.
+    """
+    num_rows = 0
+    last_row = None
+    while num_rows < limit:
+        rows = psql_cursor.fetchmany(min(FETCH_BATCH_SIZE, limit - num_rows))
+        if not rows:
+            return None
+        on_batch([
+            list(column)
+            for column
+            in zip(*rows)
+        ][:num_columns])
+        num_rows += len(rows)
+        last_row = rows[-1]
+
+    # rows_query() selects one row beyond the page; if it exists, there is a
+    # next page.
+    if psql_cursor.fetchone() is None:
+        return None
+    return list(last_row[num_columns:])
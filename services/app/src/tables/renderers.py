@@ -0,0 +1,34 @@
+"""
+Custom Django REST Framework renderers for tables service.
+
+See: https://www.django-rest-framework.org/api-guide/renderers/
+"""
+
+from rest_framework import renderers
+
+
+class ColumnarJSONRenderer(renderers.JSONRenderer):
+    """
+    JSON renderer selected with '?format=columnar'. The view returns column
+    arrays instead of row arrays; rendering itself is plain JSON.
+    """
+    format = 'columnar'
+
+
+class ArrowStreamRenderer(renderers.BaseRenderer):
+    """
+    Renderer for Apache Arrow IPC streams, selected with
+    'Accept: application/vnd.apache.arrow.stream' or '?format=arrow'.
+
+    The view encodes the stream itself (see 'tables/export.py'), so successful
+    responses are passed through as-is. Error messages are sent as UTF-8 text.
+    """
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = 'arrow'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        return str(data).encode('utf-8')
@@ -24,3 +24,48 @@ class TableSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.Table
         fields = "__all__"
+
+
+class HotSliceSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the HotSlice model.
+    """
+    class Meta:
+        model = models.HotSlice
+        fields = "__all__"
+
+
+class ColumnProfileSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the ColumnProfile model.
+    """
+    class Meta:
+        model = models.ColumnProfile
+        exclude = ('table',)
+
+
+class IngestSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the Ingest model.
+    """
+    class Meta:
+        model = models.Ingest
+        fields = "__all__"
+
+
+class UploadSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the Upload model.
+    """
+    class Meta:
+        model = models.Upload
+        exclude = ('chunks',)
+
+
+class IndexBuildSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the IndexBuild model.
+    """
+    class Meta:
+        model = models.IndexBuild
+        fields = "__all__"
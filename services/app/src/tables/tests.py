@@ -1,3 +1,314 @@
-from django.test import TestCase
+"""
+Tests for tables service.
+"""
 
-# Create your tests here.
+import datetime
+import struct
+
+from django.test import SimpleTestCase
+from psycopg2 import sql
+import pyarrow as pa
+
+from . import ingest as table_ingest
+from . import query as table_query
+
+
+def _render(composable):
+    """
+    Renders a 'psycopg2.sql' composable without a connection, quoting
+    identifiers and showing literals by their Python representation.
+    """
+    if isinstance(composable, sql.Composed):
+        return ''.join(_render(part) for part in composable)
+    if isinstance(composable, sql.Identifier):
+        return '.'.join(f'"{string}"' for string in composable.strings)
+    if isinstance(composable, sql.Literal):
+        return repr(composable.wrapped)
+    return composable.string
+
+
+# Reference binary COPY encoders for one non-null Python value, by column type
+# family, converting one value at a time. See:
+# https://www.postgresql.org/docs/12/sql-copy.html#id-1.9.3.55.9.4
+POSTGRESQL_EPOCH_DATE = datetime.date(2000, 1, 1)
+POSTGRESQL_EPOCH_DATETIME = datetime.datetime(2000, 1, 1)
+
+STRUCT_FORMATS = {
+    'SMALLINT': '!h',
+    'INTEGER': '!i',
+    'BIGINT': '!q',
+    'REAL': '!f',
+    'DOUBLE PRECISION': '!d',
+    'BOOLEAN': '!?',
+}
+
+
+def _reference_field(value, column):
+    if column.family == 'text':
+        return str(value).encode('utf-8')
+    if column.family == 'date':
+        return struct.pack('!i', (value - POSTGRESQL_EPOCH_DATE).days)
+    if column.family == 'timestamp':
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return struct.pack(
+            '!q',
+            (value - POSTGRESQL_EPOCH_DATETIME) // datetime.timedelta(microseconds=1)
+        )
+    return struct.pack(STRUCT_FORMATS[column.column_type], value)
+
+
+def _reference_tuples(rows, columns):
+    """
+    Encodes rows of Python values as binary COPY tuples, one field at a time.
+    """
+    encoded = b''
+    for row in rows:
+        encoded += struct.pack('!h', len(columns))
+        for (value, column) in zip(row, columns):
+            if value is None:
+                encoded += struct.pack('!i', -1)
+                continue
+            field = _reference_field(value, column)
+            encoded += struct.pack('!i', len(field)) + field
+    return encoded
+
+
+class EncodeBatchTests(SimpleTestCase):
+    """
+    Checks the vectorized binary COPY encoder against per-value reference
+    encoders.
+    """
+
+    def assertEncodes(self, column_types, values_by_column, arrays=None):
+        columns = table_ingest.parse_columns([
+            {'column_name': f'c{index}', 'column_type': column_type}
+            for (index, column_type)
+            in enumerate(column_types)
+        ])
+        arrays = arrays or [pa.array(values) for values in values_by_column]
+        batch = pa.RecordBatch.from_arrays(
+            arrays,
+            [column.column_name for column in columns]
+        )
+        self.assertEqual(
+            table_ingest._encode_batch(batch, columns),
+            _reference_tuples(list(zip(*values_by_column)), columns)
+        )
+
+    def test_fixed_width_types(self):
+        self.assertEncodes(
+            ['smallint', 'int', 'bigint', 'real', 'double precision', 'boolean'],
+            [
+                [1, None, -32768, 32767],
+                [None, 2, -2147483648, 2147483647],
+                [3, -3, None, 2 ** 62],
+                [1.5, None, -0.25, 1e10],
+                [None, 0.1, -1e-300, 1e300],
+                [True, False, None, True]
+            ],
+            arrays=[
+                pa.array([1, None, -32768, 32767], type=pa.int16()),
+                pa.array([None, 2, -2147483648, 2147483647], type=pa.int32()),
+                pa.array([3, -3, None, 2 ** 62], type=pa.int64()),
+                pa.array([1.5, None, -0.25, 1e10], type=pa.float32()),
+                pa.array([None, 0.1, -1e-300, 1e300], type=pa.float64()),
+                pa.array([True, False, None, True])
+            ]
+        )
+
+    def test_integers_narrow_and_widen(self):
+        self.assertEncodes(
+            ['smallint', 'double precision'],
+            [[1, -2, None], [1, None, 2 ** 40]],
+            arrays=[
+                pa.array([1, -2, None], type=pa.int64()),
+                pa.array([1, None, 2 ** 40], type=pa.int64())
+            ]
+        )
+
+    def test_integer_out_of_range(self):
+        columns = table_ingest.parse_columns([
+            {'column_name': 'c0', 'column_type': 'smallint'}
+        ])
+        batch = pa.RecordBatch.from_arrays(
+            [pa.array([1, 40000], type=pa.int64())],
+            ['c0']
+        )
+        with self.assertRaises(ValueError):
+            table_ingest._encode_batch(batch, columns)
+
+    def test_text(self):
+        self.assertEncodes(
+            ['text', 'varchar(32)', 'text'],
+            [
+                ['a', None, '', 'héllo wörld'],
+                ['same', 'size', None, 'rows'],
+                ['a' * 20, 'b' * 20, 'c' * 20, None]
+            ]
+        )
+
+    def test_dictionary_text(self):
+        values = ['low', 'high', None, 'low', 'a much longer category']
+        self.assertEncodes(
+            ['text'],
+            [values],
+            arrays=[pa.array(values).dictionary_encode()]
+        )
+
+    def test_non_string_as_text(self):
+        self.assertEncodes(
+            ['text', 'text'],
+            [[1, None, -3], [True, False, None]]
+        )
+
+    def test_dates(self):
+        values = [
+            datetime.date(1999, 12, 31),
+            None,
+            datetime.date(2000, 1, 1),
+            datetime.date(2038, 1, 19)
+        ]
+        self.assertEncodes(
+            ['date', 'date'],
+            [values, values],
+            arrays=[
+                pa.array(values, type=pa.date32()),
+                pa.array(values, type=pa.date64())
+            ]
+        )
+
+    def test_timestamps(self):
+        values = [
+            datetime.datetime(1970, 1, 1),
+            None,
+            datetime.datetime(1999, 12, 31, 23, 59, 59),
+            datetime.datetime(2020, 5, 25, 16, 20)
+        ]
+        self.assertEncodes(
+            ['timestamp'] * 4,
+            [values] * 4,
+            arrays=[
+                pa.array(values, type=pa.timestamp(unit))
+                for unit
+                in ('s', 'ms', 'us', 'ns')
+            ]
+        )
+
+    def test_timestamps_with_time_zone(self):
+        values = [
+            datetime.datetime(2020, 5, 25, 16, 20, 0, 123000, tzinfo=datetime.timezone.utc),
+            None,
+            datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+        ]
+        self.assertEncodes(
+            ['timestamptz'],
+            [values],
+            arrays=[pa.array(values, type=pa.timestamp('ms', tz='UTC'))]
+        )
+
+    def test_sliced_batch(self):
+        columns = table_ingest.parse_columns([
+            {'column_name': 'c0', 'column_type': 'int'},
+            {'column_name': 'c1', 'column_type': 'text'}
+        ])
+        batch = pa.RecordBatch.from_arrays(
+            [
+                pa.array([1, None, 3, 4], type=pa.int32()),
+                pa.array(['first', 'second', None, 'fourth'])
+            ],
+            ['c0', 'c1']
+        )
+        self.assertEqual(
+            table_ingest._encode_batch(batch.slice(1, 2), columns),
+            _reference_tuples([(None, 'second'), (3, None)], columns)
+        )
+
+    def test_empty_batch(self):
+        self.assertEncodes(
+            ['int', 'text'],
+            [[], []],
+            arrays=[pa.array([], type=pa.int32()), pa.array([], type=pa.string())]
+        )
+
+
+class ParseFilterTests(SimpleTestCase):
+    """
+    Checks the compilation of 'column:operator:value' filter expressions.
+    """
+
+    column_names = ['SomeNumber', 'name']
+
+    def assertCompiles(self, expression, expected):
+        self.assertEqual(
+            _render(table_query.parse_filter(expression, self.column_names)),
+            expected
+        )
+
+    def test_binary_operators(self):
+        self.assertCompiles('SomeNumber:gte:5', '"SomeNumber" >= \'5\'')
+        self.assertCompiles('name:ne:x', '"name" <> \'x\'')
+        self.assertCompiles('name:ilike:a%', '"name" ILIKE \'a%\'')
+
+    def test_value_may_contain_separator(self):
+        self.assertCompiles('name:eq:a:b', '"name" = \'a:b\'')
+
+    def test_empty_value(self):
+        self.assertCompiles('name:eq:', '"name" = \'\'')
+
+    def test_in(self):
+        self.assertCompiles('name:in:a|b|c', '"name" IN (\'a\', \'b\', \'c\')')
+
+    def test_null_checks(self):
+        self.assertCompiles('name:isnull', '"name" IS NULL')
+        self.assertCompiles('name:notnull', '"name" IS NOT NULL')
+
+    def test_invalid_expressions(self):
+        for expression in (
+            'name',
+            'missing:eq:1',
+            'name:between:1',
+            'name:isnull:1',
+            'name:eq',
+        ):
+            with self.subTest(expression=expression):
+                with self.assertRaises(ValueError):
+                    table_query.parse_filter(expression, self.column_names)
+
+
+class CursorTests(SimpleTestCase):
+    """
+    Checks keyset cursor encoding.
+    """
+
+    def test_round_trip(self):
+        values = [42, 'text', None, 1.5]
+        self.assertEqual(
+            table_query.decode_cursor(table_query.encode_cursor(values), 4),
+            values
+        )
+
+    def test_non_json_values_as_strings(self):
+        cursor = table_query.encode_cursor([
+            datetime.date(2020, 5, 25),
+            datetime.datetime(2020, 5, 25, 16, 20)
+        ])
+        self.assertEqual(
+            table_query.decode_cursor(cursor, 2),
+            ['2020-05-25', '2020-05-25 16:20:00']
+        )
+
+    def test_url_safe(self):
+        cursor = table_query.encode_cursor(['???>>>' * 10])
+        self.assertNotIn('+', cursor)
+        self.assertNotIn('/', cursor)
+
+    def test_wrong_ordering(self):
+        with self.assertRaises(ValueError):
+            table_query.decode_cursor(table_query.encode_cursor([1, 2]), 3)
+
+    def test_malformed(self):
+        for cursor in ('not a cursor', table_query.encode_cursor({'a': 1})):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(ValueError):
+                    table_query.decode_cursor(cursor, 1)
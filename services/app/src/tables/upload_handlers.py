@@ -0,0 +1,53 @@
+"""
+Custom Django upload handlers for tables service.
+
+See: https://docs.djangoproject.com/en/3.0/topics/http/file-uploads/#upload-handlers
+"""
+
+import hashlib
+
+from django.core.files.uploadhandler import FileUploadHandler
+
+
+class ContentHashUploadHandler(FileUploadHandler):
+    """
+    Computes the SHA-256 digest of each uploaded file while it streams in.
+
+    This handler never consumes upload data; chunks are passed on unchanged to
+    the default memory / temporary file handlers, so hashing costs no extra
+    read of the file. Digests are stored on the request, keyed by form field
+    name, as the file object itself is only created by a later handler.
+
+    Must be installed before the request body is parsed, e.g.:
+
+        request.upload_handlers.insert(
+            0,
+            ContentHashUploadHandler(request._request)
+        )
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not hasattr(self.request, 'upload_content_hashes'):
+            self.request.upload_content_hashes = {}
+        self.request.upload_content_hashes[self.field_name] = self.hasher.hexdigest()
+        # Let the next handler return the file object.
+        return None
+
+
+def uploaded_content_hash(request, field_name='file'):
+    """
+    Returns the SHA-256 hex digest of an uploaded file, or '' if the request was
+    parsed without ContentHashUploadHandler.
+    """
+    return getattr(request._request, 'upload_content_hashes', {}).get(
+        field_name,
+        ''
+    )
@@ -0,0 +1,195 @@
+"""
+Resumable chunked upload helpers for tables service.
+
+Large files are sent as a sequence of byte ranges instead of one multipart
+POST, so that a dropped connection only costs the chunk in flight:
+
+1. 'POST tables/uploads/' declares the total size, and pre-allocates an empty
+   DataFile of that size underneath MEDIA_ROOT.
+2. 'PUT tables/uploads/<id>/' with a 'Content-Range: bytes <first>-<last>/<total>'
+   header writes one chunk in place at its offset. The SHA-256 of each chunk is
+   computed while it streams to a temporary file, checked against the
+   optional 'X-Chunk-SHA256' header, and recorded with its range. Only chunks
+   that pass are copied into the upload file. Chunks may arrive in any order,
+   concurrently, and be retried.
+3. 'GET tables/uploads/<id>/' lists the byte ranges still missing, so a client
+   that lost track can resume.
+4. 'POST tables/uploads/<id>/complete/' checks every byte has arrived and
+   queues the file for the ingest workers, which hash the whole file once
+   before loading it.
+
+NOTE: Loading cannot start before the upload completes. Parquet files keep
+their schema and row group offsets in a footer at the very end of the file, and
+text 'COPY' has to read CSV in order from the first byte.
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+from . import ingest as table_ingest
+from . import models
+
+
+CONTENT_RANGE_PATTERN = re.compile(
+    r'^bytes (?P<first>\d+)-(?P<last>\d+)/(?P<total>\d+)$'
+)
+
+SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+def parse_content_range(header, total_size):
+    """
+    Parses a 'Content-Range: bytes <first>-<last>/<total>' request header.
+
+    Returns:
+        (int, int): Start (inclusive) and end (exclusive) offsets of the chunk.
+
+    Raises:
+        ValueError: Header is malformed, or does not fit the upload.
+    """
+    match = CONTENT_RANGE_PATTERN.match((header or '').strip())
+    if not match:
+        raise ValueError(f'Malformed Content-Range: {header}')
+
+    first = int(match.group('first'))
+    last = int(match.group('last'))
+    if int(match.group('total')) != total_size:
+        raise ValueError(f'Content-Range total does not match upload size {total_size}')
+    if first > last or last >= total_size:
+        raise ValueError(f'Content-Range out of bounds: {header}')
+    return (first, last + 1)
+
+
+def upload_path(datafile):
+    """
+    Returns the absolute path of the DataFile backing an upload.
+    """
+    return os.path.join(
+        settings.MEDIA_ROOT,
+        datafile.file.name
+    )
+
+
+def allocate_datafile(upload_id, total_size):
+    """
+    Creates an empty DataFile for an upload, extended to its total size so that
+    chunks can be written at their offsets in any order.
+
+    NOTE: The file is sparse; disk blocks are only allocated as chunks arrive.
+    """
+    datafile = models.DataFile()
+    datafile.file.save(
+        f'upload_{upload_id}.part',
+        ContentFile(b''),
+        save=True
+    )
+    with open(upload_path(datafile), 'r+b') as fp:
+        fp.truncate(total_size)
+    return datafile
+
+
+def write_chunk(file_abspath, start, end, stream, expected_sha256=None):
+    """
+    Streams one chunk of a request body into the upload file at its offset,
+    hashing it on the way.
+
+    The chunk is first spooled to a temporary file next to the upload, and
+    only copied into place once its length and hash have been checked, so that
+    a failed retry never overwrites bytes already received for its range.
+
+    Args:
+        str: Absolute path of the upload file.
+        int: Start offset, inclusive.
+        int: End offset, exclusive.
+        file-like: Request body stream.
+        str: SHA-256 hex digest the chunk must match, if any.
+
+    Returns:
+        str: SHA-256 hex digest of the chunk.
+
+    Raises:
+        ValueError: The body is shorter or longer than the declared range, or
+            does not match the expected hash.
+    """
+    hasher = hashlib.sha256()
+    remaining = end - start
+    with tempfile.TemporaryFile(dir=os.path.dirname(file_abspath)) as spool:
+        while remaining > 0:
+            data = stream.read(min(remaining, table_ingest.COPY_BUFFER_SIZE))
+            if not data:
+                raise ValueError(f'Request body ended {remaining} bytes short of Content-Range')
+            spool.write(data)
+            hasher.update(data)
+            remaining -= len(data)
+
+        if stream.read(1):
+            raise ValueError('Request body is longer than Content-Range')
+
+        chunk_hash = hasher.hexdigest()
+        if expected_sha256 and expected_sha256 != chunk_hash:
+            raise ValueError(f'Chunk SHA-256 {chunk_hash} does not match X-Chunk-SHA256; send it again.')
+
+        spool.seek(0)
+        with open(file_abspath, 'r+b') as fp:
+            fp.seek(start)
+            shutil.copyfileobj(spool, fp, table_ingest.COPY_BUFFER_SIZE)
+    return chunk_hash
+
+
+def record_chunk(chunks, start, end, sha256):
+    """
+    Records a received chunk, dropping earlier chunks it overlaps, e.g. when a
+    chunk is retried.
+
+    Args:
+        list(dict): Received chunks, each {'start', 'end', 'sha256'}.
+
+    Returns:
+        list(dict): Received chunks, ordered by offset.
+    """
+    chunks = [
+        chunk
+        for chunk
+        in chunks
+        if chunk['end'] <= start or chunk['start'] >= end
+    ]
+    chunks.append({
+        'start': start,
+        'end': end,
+        'sha256': sha256
+    })
+    return sorted(chunks, key=lambda chunk: chunk['start'])
+
+
+def missing_ranges(chunks, total_size):
+    """
+    Returns the byte ranges of an upload not yet received.
+
+    Returns:
+        list((int, int)): Start (inclusive) and end (exclusive) offsets.
+    """
+    ranges = []
+    offset = 0
+    for chunk in sorted(chunks, key=lambda chunk: chunk['start']):
+        if chunk['start'] > offset:
+            ranges.append((offset, chunk['start']))
+        offset = max(offset, chunk['end'])
+    if offset < total_size:
+        ranges.append((offset, total_size))
+    return ranges
+
+
+def file_sha256(file_abspath):
+    """
+    Returns the SHA-256 hex digest of a file on local disk.
+    """
+    hasher = hashlib.sha256()
+    for chunk in table_ingest.read_file_chunks(file_abspath):
+        hasher.update(chunk)
+    return hasher.hexdigest()
@@ -15,5 +15,90 @@ urlpatterns = [
         'create/',
         views.CreateTableView().as_view(),
         name='table_create'
+    ),
+    path(
+        'create/csv/',
+        views.CreateTableFromCSVView().as_view(),
+        name='table_create_csv'
+    ),
+    path(
+        'create/foreign/',
+        views.CreateForeignTableView().as_view(),
+        name='table_create_foreign'
+    ),
+    path(
+        'create/batch/',
+        views.CreateTableBatchView().as_view(),
+        name='table_create_batch'
+    ),
+    path(
+        'hot/create/',
+        views.CreateHotSliceView().as_view(),
+        name='hot_slice_create'
+    ),
+    path(
+        'hot/refresh/',
+        views.RefreshHotSliceView().as_view(),
+        name='hot_slice_refresh'
+    ),
+    path(
+        'uploads/',
+        views.CreateUploadView().as_view(),
+        name='upload_create'
+    ),
+    path(
+        'uploads/<int:upload_id>/',
+        views.UploadDetailView().as_view(),
+        name='upload_detail'
+    ),
+    path(
+        'uploads/<int:upload_id>/complete/',
+        views.CompleteUploadView().as_view(),
+        name='upload_complete'
+    ),
+    path(
+        'append/',
+        views.AppendToTableView().as_view(),
+        name='table_append'
+    ),
+    path(
+        'export/',
+        views.ExportRelationView().as_view(),
+        name='table_export'
+    ),
+    path(
+        'rows/',
+        views.RelationRowsView().as_view(),
+        name='table_rows'
+    ),
+    path(
+        'indexes/',
+        views.IndexUsageView().as_view(),
+        name='index_usage'
+    ),
+    path(
+        'indexes/create/',
+        views.CreateIndexView().as_view(),
+        name='index_create'
+    ),
+    path(
+        'indexes/drop/',
+        views.DropIndexView().as_view(),
+        name='index_drop'
+    ),
+    path(
+        'indexes/builds/<int:build_id>/',
+        views.IndexBuildDetailView().as_view(),
+        name='index_build_detail'
+    ),
+    path(
+        'profiles/',
+        views.ColumnProfilesView().as_view(),
+        name='column_profiles'
+    ),
+    path(
+        'ingests/<int:ingest_id>/',
+        views.IngestDetailView().as_view(),
+        name='ingest_detail'
     )
 ]
@@ -5,6 +5,7 @@ Utility classes, methods, and variables for tables service.
 from psycopg2 import sql
 
 from core import utils as core_utils
+from . import models
 
 
 def table_exists(schema_name, table_name):
@@ -20,3 +21,109 @@ def table_exists(schema_name, table_name):
         )
         table_exists = psql_cursor.fetchone()[0]
         return table_exists
+
+
+def existing_tables(schema_name, table_names):
+    """
+    Returns which of several table names already exist, in one catalog query.
+    """
+    with core_utils.PostgreSQLCursor(db_schema=schema_name) as (psql_conn, psql_cursor):
+        psql_cursor.execute(
+            sql.SQL('SELECT table_name FROM information_schema.tables WHERE table_schema = {schemaname} AND table_name = ANY({table_names})').format(
+                schemaname=sql.Literal(schema_name),
+                table_names=sql.Literal(list(table_names))
+            )
+        )
+        return set(
+            row[0]
+            for row
+            in psql_cursor.fetchall()
+        )
+
+
+# PostgreSQL channel ingest workers LISTEN on for newly queued ingests and
+# index builds.
+INGEST_CHANNEL_NAME = 'tables_ingest_channel'
+
+
+def forget_content_hash(schema_name, table_name):
+    """
+    Forgets which upload a table was loaded from, once rows have been appended
+    or upserted into it. Re-uploads of that file no longer match the table, so
+    they must not be short-circuited into a copy of it. See 'tables/views.py'
+    find_duplicate_table().
+    """
+    models.Table.objects.filter(
+        user=schema_name,
+        table_name=table_name
+    ).update(content_hash='')
+
+
+def notify_ingest_workers(job_id):
+    """
+    Wakes up idle ingest workers after an ingest or index build is queued.
+    Workers also poll periodically, so a lost notification only delays the
+    job.
+    """
+    with core_utils.PostgreSQLCursor() as (psql_conn, psql_cursor):
+        psql_cursor.execute(
+            sql.SQL('SELECT pg_notify({channel}, {payload})').format(
+                channel=sql.Literal(INGEST_CHANNEL_NAME),
+                payload=sql.Literal(str(job_id))
+            )
+        )
+        psql_conn.commit()
+
+
+def table_columns(schema_name, table_name):
+    """
+    Returns the columns of an existing table, in ordinal order, in the
+    'columns' JSON schema contract.
+
+    NOTE: 'data_type' is reported without length modifiers (e.g. 'character
+    varying'), which is all that is needed to pick a binary 'COPY' encoder.
+    """
+    with core_utils.PostgreSQLCursor(db_schema=schema_name) as (psql_conn, psql_cursor):
+        psql_cursor.execute(
+            sql.SQL('SELECT column_name, data_type FROM information_schema.columns WHERE table_schema = {schemaname} AND table_name = {table_name} ORDER BY ordinal_position').format(
+                schemaname=sql.Literal(str(schema_name)),
+                table_name=sql.Literal(table_name)
+            )
+        )
+        return [
+            {
+                'column_name': column_name,
+                'column_type': data_type
+            }
+            for (column_name, data_type)
+            in psql_cursor.fetchall()
+        ]
+
+
+def has_unique_index(schema_name, table_name, column_names, covering=False):
+    """
+    Checks whether a table has a non-partial unique index (or primary key / unique
+    constraint) on exactly the given columns, as 'INSERT ... ON CONFLICT'
+    requires. With 'covering', an index on any subset of the given columns
+    counts too, since it is enough to make them unique together, e.g. for a
+    keyset pagination ordering.
+    """
+    with core_utils.PostgreSQLCursor(db_schema=schema_name) as (psql_conn, psql_cursor):
+        psql_cursor.execute(
+            sql.SQL(
+                'SELECT EXISTS('
+                'SELECT 1 FROM pg_index i '
+                'JOIN pg_class c ON c.oid = i.indrelid '
+                'JOIN pg_namespace n ON n.oid = c.relnamespace '
+                'WHERE n.nspname = {schemaname} AND c.relname = {table_name} '
+                'AND i.indisunique AND i.indpred IS NULL AND i.indexprs IS NULL '
+                'AND (SELECT array_agg(a.attname::text ORDER BY a.attname::text) FROM pg_attribute a WHERE a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)) {comparison} {column_names}'
+                ')'
+            ).format(
+                schemaname=sql.Literal(str(schema_name)),
+                table_name=sql.Literal(table_name),
+                comparison=sql.SQL('<@' if covering else '='),
+                column_names=sql.Literal(sorted(column_names))
+            )
+        )
+        return psql_cursor.fetchone()[0]
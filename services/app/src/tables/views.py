@@ -5,18 +5,269 @@ Table service custom views.
 import datetime
 import json
 import os
+import time
+import uuid
 
 from django.conf import settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+import psycopg2
 from psycopg2 import sql
+import pyarrow as pa
+from rest_framework import renderers
 from rest_framework import status
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from . import batch as table_batch
+from . import export as table_export
+from . import foreign as table_foreign
+from . import indexes as table_indexes
+from . import ingest as table_ingest
 from . import models
+from . import partitioning as table_partitioning
+from . import profiles as table_profiles
+from . import query as table_query
+from . import renderers as table_renderers
 from . import serializers
+from . import upload_handlers
+from . import uploads as table_uploads
 from . import utils as table_utils
 from core import utils as core_utils
+from views import utils as views_utils
+
+
+# Ingest modes that create the table themselves and load it with binary 'COPY',
+# as opposed to going through 'parquet_fdw'.
+COPY_INGEST_MODES = (
+    models.EnumIngestModes.STREAM,
+    models.EnumIngestModes.PARALLEL,
+)
+
+
+def parse_load_options(request, column_data):
+    """
+    Parses the optional staged pipeline keys shared by every table creation
+    view: '-F indexes' (JSON list, see 'tables/ingest.py' 'parse_indexes()')
+    and '-F unlogged'.
+
+    Args:
+        rest_framework.request.Request
+        list: 'columns' JSON schema contract.
+
+    Returns:
+        dict: {'indexes': list, 'unlogged': bool}, JSON-serializable so that it
+            can be stored on the Ingest model.
+
+    Raises:
+        ValueError: Options are malformed.
+    """
+    index_data = json.loads(request.data.get('indexes', '[]'))
+    table_ingest.parse_indexes(
+        index_data,
+        [column_def['column_name'] for column_def in column_data]
+    )
+
+    unlogged = request.data.get('unlogged', 'false').lower()
+    if unlogged not in ('true', 'false'):
+        raise ValueError(f'Unrecognized value for unlogged: {unlogged}')
+
+    return {
+        'indexes': index_data,
+        'unlogged': unlogged == 'true'
+    }
+
+
+def upload_compression(request):
+    """
+    Parses '-F compression' ('gzip', 'zstd', or 'none'), falling back to the
+    suffix of the uploaded file name, e.g. 'sample.csv.gz'.
+
+    Returns:
+        str: One of table_ingest.UPLOAD_COMPRESSIONS, or None.
+
+    Raises:
+        ValueError: Compression is not recognized.
+    """
+    return table_ingest.parse_compression(
+        request.data.get('compression'),
+        getattr(request.data.get('file'), 'name', '')
+    )
+
+
+def parse_partitioning(request, column_data):
+    """
+    Parses '-F partitioning' (JSON dict, see 'tables/partitioning.py') against
+    the column contract and the other load options of a table creation request.
+
+    Returns:
+        partitioning.PartitionDefinition
+
+    Raises:
+        ValueError: Partitioning is malformed, or conflicts with the load
+            options.
+    """
+    partition = table_partitioning.parse_partitioning(
+        json.loads(request.data.get('partitioning')),
+        table_ingest.parse_columns(column_data)
+    )
+
+    load_options = parse_load_options(request, column_data)
+    # Partitioned tables have no storage of their own to flip from 'UNLOGGED'
+    # to 'LOGGED'.
+    if load_options['unlogged']:
+        raise ValueError('Partitioned tables cannot be loaded unlogged.')
+    # Unique indexes on a partitioned table must include the partition column.
+    for index in load_options['indexes']:
+        if index.get('unique') and partition.column_name not in index['columns']:
+            raise ValueError(f'Unique indexes must include partition column {partition.column_name}.')
+
+    return partition
+
+
+def table_created_response(request, table_name, extra_data=None, source_columns=None, profiler=None, datafile=None):
+    """
+    Records a newly created table in the Table catalog and returns the HTTP 201
+    response shared by table creation views.
+
+    If the upload was hashed by ContentHashUploadHandler, the hash and the
+    'columns' JSON schema contract are recorded with the table, so that later
+    re-uploads of the same file can be short-circuited.
+
+    Column profiles are recorded as well, from the profiler filled during the
+    load if there is one, or else from one scan of the table.
+
+    Foreign tables are recorded with the DataFile they read in place.
+    """
+    table_serializer = serializers.TableSerializer(
+        data={
+            'table_name': table_name,
+            'user': request.user.id,
+            'content_hash': upload_handlers.uploaded_content_hash(request),
+            'source_columns': source_columns,
+            'datafile': datafile.file_id if datafile is not None else None
+        }
+    )
+    if table_serializer.is_valid():
+        table_profiles.save_column_profiles(
+            table_serializer.save(),
+            profiler
+        )
+
+    response_data = dict(table_serializer.data)
+    response_data.update(extra_data or {})
+
+    return Response(
+        response_data,
+        status=status.HTTP_201_CREATED
+    )
+
+
+# What to do when an upload is byte-for-byte identical to one that already
+# produced a table, with the same 'columns' JSON schema contract.
+DUPLICATE_ACTIONS = (
+    'ingest',
+    'clone',
+    'reject',
+)
+
+
+def find_duplicate_table(request, content_hash, column_data):
+    """
+    Finds an existing table of the requesting user that was loaded from an
+    identical upload with the same 'columns' JSON schema contract.
+
+    Tables are never matched across users, so one tenant cannot probe for, or
+    clone, another tenant's data.
+
+    Returns:
+        models.Table, or None.
+    """
+    if not content_hash:
+        return None
+
+    candidates = models.Table.objects.filter(
+        user=request.user.id,
+        content_hash=content_hash
+    ).order_by('-id')
+    for table in candidates:
+        if (
+            table.source_columns == column_data and
+            table_utils.table_exists(str(request.user.id), table.table_name)
+        ):
+            return table
+    return None
+
+
+def queue_ingest(request, column_data, file_format, ingest_mode, options, write_mode=models.EnumWriteModes.CREATE):
+    """
+    Saves the upload underneath MEDIA_ROOT and queues it for an ingest worker.
+    Shared by every table creation view that accepts '-F asynchronous=true'.
+
+    Args:
+        rest_framework.request.Request: Validated request.
+        list: 'columns' JSON schema contract, as sent or inferred.
+        str: One of models.EnumFileFormats.
+        str: One of models.EnumIngestModes.
+        dict: Format-specific options for the worker.
+        str: One of models.EnumWriteModes.
+
+    Returns:
+        rest_framework.response.Response: HTTP 202 with the queued ingest.
+    """
+    file_serializer = serializers.DataFileSerializer(
+        data={
+            'file': request.data['file'],
+            'content_hash': upload_handlers.uploaded_content_hash(request)
+        }
+    )
+    if not file_serializer.is_valid():
+        return Response(
+            file_serializer.errors,
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    datafile = file_serializer.save()
+
+    ingest = queue_datafile_ingest(
+        request,
+        datafile,
+        column_data,
+        file_format,
+        ingest_mode,
+        options,
+        write_mode=write_mode
+    )
+
+    return Response(
+        serializers.IngestSerializer(ingest).data,
+        status=status.HTTP_202_ACCEPTED
+    )
+
+
+def queue_datafile_ingest(request, datafile, column_data, file_format, ingest_mode, options, write_mode=models.EnumWriteModes.CREATE):
+    """
+    Queues a DataFile already saved underneath MEDIA_ROOT for an ingest worker,
+    e.g. the file assembled by a resumable upload. See queue_ingest() for the
+    arguments.
+
+    Returns:
+        models.Ingest
+    """
+    ingest = models.Ingest.objects.create(
+        table_name=request.data.get('table_name'),
+        columns=column_data,
+        file_format=file_format,
+        ingest_mode=ingest_mode,
+        write_mode=write_mode,
+        options=options,
+        datafile=datafile,
+        user_id=request.user.id,
+        bytes_total=datafile.file.size
+    )
+    table_utils.notify_ingest_workers(ingest.id)
+    return ingest
 
 
 class CreateTableView(APIView):
@@ -47,12 +298,12 @@ class CreateTableView(APIView):
         is only one version of the data, versioning and backup of foreign tables
         is fairly trivial.
 
-        TODO: A prior version of this method used to create the foreign table
+        NOTE: A prior version of this method used to create the foreign table
         as-is. While this would work for creating materialized views and
         triggers, the inability of writes to the underlying data, as well as the
         difficulties managing the persist layer precludes this method as too
-        inflexible for OLTP workloads. If foreign tables are desired, create a
-        separate endpoint for supporting only foreign tables.
+        inflexible for OLTP workloads. Foreign tables are created by the
+        separate 'tables/create/foreign/' endpoint instead.
 
         TODO: Take the complete possible PostgreSQL 'CREATE TABLE' syntax and
         translate that through a form to get the full functionality of 'CREATE
@@ -77,48 +328,181 @@ class CreateTableView(APIView):
             -F columns='[{"column_name": "SomeNumber", "column_type":"int"},{"column_name":"SomeString","column_type":"varchar(256)"}]' \
             https://api.tinydevcrm.com/tables/create/
 
+        If '-F columns' is omitted, columns are inferred from the Parquet footer
+        alone (the upload is memory-mapped, so no row groups are read), with
+        Arrow types mapped onto the column type whitelist in
+        'tables/ingest.py'. Whether given or inferred, column types are checked
+        against the types stored in the file before any data is scanned, so
+        e.g. 'int' for a string column is rejected up front.
+
+        Passing '-F ingest_mode=stream' skips staging the upload underneath
+        MEDIA_ROOT and 'parquet_fdw' entirely. Parquet row groups are decoded
+        from the upload one record batch at a time and piped into the new table
+        with 'COPY ... FROM STDIN (FORMAT binary)', so the data is written once
+        and read once.
+
+        Passing '-F ingest_mode=parallel' instead splits the file by Parquet
+        row group and loads the row groups concurrently, over up to
+        '-F parallelism=N' connections (at most TABLES_INGEST_MAX_PARALLELISM),
+        into a staging table that is renamed into place once every connection
+        has committed. Wide files with many row groups load close to N times
+        faster.
+
+        Copy-based modes ('stream' and 'parallel') and 'fdw' also accept a
+        staged pipeline:
+
+        - '-F unlogged=true' loads into an 'UNLOGGED' table, then runs
+          'ANALYZE' and flips it to 'LOGGED' before it becomes visible, cutting
+          per-row WAL volume and replica lag during bulk loads.
+        - '-F indexes=[{"columns": ["SomeNumber"], "method": "btree"}]' builds
+          the given indexes once the data is loaded, instead of maintaining them
+          row by row.
+
+        Uploads are hashed (SHA-256) while they stream in. If the same user
+        re-uploads a file that already produced a table, with the same column
+        contract, the upload is handled according to '-F on_duplicate':
+
+        - 'ingest' (default) loads the upload anyway.
+        - 'clone' creates the new table as a server-side copy of the existing
+          one ('INSERT INTO ... SELECT'), without decoding the upload.
+        - 'reject' returns HTTP 409 Conflict naming the existing table.
+
+        Tables stop matching their upload once rows are appended or upserted
+        into them via 'tables/append/'.
+
+        Copy-based modes also accept '-F partitioning', e.g.
+        '{"column": "created", "method": "range", "interval": "month"}', to
+        create a partitioned table instead of one monolithic heap. Child
+        partitions are derived from the upload (the value range in the Parquet
+        footer for 'range', the distinct values for 'list', or '"modulus": N'
+        for 'hash'), and 'COPY' routes each row to its partition. Queries and
+        materialized views bounded on the partition column then only scan the
+        matching partitions. See 'tables/partitioning.py'.
+
+        Uploads compressed with gzip or zstd are accepted with
+        '-F ingest_mode=stream', given '-F compression=gzip' or
+        '-F compression=zstd', or a file name ending in '.gz' or '.zst'. Since
+        Parquet readers need random access to the footer, the upload is
+        decompressed chunk by chunk into an anonymous temporary file outside
+        MEDIA_ROOT first; files written with Parquet's own page compression
+        skip this. Asynchronous ingests keep the file compressed on disk.
+
+        Passing '-F asynchronous=true' saves the upload, queues it for the
+        ingest workers started by 'python manage.py startingestworkers', and
+        returns HTTP 202 Accepted with the ingest right away. Poll
+        'tables/ingests/<id>/' for the bytes read, rows copied, and current
+        phase of the load.
+
         NOTE: These keys, such as 'data' and 'file', are very particular to the
         underlying models and serializers. Do not change without testing in
         development.
         """
-        def _validate(request):
+        def _validate(request, inferred_column_data):
             """
             Validates request data.
 
             Args:
                 rest_framework.request.Request
+                list: Columns inferred from the Parquet footer, if '-F columns'
+                    was omitted.
 
             Returns:
-                bool: Request is valid.
+                (bool, dict): (Request is valid, reasons)
             """
-            # TODO: Add check for 'column_types_are_valid'.
             checks = {
                 'all_required_keys_are_present': True,
+                'ingest_mode_is_valid': True,
                 'column_schema_is_valid': True,
+                'column_types_are_valid': True,
+                'parallelism_is_valid': True,
+                'load_options_are_valid': True,
+                'partitioning_is_valid': True,
+                'on_duplicate_is_valid': True,
+                'compression_is_valid': True,
                 'table_does_not_exist': True
             }
 
             if (
                 not request.data.get('file') or
                 not request.data.get('table_name') or
-                not request.data.get('columns')
+                not (request.data.get('columns') or inferred_column_data)
             ):
                 checks['all_required_keys_are_present'] = False
 
-            columns = request.data.get('columns')
+            if request.data.get('on_duplicate', 'ingest') not in DUPLICATE_ACTIONS:
+                checks['on_duplicate_is_valid'] = False
+
             try:
-                column_data = json.loads(columns)
+                parallelism = int(request.data.get(
+                    'parallelism',
+                    settings.TABLES_INGEST_MAX_PARALLELISM
+                ))
+                assert 1 <= parallelism <= settings.TABLES_INGEST_MAX_PARALLELISM
+            except (Exception, AssertionError) as e:
+                checks['parallelism_is_valid'] = False
+
+            try:
+                column_data = (
+                    inferred_column_data
+                    if inferred_column_data is not None
+                    else json.loads(request.data.get('columns'))
+                )
                 assert type(column_data) is list
                 for item in column_data:
                     assert type(item) is dict
                     assert sorted(item.keys()) == ['column_name', 'column_type']
-                    # TODO: Add check for column types and column names
             except (Exception, AssertionError) as e:
                 checks['column_schema_is_valid'] = False
 
-            checks['table_does_not_exist'] = not table_utils.table_exists(
+            ingest_mode = request.data.get(
+                'ingest_mode',
+                models.EnumIngestModes.FDW
+            )
+            if ingest_mode not in models.EnumIngestModes.values:
+                checks['ingest_mode_is_valid'] = False
+
+            # Parallel and 'parquet_fdw' loads read the file by path, so
+            # compressed uploads can only be streamed.
+            try:
+                assert (
+                    upload_compression(request) is None or
+                    ingest_mode == models.EnumIngestModes.STREAM
+                )
+            except (Exception, AssertionError) as e:
+                checks['compression_is_valid'] = False
+
+            partition = None
+            # Column types are interpolated into 'CREATE TABLE' / 'CREATE
+            # FOREIGN TABLE' directly, so only whitelisted types are accepted.
+            if checks['column_schema_is_valid']:
+                try:
+                    table_ingest.parse_columns(column_data)
+                except ValueError as e:
+                    checks['column_types_are_valid'] = False
+
+                try:
+                    parse_load_options(request, column_data)
+                except (Exception, ValueError) as e:
+                    checks['load_options_are_valid'] = False
+
+                if request.data.get('partitioning'):
+                    try:
+                        partition = parse_partitioning(request, column_data)
+                        assert ingest_mode in COPY_INGEST_MODES
+                    except (Exception, AssertionError) as e:
+                        checks['partitioning_is_valid'] = False
+
+            # Child partitions are named after the table as well, see
+            # 'tables/partitioning.py'.
+            table_names = [request.data.get('table_name')]
+            if partition is not None and request.data.get('table_name'):
+                table_names += table_partitioning.partition_names(
+                    request.data.get('table_name'),
+                    partition
+                )
+            checks['table_does_not_exist'] = not table_utils.existing_tables(
                 str(request.user.id),
-                request.data.get('table_name')
+                table_names
             )
 
             return (
@@ -126,18 +510,249 @@ class CreateTableView(APIView):
                 checks
             )
 
-        (is_valid, validation_checks) = _validate(request)
+        # Hash the upload as it streams in. This must happen before
+        # 'request.data' is first accessed, which parses the request body.
+        request.upload_handlers.insert(
+            0,
+            upload_handlers.ContentHashUploadHandler(request._request)
+        )
+
+        # Only the Parquet footer is read here, for schema inference and type
+        # checks.
+        parquet_file = None
+        inferred_column_data = None
+        compression = None
+        if request.data.get('file'):
+            try:
+                compression = upload_compression(request)
+            except ValueError as e:
+                return Response(
+                    str(e),
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            try:
+                parquet_file = table_ingest.open_parquet_upload(
+                    request.data['file'],
+                    compression=compression
+                )
+            except (ValueError, IOError) as e:
+                return Response(
+                    f'Uploaded file is not a valid Parquet file: {str(e)}',
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            if not request.data.get('columns'):
+                try:
+                    inferred_column_data = table_ingest.infer_columns(
+                        parquet_file
+                    )
+                except ValueError as e:
+                    return Response(
+                        f'Could not infer columns from Parquet file: {str(e)}',
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+
+        (is_valid, validation_checks) = _validate(
+            request,
+            inferred_column_data
+        )
         if not is_valid:
             return Response(
                 f'Request is not valid: {str(validation_checks)}',
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        table_name = request.data.get('table_name')
+        column_data = (
+            inferred_column_data
+            if inferred_column_data is not None
+            else json.loads(request.data.get('columns'))
+        )
+        columns = table_ingest.parse_columns(column_data)
+        ingest_mode = request.data.get(
+            'ingest_mode',
+            models.EnumIngestModes.FDW
+        )
+        load_options = parse_load_options(request, column_data)
+        indexes = table_ingest.parse_indexes(
+            load_options['indexes'],
+            [column.column_name for column in columns]
+        )
+
+        partition = (
+            parse_partitioning(request, column_data)
+            if request.data.get('partitioning')
+            else None
+        )
+
+        parallelism = int(request.data.get(
+            'parallelism',
+            settings.TABLES_INGEST_MAX_PARALLELISM
+        ))
+
+        # NOTE: Clones are plain tables, so partitioned tables are always
+        # loaded from the upload.
+        on_duplicate = request.data.get('on_duplicate', 'ingest')
+        duplicate_table = (
+            find_duplicate_table(
+                request,
+                upload_handlers.uploaded_content_hash(request),
+                column_data
+            )
+            if on_duplicate != 'ingest' and partition is None
+            else None
+        )
+        if duplicate_table is not None and on_duplicate == 'reject':
+            return Response(
+                f'Upload was already loaded into table {duplicate_table.table_name}.',
+                status=status.HTTP_409_CONFLICT
+            )
+        if duplicate_table is not None:
+            with core_utils.PostgreSQLCursor(db_schema=request.user.id) as (psql_conn, psql_cursor):
+                table_ingest.clone_table(
+                    psql_cursor,
+                    duplicate_table.table_name,
+                    table_name,
+                    unlogged=load_options['unlogged']
+                )
+                table_ingest.finalize_table(
+                    psql_cursor,
+                    table_name,
+                    indexes=indexes,
+                    unlogged=load_options['unlogged']
+                )
+                psql_conn.commit()
+
+            return table_created_response(
+                request,
+                table_name,
+                {'cloned_from': duplicate_table.table_name},
+                source_columns=column_data
+            )
+
+        missing_columns = table_ingest.missing_parquet_columns(
+            parquet_file,
+            columns
+        )
+        if missing_columns:
+            return Response(
+                f'Columns not present in Parquet file: {str(missing_columns)}',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        incompatible_columns = table_ingest.incompatible_parquet_columns(
+            parquet_file,
+            columns
+        )
+        if incompatible_columns:
+            return Response(
+                f'Column types do not match Parquet file: {str(incompatible_columns)}',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if request.data.get('asynchronous', 'false').lower() == 'true':
+            return queue_ingest(
+                request,
+                column_data,
+                models.EnumFileFormats.PARQUET,
+                ingest_mode,
+                dict(
+                    load_options,
+                    parallelism=parallelism,
+                    partitioning=json.loads(request.data.get('partitioning', 'null')),
+                    compression=compression
+                )
+            )
+
+        # NOTE: Parallel load processes each open the Parquet file by path, so
+        # this only applies to uploads Django spooled to disk. Small, in-memory
+        # uploads fall through to a single-connection streaming load.
+        profiler = table_profiles.ColumnProfiler(
+            [column.column_name for column in columns]
+        )
+
+        if (
+            ingest_mode == models.EnumIngestModes.PARALLEL and
+            hasattr(request.data['file'], 'temporary_file_path')
+        ):
+            # Values out of range for their column types only surface once a
+            # load process reaches them.
+            try:
+                table_ingest.copy_parquet_parallel(
+                    request.user.id,
+                    table_name,
+                    column_data,
+                    request.data['file'].temporary_file_path(),
+                    parallelism,
+                    f'temp_{str(request.user.id)}_staged_{uuid.uuid4().hex}',
+                    indexes=indexes,
+                    unlogged=load_options['unlogged'],
+                    partition=partition,
+                    profiler=profiler
+                )
+            except (ValueError, psycopg2.Error) as e:
+                return Response(
+                    f'Uploaded file could not be copied: {str(e)}',
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            return table_created_response(
+                request,
+                table_name,
+                source_columns=column_data,
+                profiler=profiler
+            )
+
+        if ingest_mode in COPY_INGEST_MODES:
+            # NOTE: The table is created and loaded within one transaction, so
+            # a failed 'COPY' leaves nothing behind once the connection closes.
+            with core_utils.PostgreSQLCursor(db_schema=request.user.id) as (psql_conn, psql_cursor):
+                table_ingest.create_table(
+                    psql_cursor,
+                    table_name,
+                    columns,
+                    unlogged=load_options['unlogged'],
+                    partition=partition,
+                    parquet_file=parquet_file
+                )
+                # Values out of range for their column types only surface once
+                # 'COPY' reaches them.
+                try:
+                    table_ingest.copy_parquet(
+                        psql_cursor,
+                        table_name,
+                        columns,
+                        parquet_file,
+                        profiler=profiler
+                    )
+                except (ValueError, psycopg2.Error) as e:
+                    psql_conn.rollback()
+                    return Response(
+                        f'Uploaded file could not be copied: {str(e)}',
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                table_ingest.finalize_table(
+                    psql_cursor,
+                    table_name,
+                    indexes=indexes,
+                    unlogged=load_options['unlogged']
+                )
+                psql_conn.commit()
+
+            return table_created_response(
+                request,
+                table_name,
+                source_columns=column_data,
+                profiler=profiler
+            )
+
         file_serializer = serializers.DataFileSerializer(
             # Use the form key 'file=@$FILENAME' in order to send binary files
             # as part of a multipart/form-data request.
             data={
-                'file': request.data['file']
+                'file': request.data['file'],
+                'content_hash': upload_handlers.uploaded_content_hash(request)
             }
         )
 
@@ -149,84 +764,31 @@ class CreateTableView(APIView):
 
         datafile = file_serializer.save()
 
-        table_name = request.data.get('table_name')
-
         file_abspath = os.path.join(
             settings.MEDIA_ROOT,
             datafile.file.name
         )
 
-        temp_table_name = f'temp_{str(request.user.id)}_created_{int(datetime.datetime.now().timestamp())}'
-
-        copy_table_sql_query = sql.SQL(
-            'CREATE TABLE {table_name} AS TABLE {temp_table_name} WITH DATA'
-        ).format(
-            table_name=sql.Identifier(table_name),
-            temp_table_name=sql.Identifier(temp_table_name)
-        )
-
-        drop_temp_table_sql_query = sql.SQL(
-            'DROP FOREIGN TABLE {temp_table_name}'
-        ).format(
-            temp_table_name=sql.Identifier(temp_table_name)
-        )
+        temp_table_name = f'temp_{str(request.user.id)}_created_{uuid.uuid4().hex}'
 
         # Add error handling logic within this with block if there are numerous
         # HTTP 500 errors that appear in logs.
         with core_utils.PostgreSQLCursor(db_schema=request.user.id) as (psql_conn, psql_cursor):
-            # Dynamic column creation makes table creation query much more
-            # tricky.
-            columns = json.loads(request.data.get('columns'))
-            column_names = [
-                column_def['column_name']
-                for column_def
-                in columns
-            ]
-            column_types = [
-                column_def['column_type'].upper()
-                for column_def
-                in columns
-            ]
-            column_query = sql.SQL(',').join([
-                sql.SQL('{} {}').format(
-                    sql.Identifier(column_name),
-                    sql.Placeholder()
-                )
-                for column_name
-                in column_names
-            ])
-
-            create_foreign_table_sql_query = sql.SQL(
-                'CREATE FOREIGN TABLE {temp_table_name} ({columns}) SERVER parquet_srv OPTIONS (filename {file_abspath});'
-            ).format(
-                temp_table_name=sql.Identifier(temp_table_name),
-                columns=column_query,
-                file_abspath=sql.Literal(file_abspath)
-            )
-            create_foreign_table_sql_query = create_foreign_table_sql_query.as_string(psql_conn)
-
-            # TODO: I am concerned this may be a little insecure, since I am not
-            # referencing the DB API when templating this string. This has to be
-            # done because psycopg2.sql wraps elements within singly or doubly
-            # quoted strings, but column types are not strings. I think this
-            # should be fine because I can validate recognized column types as
-            # enumerations. That hasn't been done yet.
-            create_foreign_table_sql_query = create_foreign_table_sql_query % tuple(column_types)
-
-            psql_cursor.execute(create_foreign_table_sql_query)
-
-            psql_cursor.execute(copy_table_sql_query)
-            psql_cursor.execute(drop_temp_table_sql_query)
-            psql_conn.commit()
-
-            table_serializer = serializers.TableSerializer(
-                data={
-                    'table_name': table_name,
-                    'user': request.user.id
-                }
+            table_ingest.copy_parquet_fdw(
+                psql_cursor,
+                table_name,
+                columns,
+                file_abspath,
+                temp_table_name,
+                unlogged=load_options['unlogged']
             )
-            if table_serializer.is_valid():
-                table_serializer.save()
+            table_ingest.finalize_table(
+                psql_cursor,
+                table_name,
+                indexes=indexes,
+                unlogged=load_options['unlogged']
+            )
+            psql_conn.commit()
 
             datafile.delete()
             # Deleting the data model does not delete the file. Do that
@@ -236,7 +798,2532 @@ class CreateTableView(APIView):
                 str(datafile.file)
             )))
 
-        return Response(
-            table_serializer.data,
-            status=status.HTTP_201_CREATED
+        return table_created_response(
+            request,
+            table_name,
+            source_columns=column_data
+        )
+
+
+class CreateForeignTableView(APIView):
+    """
+    Handles 'CREATE FOREIGN TABLE' over a Parquet file kept in place via API.
+    """
+    parser_classes = (
+        MultiPartParser,
+        FormParser,
+    )
+
+    def post(self, request, *args, **kwargs):
+        """
+        Handles the HTTP POST request.
+
+        Unlike 'tables/create/', no rows are copied. The upload is saved
+        underneath MEDIA_ROOT and read in place through 'parquet_fdw' on every
+        query, so large, rarely queried archival data is only stored once.
+        Foreign tables are read-only; 'tables/append/' does not apply to them.
+
+        'parquet_fdw' skips Parquet row groups whose footer statistics rule out
+        a query's 'WHERE' clause, so write the file clustered by the columns it
+        is usually filtered on. If the file is sorted, pass '-F sorted' (a JSON
+        list of columns) so the planner can skip sorting on them too.
+
+        Column profiles are taken from the Parquet footer statistics, without
+        reading any rows.
+
+        Frequently queried subsets can be cached with 'tables/hot/create/'.
+        Foreign tables have no stable row identifiers, so 'tables/rows/' only
+        pages through hot slices, not the foreign table itself;
+        'tables/export/' works on both.
+
+        Example usage:
+
+        - curl \
+            --header "Content-Type: multipart/form-data" \
+            --header "Authorization: JWT $JWT_ACCESS_TOKEN" \
+            --method POST \
+            -F file=@archive.parquet \
+            -F table_name=archive \
+            -F sorted='["created"]' \
+            https://api.tinydevcrm.com/tables/create/foreign/
+
+        If '-F columns' is omitted, columns are inferred from the Parquet
+        footer, as for 'tables/create/'.
+        """
+        def _validate(request, inferred_column_data):
+            """
+            Validates request data.
+
+            Args:
+                rest_framework.request.Request
+                list: Columns inferred from the Parquet footer, if '-F columns'
+                    was omitted.
+
+            Returns:
+                (bool, dict): (Request is valid, reasons)
+            """
+            checks = {
+                'all_required_keys_are_present': True,
+                'column_schema_is_valid': True,
+                'column_types_are_valid': True,
+                'sorted_columns_are_valid': True,
+                'table_does_not_exist': True
+            }
+
+            if (
+                not request.data.get('file') or
+                not request.data.get('table_name') or
+                not (request.data.get('columns') or inferred_column_data)
+            ):
+                checks['all_required_keys_are_present'] = False
+                return (
+                    False,
+                    checks
+                )
+
+            try:
+                column_data = (
+                    inferred_column_data
+                    if inferred_column_data is not None
+                    else json.loads(request.data.get('columns'))
+                )
+                assert type(column_data) is list
+                for item in column_data:
+                    assert type(item) is dict
+                    assert sorted(item.keys()) == ['column_name', 'column_type']
+            except (Exception, AssertionError) as e:
+                checks['column_schema_is_valid'] = False
+                return (
+                    False,
+                    checks
+                )
+
+            try:
+                table_ingest.parse_columns(column_data)
+            except ValueError as e:
+                checks['column_types_are_valid'] = False
+
+            try:
+                sorted_columns = json.loads(request.data.get('sorted', '[]'))
+                assert type(sorted_columns) is list
+                assert set(sorted_columns) <= set(
+                    column_def['column_name']
+                    for column_def
+                    in column_data
+                )
+            except (Exception, AssertionError) as e:
+                checks['sorted_columns_are_valid'] = False
+
+            checks['table_does_not_exist'] = not table_utils.table_exists(
+                str(request.user.id),
+                request.data.get('table_name')
+            )
+
+            return (
+                all(checks.values()),
+                checks
+            )
+
+        # Hash the upload as it streams in. This must happen before
+        # 'request.data' is first accessed, which parses the request body.
+        request.upload_handlers.insert(
+            0,
+            upload_handlers.ContentHashUploadHandler(request._request)
+        )
+
+        parquet_file = None
+        inferred_column_data = None
+        if request.data.get('file'):
+            try:
+                parquet_file = table_ingest.open_parquet_upload(
+                    request.data['file']
+                )
+            except (ValueError, IOError) as e:
+                return Response(
+                    f'Uploaded file is not a valid Parquet file: {str(e)}',
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            if not request.data.get('columns'):
+                try:
+                    inferred_column_data = table_ingest.infer_columns(
+                        parquet_file
+                    )
+                except ValueError as e:
+                    return Response(
+                        f'Could not infer columns from Parquet file: {str(e)}',
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+
+        (is_valid, validation_checks) = _validate(
+            request,
+            inferred_column_data
+        )
+        if not is_valid:
+            return Response(
+                f'Request is not valid: {str(validation_checks)}',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        table_name = request.data.get('table_name')
+        column_data = (
+            inferred_column_data
+            if inferred_column_data is not None
+            else json.loads(request.data.get('columns'))
+        )
+        columns = table_ingest.parse_columns(column_data)
+
+        missing_columns = table_ingest.missing_parquet_columns(
+            parquet_file,
+            columns
+        )
+        if missing_columns:
+            return Response(
+                f'Columns not present in Parquet file: {str(missing_columns)}',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        incompatible_columns = table_ingest.incompatible_parquet_columns(
+            parquet_file,
+            columns
+        )
+        if incompatible_columns:
+            return Response(
+                f'Column types do not match Parquet file: {str(incompatible_columns)}',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        profiler = table_profiles.parquet_footer_profiler(
+            parquet_file,
+            [column.column_name for column in columns]
+        )
+
+        file_serializer = serializers.DataFileSerializer(
+            data={
+                'file': request.data['file'],
+                'content_hash': upload_handlers.uploaded_content_hash(request)
+            }
+        )
+        if not file_serializer.is_valid():
+            return Response(
+                file_serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        datafile = file_serializer.save()
+
+        with core_utils.PostgreSQLCursor(db_schema=request.user.id) as (psql_conn, psql_cursor):
+            psql_cursor.execute(
+                table_ingest.create_foreign_table_sql(
+                    table_name,
+                    columns,
+                    os.path.join(
+                        settings.MEDIA_ROOT,
+                        datafile.file.name
+                    ),
+                    sorted_columns=json.loads(request.data.get('sorted', '[]'))
+                )
+            )
+            # NOTE: If 'parquet_fdw' cannot sample the file, PostgreSQL only
+            # warns and skips the table; the planner then falls back to default
+            # estimates.
+            psql_cursor.execute(
+                sql.SQL('ANALYZE {table_name}').format(
+                    table_name=sql.Identifier(table_name)
+                )
+            )
+            psql_conn.commit()
+
+        return table_created_response(
+            request,
+            table_name,
+            source_columns=column_data,
+            profiler=profiler,
+            datafile=datafile
+        )
+
+
+class CreateTableBatchView(APIView):
+    """
+    Handles creating several tables from Parquet files in one request via API.
+    """
+    parser_classes = (
+        MultiPartParser,
+        FormParser,
+    )
+
+    def post(self, request, *args, **kwargs):
+        """
+        Handles the HTTP POST request.
+
+        Takes any number of Parquet files, each uploaded under its own form
+        field, and a '-F tables' JSON list with one table definition per file.
+        Every table of the batch is created, or none is: files are streamed
+        into staging tables over up to '-F parallelism=N' connections at once
+        (at most TABLES_INGEST_MAX_PARALLELISM), and only renamed into place,
+        all in one transaction, once every file has loaded. See
+        'tables/batch.py'.
+
+        Example usage:
+
+        - curl \
+            --header "Content-Type: multipart/form-data" \
+            --header "Authorization: JWT $JWT_ACCESS_TOKEN" \
+            --method POST \
+            -F customers=@customers.parquet \
+            -F orders=@orders.parquet.zst \
+            -F tables='[{"file": "customers", "table_name": "customers", "indexes": [{"columns": ["id"], "unique": true}]}, {"file": "orders", "table_name": "orders", "partitioning": {"column": "created", "method": "range", "interval": "month"}}]' \
+            https://api.tinydevcrm.com/tables/create/batch/
+
+        Table definitions take the same options as 'tables/create/' with
+        '-F ingest_mode=stream': "columns" (inferred from the Parquet footer if
+        omitted), "indexes", "unlogged", "partitioning", and "compression".
+
+        Returns HTTP 201 Created with every table, and the number of rows
+        copied into each. If any file fails to load, the whole batch is rolled
+        back, and no table is created.
+        """
+        def _validate(request):
+            """
+            Validates request data.
+
+            Returns:
+                (bool, dict): (Request is valid, reasons)
+            """
+            checks = {
+                'all_required_keys_are_present': True,
+                'table_definitions_are_valid': True,
+                'batch_size_is_valid': True,
+                'files_are_present': True,
+                'parallelism_is_valid': True,
+                'tables_do_not_exist': True
+            }
+
+            if not request.data.get('tables'):
+                checks['all_required_keys_are_present'] = False
+
+            try:
+                table_data = json.loads(request.data.get('tables'))
+                table_batch.validate_batch_definitions(table_data)
+            except (Exception, ValueError) as e:
+                checks['table_definitions_are_valid'] = False
+                table_data = []
+
+            if len(table_data) > settings.TABLES_BATCH_MAX_TABLES:
+                checks['batch_size_is_valid'] = False
+
+            for item in table_data:
+                if not hasattr(request.data.get(item['file']), 'read'):
+                    checks['files_are_present'] = False
+
+            try:
+                parallelism = int(request.data.get(
+                    'parallelism',
+                    settings.TABLES_INGEST_MAX_PARALLELISM
+                ))
+                assert 1 <= parallelism <= settings.TABLES_INGEST_MAX_PARALLELISM
+            except (Exception, AssertionError) as e:
+                checks['parallelism_is_valid'] = False
+
+            if table_data:
+                checks['tables_do_not_exist'] = not table_utils.existing_tables(
+                    str(request.user.id),
+                    [item['table_name'] for item in table_data]
+                )
+
+            return (
+                all(checks.values()),
+                checks
+            )
+
+        # Hash each upload as it streams in, keyed by form field. This must
+        # happen before 'request.data' is first accessed.
+        request.upload_handlers.insert(
+            0,
+            upload_handlers.ContentHashUploadHandler(request._request)
+        )
+
+        (is_valid, validation_checks) = _validate(request)
+        if not is_valid:
+            return Response(
+                f'Request is not valid: {str(validation_checks)}',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        table_data = json.loads(request.data.get('tables'))
+        parallelism = int(request.data.get(
+            'parallelism',
+            settings.TABLES_INGEST_MAX_PARALLELISM
+        ))
+
+        # Only the Parquet footers are read here, so that a bad definition
+        # rejects the batch before any data is loaded.
+        staging_prefix = f'temp_{str(request.user.id)}_batch_{uuid.uuid4().hex}'
+        batch_tables = []
+        for (index, item) in enumerate(table_data):
+            uploaded_file = request.data[item['file']]
+            try:
+                parquet_file = table_ingest.open_parquet_upload(
+                    uploaded_file,
+                    compression=table_ingest.parse_compression(
+                        item.get('compression'),
+                        uploaded_file.name
+                    )
+                )
+            except (ValueError, IOError) as e:
+                return Response(
+                    f'Uploaded file {item["file"]} is not a valid Parquet file: {str(e)}',
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            try:
+                batch_tables.append(
+                    table_batch.parse_batch_table(
+                        item,
+                        parquet_file,
+                        f'{staging_prefix}_{index}'
+                    )
+                )
+            except ValueError as e:
+                return Response(
+                    f'Table {item["table_name"]} is not valid: {str(e)}',
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        # Child partitions are named after their table, see
+        # 'tables/partitioning.py', and may clash with existing tables or with
+        # other tables of the batch.
+        child_names = set(
+            child_name
+            for batch_table
+            in batch_tables
+            if batch_table.partition is not None
+            for child_name
+            in table_partitioning.partition_names(
+                batch_table.table_name,
+                batch_table.partition
+            )
+        )
+        if child_names:
+            clashing_names = (
+                table_utils.existing_tables(str(request.user.id), child_names) |
+                (child_names & set(batch_table.table_name for batch_table in batch_tables))
+            )
+            if clashing_names:
+                return Response(
+                    f'Partitions would clash with tables: {str(sorted(clashing_names))}',
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        profilers = [
+            table_profiles.ColumnProfiler(
+                [column.column_name for column in batch_table.columns]
+            )
+            for batch_table
+            in batch_tables
+        ]
+
+        try:
+            rows_copied = table_batch.load_batch(
+                request.user.id,
+                batch_tables,
+                parallelism,
+                profilers=profilers
+            )
+        except psycopg2.errors.DuplicateTable as e:
+            return Response(
+                f'Batch was rolled back: {str(e)}',
+                status=status.HTTP_409_CONFLICT
+            )
+        except (psycopg2.DataError, psycopg2.IntegrityError) as e:
+            return Response(
+                f'Batch was rolled back: {str(e)}',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        with transaction.atomic():
+            tables = [
+                models.Table.objects.create(
+                    table_name=batch_table.table_name,
+                    user=request.user,
+                    content_hash=upload_handlers.uploaded_content_hash(
+                        request,
+                        batch_table.file
+                    ),
+                    source_columns=batch_table.column_data
+                )
+                for batch_table
+                in batch_tables
+            ]
+
+        response_data = []
+        for (table, profiler, table_rows_copied) in zip(tables, profilers, rows_copied):
+            table_profiles.save_column_profiles(table, profiler)
+            response_data.append(
+                dict(
+                    serializers.TableSerializer(table).data,
+                    rows_copied=table_rows_copied
+                )
+            )
+
+        return Response(
+            response_data,
+            status=status.HTTP_201_CREATED
+        )
+
+
+class CreateHotSliceView(APIView):
+    """
+    Handles caching a subset of a foreign table as a materialized view via API.
+    """
+
+    def post(self, request, *args, **kwargs):
+        """
+        Handles the HTTP POST request.
+
+        Creates a materialized view over the projected 'columns' of the rows of
+        a foreign table matching every 'filters' expression (the
+        'column:operator:value' syntax of 'tables/rows/'). Filters bounded on
+        the columns the Parquet file is clustered by only read the matching
+        row groups. See 'tables/foreign.py'.
+
+        The slice is built once, then only re-read from the Parquet file via
+        'tables/hot/refresh/'.
+
+        Example usage:
+
+        - curl \
+            --header "Content-Type: application/json" \
+            --header "Authorization: JWT $JWT_ACCESS_TOKEN" \
+            --method POST \
+            --data '{"table_name": "archive", "view_name": "archive_2020", "filters": ["created:gte:2020-01-01"]}' \
+            https://api.tinydevcrm.com/tables/hot/create/
+        """
+        def _validate(request):
+            """
+            Validates request data.
+
+            Args:
+                rest_framework.request.Request
+
+            Returns:
+                (bool, dict): (Request is valid, reasons)
+            """
+            checks = {
+                'all_required_keys_are_present': True,
+                'table_is_foreign': True,
+                'view_name_is_valid': True,
+                'view_does_not_exist': True,
+                'projection_is_valid': True,
+                'filters_are_valid': True
+            }
+
+            table_name = request.data.get('table_name')
+            view_name = request.data.get('view_name')
+            if not table_name or not view_name:
+                checks['all_required_keys_are_present'] = False
+                return (
+                    False,
+                    checks
+                )
+
+            checks['table_is_foreign'] = models.Table.objects.filter(
+                user=request.user.id,
+                table_name=table_name,
+                datafile__isnull=False
+            ).exists() and table_indexes.relation_kind(
+                request.user.id,
+                table_name
+            ) == 'f'
+            if not checks['table_is_foreign']:
+                return (
+                    False,
+                    checks
+                )
+
+            if type(view_name) is not str or len(view_name.encode('utf-8')) > 63:
+                checks['view_name_is_valid'] = False
+            else:
+                checks['view_does_not_exist'] = table_indexes.relation_kind(
+                    request.user.id,
+                    view_name
+                ) is None
+
+            column_names = [
+                column_name
+                for (column_name, type_oid)
+                in table_export.relation_columns(request.user.id, table_name)
+            ]
+
+            projection = request.data.get('columns', [])
+            if type(projection) is not list or not set(projection) <= set(column_names):
+                checks['projection_is_valid'] = False
+
+            try:
+                table_foreign.compile_filters(
+                    request.data.get('filters', []),
+                    column_names
+                )
+            except ValueError as e:
+                checks['filters_are_valid'] = False
+
+            return (
+                all(checks.values()),
+                checks
+            )
+
+        (is_valid, validation_checks) = _validate(request)
+        if not is_valid:
+            return Response(
+                f'Request is not valid: {str(validation_checks)}',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        table = models.Table.objects.filter(
+            user=request.user.id,
+            table_name=request.data.get('table_name'),
+            datafile__isnull=False
+        ).order_by('-id').first()
+        view_name = request.data.get('view_name')
+        column_names = [
+            column_name
+            for (column_name, type_oid)
+            in table_export.relation_columns(request.user.id, table.table_name)
+        ]
+
+        start_time = time.monotonic()
+
+        with core_utils.PostgreSQLCursor(db_schema=request.user.id) as (psql_conn, psql_cursor):
+            try:
+                psql_cursor.execute(
+                    table_foreign.hot_slice_sql(
+                        view_name,
+                        table.table_name,
+                        request.data.get('columns', []),
+                        table_foreign.compile_filters(
+                            request.data.get('filters', []),
+                            column_names
+                        )
+                    )
+                )
+            except (psycopg2.DataError, psycopg2.ProgrammingError) as e:
+                # E.g. a filter value that cannot be coerced into the column
+                # type, or 'like' on a non-text column.
+                psql_conn.rollback()
+                return Response(
+                    f'Request is not valid: {str(e)}',
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            psql_conn.commit()
+
+        hot_slice = models.HotSlice.objects.create(
+            table=table,
+            view_name=view_name,
+            columns=request.data.get('columns', []),
+            filters=request.data.get('filters', []),
+            refreshed=timezone.now()
+        )
+
+        response_data = dict(serializers.HotSliceSerializer(hot_slice).data)
+        response_data['elapsed_seconds'] = round(time.monotonic() - start_time, 3)
+
+        return Response(
+            response_data,
+            status=status.HTTP_201_CREATED
+        )
+
+
+class RefreshHotSliceView(APIView):
+    """
+    Handles refreshing a hot slice of a foreign table via API.
+    """
+
+    def post(self, request, *args, **kwargs):
+        """
+        Handles the HTTP POST request.
+
+        Re-reads the slice from the Parquet file backing the foreign table, e.g.
+        after the file was replaced.
+
+        Example usage:
+
+        - curl \
+            --header "Content-Type: application/json" \
+            --header "Authorization: JWT $JWT_ACCESS_TOKEN" \
+            --method POST \
+            --data '{"view_name": "archive_2020"}' \
+            https://api.tinydevcrm.com/tables/hot/refresh/
+        """
+        hot_slice = models.HotSlice.objects.filter(
+            table__user=request.user.id,
+            view_name=request.data.get('view_name')
+        ).order_by('-id').first()
+
+        if hot_slice is None or not views_utils.materialized_view_exists(
+            request.user.id,
+            hot_slice.view_name
+        ):
+            return Response(
+                f'Hot slice {request.data.get("view_name")} does not exist.',
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        start_time = time.monotonic()
+
+        with core_utils.PostgreSQLCursor(db_schema=request.user.id) as (psql_conn, psql_cursor):
+            psql_cursor.execute(
+                table_foreign.refresh_hot_slice_sql(hot_slice.view_name)
+            )
+            psql_conn.commit()
+
+        hot_slice.refreshed = timezone.now()
+        hot_slice.save(update_fields=['refreshed'])
+
+        response_data = dict(serializers.HotSliceSerializer(hot_slice).data)
+        response_data['elapsed_seconds'] = round(time.monotonic() - start_time, 3)
+
+        return Response(
+            response_data,
+            status=status.HTTP_200_OK
+        )
+
+
+class CreateTableFromCSVView(APIView):
+    """
+    Handles CSV / TSV bulk ingest into a new table via API.
+    """
+    parser_classes = (
+        MultiPartParser,
+        FormParser,
+    )
+
+    def post(self, request, *args, **kwargs):
+        """
+        Handles the HTTP POST request.
+
+        The upload is streamed chunk by chunk into 'COPY ... FROM STDIN WITH
+        (FORMAT csv)', so the file never touches MEDIA_ROOT and never needs to be
+        converted to Parquet first. PostgreSQL coerces each field into the
+        declared column type while parsing, so a bad value fails the request
+        with the offending line number instead of producing a partial table.
+
+        The 'columns' JSON schema contract is the same as 'tables/create/', and
+        must list columns in file order. Column types must come from the
+        whitelist in 'tables/ingest.py'.
+
+        Optional keys:
+
+        - 'format': 'csv' (default) or 'tsv'.
+        - 'header': 'true' (default) if the first line is a header to skip.
+        - 'compression': 'gzip' or 'zstd', if the upload is compressed.
+          Inferred from a file name ending in '.gz' or '.zst' otherwise. The
+          upload is decompressed chunk by chunk as it is piped into 'COPY', so
+          no decompressed copy is ever written.
+        - 'unlogged' and 'indexes': staged pipeline, see 'tables/create/'.
+        - 'asynchronous': 'true' to queue the load for an ingest worker and
+          return HTTP 202 Accepted right away. See 'tables/create/'.
+
+        Example usage:
+
+        - curl \
+            --header "Content-Type: multipart/form-data" \
+            --header "Authorization: JWT $JWT_ACCESS_TOKEN" \
+            --method POST \
+            -F file=@sample.csv \
+            -F table_name=sample_table \
+            -F columns='[{"column_name": "SomeNumber", "column_type":"int"},{"column_name":"SomeString","column_type":"varchar(256)"}]' \
+            https://api.tinydevcrm.com/tables/create/csv/
+        """
+        def _validate(request):
+            """
+            Validates request data.
+
+            Args:
+                rest_framework.request.Request
+
+            Returns:
+                (bool, dict): (Request is valid, reasons)
+            """
+            checks = {
+                'all_required_keys_are_present': True,
+                'format_is_valid': True,
+                'header_is_valid': True,
+                'compression_is_valid': True,
+                'column_schema_is_valid': True,
+                'column_types_are_valid': True,
+                'load_options_are_valid': True,
+                'table_does_not_exist': True
+            }
+
+            if (
+                not request.data.get('file') or
+                not request.data.get('table_name') or
+                not request.data.get('columns')
+            ):
+                checks['all_required_keys_are_present'] = False
+
+            if request.data.get('format', 'csv') not in table_ingest.CSV_DELIMITERS:
+                checks['format_is_valid'] = False
+
+            if request.data.get('header', 'true').lower() not in ('true', 'false'):
+                checks['header_is_valid'] = False
+
+            try:
+                upload_compression(request)
+            except ValueError as e:
+                checks['compression_is_valid'] = False
+
+            columns = request.data.get('columns')
+            try:
+                column_data = json.loads(columns)
+                assert type(column_data) is list
+                for item in column_data:
+                    assert type(item) is dict
+                    assert sorted(item.keys()) == ['column_name', 'column_type']
+            except (Exception, AssertionError) as e:
+                checks['column_schema_is_valid'] = False
+
+            if checks['column_schema_is_valid']:
+                try:
+                    table_ingest.parse_columns(column_data)
+                except ValueError as e:
+                    checks['column_types_are_valid'] = False
+
+                try:
+                    parse_load_options(request, column_data)
+                except (Exception, ValueError) as e:
+                    checks['load_options_are_valid'] = False
+
+            checks['table_does_not_exist'] = not table_utils.table_exists(
+                str(request.user.id),
+                request.data.get('table_name')
+            )
+
+            return (
+                all(checks.values()),
+                checks
+            )
+
+        (is_valid, validation_checks) = _validate(request)
+        if not is_valid:
+            return Response(
+                f'Request is not valid: {str(validation_checks)}',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        table_name = request.data.get('table_name')
+        column_data = json.loads(request.data.get('columns'))
+        columns = table_ingest.parse_columns(column_data)
+        load_options = parse_load_options(request, column_data)
+        delimiter = table_ingest.CSV_DELIMITERS[
+            request.data.get('format', 'csv')
+        ]
+        header = request.data.get('header', 'true').lower() == 'true'
+        compression = upload_compression(request)
+
+        if request.data.get('asynchronous', 'false').lower() == 'true':
+            return queue_ingest(
+                request,
+                column_data,
+                models.EnumFileFormats.CSV,
+                models.EnumIngestModes.STREAM,
+                dict(
+                    load_options,
+                    delimiter=delimiter,
+                    header=header,
+                    compression=compression
+                )
+            )
+
+        start_time = time.monotonic()
+
+        with core_utils.PostgreSQLCursor(db_schema=request.user.id) as (psql_conn, psql_cursor):
+            psql_cursor.execute(
+                table_ingest.create_table_sql(
+                    table_name,
+                    columns,
+                    unlogged=load_options['unlogged']
+                )
+            )
+            # Malformed rows, and values that cannot be coerced into their
+            # column types, only surface once 'COPY' reaches them.
+            try:
+                rows_copied = table_ingest.copy_csv(
+                    psql_cursor,
+                    table_name,
+                    columns,
+                    (
+                        table_ingest.decompressed_chunks(
+                            request.data['file'],
+                            compression
+                        )
+                        if compression is not None
+                        else request.data['file'].chunks(table_ingest.COPY_BUFFER_SIZE)
+                    ),
+                    delimiter=delimiter,
+                    header=header
+                )
+            except psycopg2.DataError as e:
+                psql_conn.rollback()
+                return Response(
+                    f'Uploaded file could not be copied: {str(e)}',
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            table_ingest.finalize_table(
+                psql_cursor,
+                table_name,
+                indexes=table_ingest.parse_indexes(
+                    load_options['indexes'],
+                    [column.column_name for column in columns]
+                ),
+                unlogged=load_options['unlogged']
+            )
+            psql_conn.commit()
+
+        elapsed_seconds = time.monotonic() - start_time
+
+        return table_created_response(
+            request,
+            table_name,
+            {
+                'rows_copied': rows_copied,
+                'elapsed_seconds': round(elapsed_seconds, 3),
+                'rows_per_second': (
+                    round(rows_copied / elapsed_seconds, 1)
+                    if elapsed_seconds > 0
+                    else None
+                )
+            }
+        )
+
+
+class CreateUploadView(APIView):
+    """
+    Handles starting a resumable chunked upload via API.
+    """
+
+    def post(self, request, *args, **kwargs):
+        """
+        Handles the HTTP POST request.
+
+        Single multipart POSTs to 'tables/create/' must succeed end to end; if
+        the connection drops, the whole file is sent again. Resumable uploads
+        send the file as byte ranges instead, so only the chunk in flight is
+        lost. See 'tables/uploads.py'.
+
+        Declare the file size in bytes, and optionally the SHA-256 of the whole
+        file to check it against on completion. Then PUT chunks of at most
+        'max_chunk_size' bytes to 'tables/uploads/<id>/', and finally POST to
+        'tables/uploads/<id>/complete/'.
+
+        Example usage:
+
+        - curl \
+            --header "Content-Type: application/json" \
+            --header "Authorization: JWT $JWT_ACCESS_TOKEN" \
+            --method POST \
+            --data '{"file_name": "sample.parquet", "total_size": 5368709120}' \
+            https://api.tinydevcrm.com/tables/uploads/
+        """
+        def _validate(request):
+            """
+            Validates request data.
+
+            Args:
+                rest_framework.request.Request
+
+            Returns:
+                (bool, dict): (Request is valid, reasons)
+            """
+            checks = {
+                'total_size_is_valid': True,
+                'content_hash_is_valid': True
+            }
+
+            total_size = request.data.get('total_size')
+            if type(total_size) is not int or total_size < 1:
+                checks['total_size_is_valid'] = False
+
+            content_hash = request.data.get('content_hash', '')
+            if content_hash and not (
+                type(content_hash) is str and
+                table_uploads.SHA256_PATTERN.match(content_hash)
+            ):
+                checks['content_hash_is_valid'] = False
+
+            return (
+                all(checks.values()),
+                checks
+            )
+
+        (is_valid, validation_checks) = _validate(request)
+        if not is_valid:
+            return Response(
+                f'Request is not valid: {str(validation_checks)}',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        upload = models.Upload.objects.create(
+            user_id=request.user.id,
+            file_name=str(request.data.get('file_name', ''))[:255],
+            total_size=request.data.get('total_size'),
+            content_hash=request.data.get('content_hash', '')
+        )
+        upload.datafile = table_uploads.allocate_datafile(
+            upload.id,
+            upload.total_size
+        )
+        upload.save(update_fields=['datafile'])
+
+        response_data = dict(serializers.UploadSerializer(upload).data)
+        response_data['max_chunk_size'] = settings.TABLES_UPLOAD_MAX_CHUNK_SIZE
+
+        return Response(
+            response_data,
+            status=status.HTTP_201_CREATED
+        )
+
+
+class UploadDetailView(APIView):
+    """
+    Handles sending chunks of, inspecting, and aborting a resumable upload via
+    API.
+    """
+
+    def _get_upload(self, request, upload_id):
+        """
+        Returns the upload of the requesting user that is still receiving
+        chunks, or None.
+        """
+        return models.Upload.objects.filter(
+            id=upload_id,
+            user=request.user.id,
+            phase=models.EnumUploadPhases.RECEIVING,
+            datafile__isnull=False
+        ).first()
+
+    def _upload_response(self, upload, response_status=status.HTTP_200_OK):
+        response_data = dict(serializers.UploadSerializer(upload).data)
+        response_data['missing_ranges'] = [
+            {
+                'start': start,
+                'end': end
+            }
+            for (start, end)
+            in table_uploads.missing_ranges(upload.chunks, upload.total_size)
+        ]
+        return Response(
+            response_data,
+            status=response_status
+        )
+
+    def get(self, request, upload_id, *args, **kwargs):
+        """
+        Handles the HTTP GET request.
+
+        Reports the bytes received so far, and the byte ranges ('start'
+        inclusive, 'end' exclusive) still to be sent.
+
+        Example usage:
+
+        - curl \
+            --header "Authorization: JWT $JWT_ACCESS_TOKEN" \
+            https://api.tinydevcrm.com/tables/uploads/1/
+        """
+        upload = models.Upload.objects.filter(
+            id=upload_id,
+            user=request.user.id
+        ).first()
+
+        if upload is None:
+            return Response(
+                f'Upload {upload_id} does not exist.',
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        return self._upload_response(upload)
+
+    def put(self, request, upload_id, *args, **kwargs):
+        """
+        Handles the HTTP PUT request.
+
+        The request body is one chunk of the file, written at the offset given
+        by the 'Content-Range' header. If 'X-Chunk-SHA256' is sent, a chunk
+        that does not match it is rejected without touching the bytes already
+        received for its range, and has to be sent again. Chunks may be sent
+        in any order, concurrently, and retried; a retried range replaces what
+        was received for it before.
+
+        Example usage:
+
+        - curl \
+            --header "Authorization: JWT $JWT_ACCESS_TOKEN" \
+            --header "Content-Type: application/octet-stream" \
+            --header "Content-Range: bytes 0-67108863/5368709120" \
+            --header "X-Chunk-SHA256: $(head -c 67108864 sample.parquet | sha256sum | cut -d ' ' -f 1)" \
+            --upload-file chunk.0 \
+            https://api.tinydevcrm.com/tables/uploads/1/
+        """
+        upload = self._get_upload(request, upload_id)
+        if upload is None:
+            return Response(
+                f'Upload {upload_id} does not exist or is already complete.',
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        try:
+            (start, end) = table_uploads.parse_content_range(
+                request.META.get('HTTP_CONTENT_RANGE'),
+                upload.total_size
+            )
+        except ValueError as e:
+            return Response(
+                str(e),
+                status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+            )
+
+        if end - start > settings.TABLES_UPLOAD_MAX_CHUNK_SIZE:
+            return Response(
+                f'Chunks may be at most {settings.TABLES_UPLOAD_MAX_CHUNK_SIZE} bytes.',
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+
+        try:
+            chunk_hash = table_uploads.write_chunk(
+                table_uploads.upload_path(upload.datafile),
+                start,
+                end,
+                request.stream,
+                expected_sha256=request.META.get('HTTP_X_CHUNK_SHA256', '').lower()
+            )
+        except (ValueError, IOError) as e:
+            return Response(
+                f'Chunk was not received: {str(e)}',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Concurrent chunks of the same upload record their ranges one at a
+        # time.
+        with transaction.atomic():
+            upload = models.Upload.objects.select_for_update().get(id=upload.id)
+            upload.chunks = table_uploads.record_chunk(
+                upload.chunks,
+                start,
+                end,
+                chunk_hash
+            )
+            upload.bytes_received = sum(
+                chunk['end'] - chunk['start']
+                for chunk
+                in upload.chunks
+            )
+            upload.save(update_fields=['chunks', 'bytes_received', 'updated'])
+
+        return self._upload_response(upload)
+
+    def delete(self, request, upload_id, *args, **kwargs):
+        """
+        Handles the HTTP DELETE request.
+
+        Aborts the upload and deletes the partial file.
+
+        Example usage:
+
+        - curl \
+            --header "Authorization: JWT $JWT_ACCESS_TOKEN" \
+            --request DELETE \
+            https://api.tinydevcrm.com/tables/uploads/1/
+        """
+        upload = self._get_upload(request, upload_id)
+        if upload is None:
+            return Response(
+                f'Upload {upload_id} does not exist or is already complete.',
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        file_abspath = table_uploads.upload_path(upload.datafile)
+        datafile = upload.datafile
+        upload.delete()
+        datafile.delete()
+        # Deleting the data model does not delete the file. Do that
+        # separately.
+        if os.path.exists(file_abspath):
+            os.remove(file_abspath)
+
+        return Response(
+            status=status.HTTP_204_NO_CONTENT
+        )
+
+
+class CompleteUploadView(APIView):
+    """
+    Handles completing a resumable upload and queueing its ingest via API.
+    """
+    parser_classes = (
+        MultiPartParser,
+        FormParser,
+    )
+
+    def post(self, request, upload_id, *args, **kwargs):
+        """
+        Handles the HTTP POST request.
+
+        Once every byte has been received, the file is queued for the ingest
+        workers started by 'python manage.py startingestworkers'. Returns HTTP
+        202 Accepted with the ingest; poll 'tables/ingests/<id>/' for its
+        progress. The worker hashes the file as a whole and checks it against
+        the 'content_hash' the upload was started with (if any) before loading
+        it, so that completing a multi-GB upload doesn't read it all back within
+        the request.
+
+        Takes the same keys as 'tables/create/' ('-F format=parquet', the
+        default) or 'tables/create/csv/' ('-F format=csv' or '-F format=tsv'),
+        except 'file', 'asynchronous', and 'on_duplicate'. Parquet uploads
+        default to '-F ingest_mode=stream'. Compressed files stay compressed
+        on disk; '-F compression' falls back to the suffix of the 'file_name'
+        the upload was started with. Only the footer of an uncompressed Parquet
+        file is read here; compressed Parquet files would have to be
+        decompressed in full first, so they require '-F columns' and are checked
+        against those columns by the worker instead.
+
+        Example usage:
+
+        - curl \
+            --header "Content-Type: multipart/form-data" \
+            --header "Authorization: JWT $JWT_ACCESS_TOKEN" \
+            --method POST \
+            -F table_name=sample_table \
+            https://api.tinydevcrm.com/tables/uploads/1/complete/
+        """
+        def _validate(request, upload, inferred_column_data):
+            """
+            Validates request data.
+
+            Args:
+                rest_framework.request.Request
+                models.Upload
+                list: Columns inferred from the Parquet footer, or None if
+                    '-F columns' was given or the footer was not read.
+
+            Returns:
+                (bool, dict): (Request is valid, reasons)
+            """
+            checks = {
+                'upload_is_receiving': True,
+                'upload_is_complete': True,
+                'all_required_keys_are_present': True,
+                'format_is_valid': True,
+                'ingest_mode_is_valid': True,
+                'column_schema_is_valid': True,
+                'column_types_are_valid': True,
+                'parallelism_is_valid': True,
+                'load_options_are_valid': True,
+                'partitioning_is_valid': True,
+                'compression_is_valid': True,
+                'table_does_not_exist': True
+            }
+
+            if upload is None:
+                checks['upload_is_receiving'] = False
+                return (
+                    False,
+                    checks
+                )
+
+            checks['upload_is_complete'] = not table_uploads.missing_ranges(
+                upload.chunks,
+                upload.total_size
+            )
+
+            file_format = request.data.get('format', 'parquet')
+            if file_format not in ('parquet',) + tuple(table_ingest.CSV_DELIMITERS.keys()):
+                checks['format_is_valid'] = False
+
+            if not request.data.get('table_name') or not (
+                request.data.get('columns') or inferred_column_data
+            ):
+                checks['all_required_keys_are_present'] = False
+
+            ingest_mode = request.data.get(
+                'ingest_mode',
+                models.EnumIngestModes.STREAM
+            )
+            if ingest_mode not in models.EnumIngestModes.values:
+                checks['ingest_mode_is_valid'] = False
+
+            try:
+                assert table_ingest.parse_compression(
+                    request.data.get('compression'),
+                    upload.file_name
+                ) is None or (
+                    file_format != 'parquet' or
+                    ingest_mode == models.EnumIngestModes.STREAM
+                )
+            except (Exception, AssertionError) as e:
+                checks['compression_is_valid'] = False
+
+            try:
+                parallelism = int(request.data.get(
+                    'parallelism',
+                    settings.TABLES_INGEST_MAX_PARALLELISM
+                ))
+                assert 1 <= parallelism <= settings.TABLES_INGEST_MAX_PARALLELISM
+            except (Exception, AssertionError) as e:
+                checks['parallelism_is_valid'] = False
+
+            try:
+                column_data = (
+                    inferred_column_data
+                    if inferred_column_data is not None
+                    else json.loads(request.data.get('columns'))
+                )
+                assert type(column_data) is list
+                for item in column_data:
+                    assert type(item) is dict
+                    assert sorted(item.keys()) == ['column_name', 'column_type']
+            except (Exception, AssertionError) as e:
+                checks['column_schema_is_valid'] = False
+
+            partition = None
+            if checks['column_schema_is_valid']:
+                try:
+                    table_ingest.parse_columns(column_data)
+                except ValueError as e:
+                    checks['column_types_are_valid'] = False
+
+                try:
+                    parse_load_options(request, column_data)
+                except (Exception, ValueError) as e:
+                    checks['load_options_are_valid'] = False
+
+                if request.data.get('partitioning'):
+                    try:
+                        partition = parse_partitioning(request, column_data)
+                        assert file_format == 'parquet'
+                        assert ingest_mode in COPY_INGEST_MODES
+                    except (Exception, AssertionError) as e:
+                        checks['partitioning_is_valid'] = False
+
+            # Child partitions are named after the table as well, see
+            # 'tables/partitioning.py'.
+            table_names = [request.data.get('table_name')]
+            if partition is not None and request.data.get('table_name'):
+                table_names += table_partitioning.partition_names(
+                    request.data.get('table_name'),
+                    partition
+                )
+            checks['table_does_not_exist'] = not table_utils.existing_tables(
+                str(request.user.id),
+                table_names
+            )
+
+            return (
+                all(checks.values()),
+                checks
+            )
+
+        upload = models.Upload.objects.filter(
+            id=upload_id,
+            user=request.user.id,
+            phase=models.EnumUploadPhases.RECEIVING,
+            datafile__isnull=False
+        ).first()
+
+        # Only the footer of a complete, uncompressed Parquet file is read
+        # here, for schema inference and type checks. The file is memory-mapped,
+        # so this doesn't page in the row groups.
+        parquet_file = None
+        inferred_column_data = None
+        if (
+            upload is not None and
+            request.data.get('format', 'parquet') == 'parquet' and
+            not table_uploads.missing_ranges(upload.chunks, upload.total_size)
+        ):
+            try:
+                compression = table_ingest.parse_compression(
+                    request.data.get('compression'),
+                    upload.file_name
+                )
+            except ValueError as e:
+                return Response(
+                    str(e),
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            if compression is None:
+                try:
+                    parquet_file = table_ingest.open_parquet_path(
+                        table_uploads.upload_path(upload.datafile)
+                    )
+                except (ValueError, IOError) as e:
+                    return Response(
+                        f'Uploaded file is not a valid Parquet file: {str(e)}',
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+
+                if not request.data.get('columns'):
+                    try:
+                        inferred_column_data = table_ingest.infer_columns(
+                            parquet_file
+                        )
+                    except ValueError as e:
+                        return Response(
+                            f'Could not infer columns from Parquet file: {str(e)}',
+                            status=status.HTTP_400_BAD_REQUEST
+                        )
+
+        (is_valid, validation_checks) = _validate(
+            request,
+            upload,
+            inferred_column_data
+        )
+        if not is_valid:
+            return Response(
+                f'Request is not valid: {str(validation_checks)}',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        datafile = upload.datafile
+        column_data = (
+            inferred_column_data
+            if inferred_column_data is not None
+            else json.loads(request.data.get('columns'))
+        )
+        compression = table_ingest.parse_compression(
+            request.data.get('compression'),
+            upload.file_name
+        )
+        file_format = request.data.get('format', 'parquet')
+        if file_format == 'parquet':
+            if parquet_file is not None:
+                columns = table_ingest.parse_columns(column_data)
+                mismatches = (
+                    table_ingest.missing_parquet_columns(parquet_file, columns) +
+                    table_ingest.incompatible_parquet_columns(parquet_file, columns)
+                )
+                if mismatches:
+                    return Response(
+                        f'Columns do not match Parquet file: {str(mismatches)}',
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+
+            options = dict(
+                parse_load_options(request, column_data),
+                parallelism=int(request.data.get(
+                    'parallelism',
+                    settings.TABLES_INGEST_MAX_PARALLELISM
+                )),
+                partitioning=json.loads(request.data.get('partitioning', 'null')),
+                compression=compression,
+                content_hash=upload.content_hash
+            )
+            file_format = models.EnumFileFormats.PARQUET
+            ingest_mode = request.data.get(
+                'ingest_mode',
+                models.EnumIngestModes.STREAM
+            )
+        else:
+            options = dict(
+                parse_load_options(request, column_data),
+                delimiter=table_ingest.CSV_DELIMITERS[file_format],
+                header=request.data.get('header', 'true').lower() == 'true',
+                compression=compression,
+                content_hash=upload.content_hash
+            )
+            file_format = models.EnumFileFormats.CSV
+            ingest_mode = models.EnumIngestModes.STREAM
+
+        ingest = queue_datafile_ingest(
+            request,
+            datafile,
+            column_data,
+            file_format,
+            ingest_mode,
+            options
+        )
+
+        upload.phase = models.EnumUploadPhases.COMPLETE
+        upload.ingest = ingest
+        upload.save(update_fields=['phase', 'ingest', 'updated'])
+
+        return Response(
+            serializers.IngestSerializer(ingest).data,
+            status=status.HTTP_202_ACCEPTED
+        )
+
+
+class AppendToTableView(APIView):
+    """
+    Handles appending or upserting rows into an existing table via API.
+    """
+    parser_classes = (
+        MultiPartParser,
+        FormParser,
+    )
+
+    def post(self, request, *args, **kwargs):
+        """
+        Handles the HTTP POST request.
+
+        Refreshing a table created by 'tables/create/' otherwise means dropping
+        and re-creating it, reloading every unchanged row. Instead, Parquet row
+        groups are streamed with binary 'COPY' into the existing table:
+
+        - '-F write_mode=append' (default) copies rows straight into the table.
+        - '-F write_mode=upsert' copies rows into a temporary staging table, and
+          merges them with 'INSERT ... ON CONFLICT (upsert_keys) DO UPDATE'.
+          Rows that already exist with identical values are skipped, so only
+          the delta is written. '-F upsert_keys' is a JSON list of column names
+          that must be covered by a unique index on the table, e.g. one built
+          with '-F indexes=[{"columns": ["SomeNumber"], "unique": true}]' at
+          creation time.
+
+        Columns are taken from the existing table. The Parquet file may omit
+        columns (which are left to their defaults on insert, and untouched on
+        update), but may not contain columns the table does not have, and must
+        contain every upsert key.
+
+        '-F asynchronous=true' queues the load for an ingest worker, and
+        '-F compression' accepts gzip or zstd compressed files, as with
+        'tables/create/'.
+
+        TODO: Support CSV / TSV uploads. Unlike Parquet, there is no footer to
+        match file columns against table columns by name.
+
+        Example usage:
+
+        - curl \
+            --header "Content-Type: multipart/form-data" \
+            --header "Authorization: JWT $JWT_ACCESS_TOKEN" \
+            --method POST \
+            -F file=@sample.parquet \
+            -F table_name=sample_table \
+            -F write_mode=upsert \
+            -F upsert_keys='["SomeNumber"]' \
+            https://api.tinydevcrm.com/tables/append/
+        """
+        def _validate(request):
+            """
+            Validates request data.
+
+            Args:
+                rest_framework.request.Request
+
+            Returns:
+                (bool, dict): (Request is valid, reasons)
+            """
+            checks = {
+                'all_required_keys_are_present': True,
+                'write_mode_is_valid': True,
+                'table_exists': True,
+                'table_is_not_foreign': True,
+                'table_column_types_are_supported': True,
+                'upsert_keys_are_valid': True,
+                'upsert_keys_have_unique_index': True,
+                'compression_is_valid': True
+            }
+
+            if (
+                not request.data.get('file') or
+                not request.data.get('table_name')
+            ):
+                checks['all_required_keys_are_present'] = False
+
+            write_mode = request.data.get(
+                'write_mode',
+                models.EnumWriteModes.APPEND
+            )
+            if write_mode not in (
+                models.EnumWriteModes.APPEND,
+                models.EnumWriteModes.UPSERT
+            ):
+                checks['write_mode_is_valid'] = False
+
+            try:
+                upload_compression(request)
+            except ValueError as e:
+                checks['compression_is_valid'] = False
+
+            checks['table_exists'] = table_utils.table_exists(
+                str(request.user.id),
+                request.data.get('table_name')
+            )
+            if not checks['table_exists']:
+                return (
+                    False,
+                    checks
+                )
+
+            # Foreign tables read their Parquet file in place, and are
+            # read-only.
+            checks['table_is_not_foreign'] = table_indexes.relation_kind(
+                request.user.id,
+                request.data.get('table_name')
+            ) != 'f'
+
+            table_column_data = table_utils.table_columns(
+                request.user.id,
+                request.data.get('table_name')
+            )
+            try:
+                table_ingest.parse_columns(table_column_data)
+            except ValueError as e:
+                checks['table_column_types_are_supported'] = False
+
+            if write_mode == models.EnumWriteModes.UPSERT:
+                try:
+                    upsert_keys = json.loads(request.data.get('upsert_keys'))
+                    assert type(upsert_keys) is list and upsert_keys
+                    table_column_names = [
+                        column_def['column_name']
+                        for column_def
+                        in table_column_data
+                    ]
+                    for key in upsert_keys:
+                        assert key in table_column_names
+                    assert len(set(upsert_keys)) == len(upsert_keys)
+                except (Exception, AssertionError) as e:
+                    checks['upsert_keys_are_valid'] = False
+
+                if checks['upsert_keys_are_valid']:
+                    checks['upsert_keys_have_unique_index'] = table_utils.has_unique_index(
+                        request.user.id,
+                        request.data.get('table_name'),
+                        upsert_keys
+                    )
+
+            return (
+                all(checks.values()),
+                checks
+            )
+
+        (is_valid, validation_checks) = _validate(request)
+        if not is_valid:
+            return Response(
+                f'Request is not valid: {str(validation_checks)}',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        compression = upload_compression(request)
+        try:
+            parquet_file = table_ingest.open_parquet_upload(
+                request.data['file'],
+                compression=compression
+            )
+        except (ValueError, IOError) as e:
+            return Response(
+                f'Uploaded file is not a valid Parquet file: {str(e)}',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        table_name = request.data.get('table_name')
+        write_mode = request.data.get(
+            'write_mode',
+            models.EnumWriteModes.APPEND
+        )
+        upsert_keys = (
+            json.loads(request.data.get('upsert_keys'))
+            if write_mode == models.EnumWriteModes.UPSERT
+            else []
+        )
+
+        # Load the table columns present in the file, in table order.
+        file_column_names = set(parquet_file.schema.names)
+        table_column_data = table_utils.table_columns(
+            request.user.id,
+            table_name
+        )
+        table_column_names = [
+            column_def['column_name']
+            for column_def
+            in table_column_data
+        ]
+        column_data = [
+            column_def
+            for column_def
+            in table_column_data
+            if column_def['column_name'] in file_column_names
+        ]
+
+        extra_columns = sorted(file_column_names - set(table_column_names))
+        if extra_columns:
+            return Response(
+                f'Columns not present in table {table_name}: {str(extra_columns)}',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        missing_keys = [
+            key
+            for key
+            in upsert_keys
+            if key not in file_column_names
+        ]
+        if missing_keys:
+            return Response(
+                f'Upsert keys not present in Parquet file: {str(missing_keys)}',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        columns = table_ingest.parse_columns(column_data)
+        incompatible_columns = table_ingest.incompatible_parquet_columns(
+            parquet_file,
+            columns
+        )
+        if incompatible_columns:
+            return Response(
+                f'Column types do not match Parquet file: {str(incompatible_columns)}',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if request.data.get('asynchronous', 'false').lower() == 'true':
+            return queue_ingest(
+                request,
+                column_data,
+                models.EnumFileFormats.PARQUET,
+                models.EnumIngestModes.STREAM,
+                {
+                    'upsert_keys': upsert_keys,
+                    'compression': compression
+                },
+                write_mode=write_mode
+            )
+
+        # NOTE: Upserts can overwrite the current minimum or maximum of a
+        # column, so their profiles are rebuilt from a scan instead.
+        profiler = (
+            table_profiles.ColumnProfiler(
+                [column.column_name for column in columns]
+            )
+            if write_mode == models.EnumWriteModes.APPEND
+            else None
+        )
+
+        with core_utils.PostgreSQLCursor(db_schema=request.user.id) as (psql_conn, psql_cursor):
+            try:
+                (rows_copied, rows_inserted, rows_updated) = table_ingest.merge_parquet(
+                    psql_cursor,
+                    table_name,
+                    columns,
+                    parquet_file,
+                    f'temp_{str(request.user.id)}_merged_{int(datetime.datetime.now().timestamp())}',
+                    upsert_keys=upsert_keys,
+                    profiler=profiler
+                )
+            except (ValueError, psycopg2.Error) as e:
+                psql_conn.rollback()
+                return Response(
+                    f'Uploaded file could not be copied: {str(e)}',
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            psql_conn.commit()
+
+        table_utils.forget_content_hash(request.user.id, table_name)
+        table_profiles.profile_merged_rows(
+            request.user.id,
+            table_name,
+            profiler
+        )
+
+        return Response(
+            {
+                'table_name': table_name,
+                'write_mode': write_mode,
+                'rows_copied': rows_copied,
+                'rows_inserted': rows_inserted,
+                'rows_updated': rows_updated
+            },
+            status=status.HTTP_200_OK
+        )
+
+
+class ExportRelationView(APIView):
+    """
+    Handles streaming a table or materialized view out of the user schema via
+    API.
+    """
+
+    def get(self, request, *args, **kwargs):
+        """
+        Handles the HTTP GET request.
+
+        The relation is read with 'COPY ... TO STDOUT' and streamed back as it
+        is produced, so memory stays constant regardless of relation size, and
+        large relations do not run into request timeouts before the first byte
+        is sent. See 'tables/export.py'.
+
+        Query parameters:
+
+        - 'relation_name': Table or materialized view to export.
+        - 'format': 'csv' (default, with a header line) or 'parquet'.
+        - 'row_group_size': Rows per Parquet row group (default 65536).
+
+        NOTE: Errors after streaming has started (e.g. the database connection
+        dropping) can only truncate the response, since the HTTP status has
+        already been sent.
+
+        Example usage:
+
+        - curl \
+            --header "Authorization: JWT $JWT_ACCESS_TOKEN" \
+            --output sample_table.parquet \
+            "https://api.tinydevcrm.com/tables/export/?relation_name=sample_table&format=parquet"
+        """
+        def _validate(request):
+            """
+            Validates request data.
+
+            Args:
+                rest_framework.request.Request
+
+            Returns:
+                (bool, dict): (Request is valid, reasons)
+            """
+            checks = {
+                'all_required_keys_are_present': True,
+                'format_is_valid': True,
+                'row_group_size_is_valid': True,
+                'relation_exists': True
+            }
+
+            relation_name = request.query_params.get('relation_name')
+            if not relation_name:
+                checks['all_required_keys_are_present'] = False
+
+            if request.query_params.get('format', 'csv') not in table_export.EXPORT_FORMATS:
+                checks['format_is_valid'] = False
+
+            try:
+                row_group_size = int(request.query_params.get(
+                    'row_group_size',
+                    table_export.DEFAULT_ROW_GROUP_SIZE
+                ))
+                assert 1 <= row_group_size <= table_export.MAX_ROW_GROUP_SIZE
+            except (Exception, AssertionError) as e:
+                checks['row_group_size_is_valid'] = False
+
+            checks['relation_exists'] = bool(relation_name) and (
+                table_utils.table_exists(str(request.user.id), relation_name) or
+                views_utils.materialized_view_exists(request.user.id, relation_name)
+            )
+
+            return (
+                all(checks.values()),
+                checks
+            )
+
+        (is_valid, validation_checks) = _validate(request)
+        if not is_valid:
+            return Response(
+                f'Request is not valid: {str(validation_checks)}',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        relation_name = request.query_params.get('relation_name')
+        export_format = request.query_params.get('format', 'csv')
+
+        if export_format == 'parquet':
+            response = StreamingHttpResponse(
+                table_export.export_parquet_chunks(
+                    request.user.id,
+                    relation_name,
+                    row_group_size=int(request.query_params.get(
+                        'row_group_size',
+                        table_export.DEFAULT_ROW_GROUP_SIZE
+                    ))
+                ),
+                content_type='application/octet-stream'
+            )
+        else:
+            response = StreamingHttpResponse(
+                table_export.export_csv_chunks(
+                    request.user.id,
+                    relation_name
+                ),
+                content_type='text/csv'
+            )
+
+        response['Content-Disposition'] = f'attachment; filename="{relation_name}.{export_format}"'
+        return response
+
+
+class RelationRowsView(APIView):
+    """
+    Handles reading rows of a table or materialized view via API.
+    """
+    renderer_classes = (
+        renderers.JSONRenderer,
+        renderers.BrowsableAPIRenderer,
+        table_renderers.ColumnarJSONRenderer,
+        table_renderers.ArrowStreamRenderer,
+    )
+
+    def get(self, request, *args, **kwargs):
+        """
+        Handles the HTTP GET request.
+
+        Rows are paged with keyset pagination rather than 'OFFSET': each
+        response carries a 'next_cursor' that encodes the ordering values of
+        its last row, and the next page is fetched strictly after them. The
+        ordering columns must be covered by a unique index (see '-F indexes' on
+        'tables/create/', or 'tables/indexes/create/'), which also makes
+        fetching page 10,000 cost the same as fetching page 1. See
+        'tables/query.py'.
+
+        Query parameters:
+
+        - 'relation_name': Table or materialized view to read.
+        - 'order_by': Comma-separated columns to order by, covered by a unique
+          index. Rows with NULL ordering values are excluded.
+        - 'direction': 'asc' (default) or 'desc'.
+        - 'columns': Comma-separated columns to return; all by default.
+        - 'filter': 'column:operator:value', may be repeated; filters are
+          combined with AND. Operators are 'eq', 'ne', 'lt', 'lte', 'gt',
+          'gte', 'like', 'ilike', 'in' (values separated by '|'), 'isnull', and
+          'notnull'.
+        - 'limit': Page size, at most 1000 (default 100).
+        - 'cursor': 'next_cursor' of the previous page.
+
+        Bulk reads (e.g. a dashboard reloading a view after a channel event)
+        can skip building per-row JSON with a columnar format, selected with
+        '?format=' or the 'Accept' header, which allows pages of up to 100,000
+        rows. Rows are converted from the cursor in batches with 'fetchmany()'
+        and transposed into column lists once per batch.
+
+        - '?format=columnar': JSON with one array per column under 'data',
+          parallel to 'columns'.
+        - '?format=arrow' or 'Accept: application/vnd.apache.arrow.stream': an
+          Apache Arrow IPC stream with one record batch per fetched batch. The
+          next cursor is sent in the 'X-Next-Cursor' header.
+
+        Example usage:
+
+        - curl \
+            --header "Authorization: JWT $JWT_ACCESS_TOKEN" \
+            "https://api.tinydevcrm.com/tables/rows/?relation_name=sample_table&order_by=SomeNumber&filter=SomeString:in:Alfa|Bravo&limit=2"
+        """
+        def _validate(request):
+            """
+            Validates request data.
+
+            Args:
+                rest_framework.request.Request
+
+            Returns:
+                (bool, dict): (Request is valid, reasons)
+            """
+            checks = {
+                'all_required_keys_are_present': True,
+                'direction_is_valid': True,
+                'limit_is_valid': True,
+                'relation_exists': True,
+                'relation_is_not_foreign': True,
+                'projection_is_valid': True,
+                'order_by_is_valid': True,
+                'order_by_has_unique_index': True,
+                'filters_are_valid': True,
+                'cursor_is_valid': True
+            }
+
+            relation_name = request.query_params.get('relation_name')
+            if not relation_name or not request.query_params.get('order_by'):
+                checks['all_required_keys_are_present'] = False
+
+            if request.query_params.get('direction', 'asc') not in ('asc', 'desc'):
+                checks['direction_is_valid'] = False
+
+            try:
+                limit = int(request.query_params.get(
+                    'limit',
+                    table_query.DEFAULT_PAGE_SIZE
+                ))
+                max_limit = (
+                    table_query.MAX_PAGE_SIZE
+                    if request.accepted_renderer.format in ('json', 'api')
+                    else table_query.MAX_COLUMNAR_PAGE_SIZE
+                )
+                assert 1 <= limit <= max_limit
+            except (Exception, AssertionError) as e:
+                checks['limit_is_valid'] = False
+
+            checks['relation_exists'] = bool(relation_name) and (
+                table_utils.table_exists(str(request.user.id), relation_name) or
+                views_utils.materialized_view_exists(request.user.id, relation_name)
+            )
+            if not all(checks.values()):
+                return (
+                    False,
+                    checks
+                )
+
+            # Foreign tables have no indexes to page by; page through a hot
+            # slice instead.
+            checks['relation_is_not_foreign'] = table_indexes.relation_kind(
+                request.user.id,
+                relation_name
+            ) != 'f'
+
+            column_names = [
+                column_name
+                for (column_name, type_oid)
+                in table_export.relation_columns(request.user.id, relation_name)
+            ]
+
+            projection = request.query_params.get('columns')
+            if projection and not set(projection.split(',')) <= set(column_names):
+                checks['projection_is_valid'] = False
+
+            order_by = request.query_params.get('order_by').split(',')
+            if not set(order_by) <= set(column_names):
+                checks['order_by_is_valid'] = False
+            else:
+                checks['order_by_has_unique_index'] = table_utils.has_unique_index(
+                    request.user.id,
+                    relation_name,
+                    order_by,
+                    covering=True
+                )
+
+            try:
+                for expression in request.query_params.getlist('filter'):
+                    table_query.parse_filter(expression, column_names)
+            except ValueError as e:
+                checks['filters_are_valid'] = False
+
+            if request.query_params.get('cursor'):
+                try:
+                    table_query.decode_cursor(
+                        request.query_params.get('cursor'),
+                        len(order_by)
+                    )
+                except ValueError as e:
+                    checks['cursor_is_valid'] = False
+
+            return (
+                all(checks.values()),
+                checks
+            )
+
+        (is_valid, validation_checks) = _validate(request)
+        if not is_valid:
+            return Response(
+                f'Request is not valid: {str(validation_checks)}',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        relation_name = request.query_params.get('relation_name')
+        column_names = [
+            column_name
+            for (column_name, type_oid)
+            in table_export.relation_columns(request.user.id, relation_name)
+        ]
+        projection = (
+            request.query_params.get('columns').split(',')
+            if request.query_params.get('columns')
+            else column_names
+        )
+        order_by = request.query_params.get('order_by').split(',')
+        limit = int(request.query_params.get(
+            'limit',
+            table_query.DEFAULT_PAGE_SIZE
+        ))
+        cursor_values = (
+            table_query.decode_cursor(
+                request.query_params.get('cursor'),
+                len(order_by)
+            )
+            if request.query_params.get('cursor')
+            else None
+        )
+
+        sql_query = table_query.rows_query(
+            relation_name,
+            projection,
+            order_by,
+            descending=request.query_params.get('direction', 'asc') == 'desc',
+            filters=[
+                table_query.parse_filter(expression, column_names)
+                for expression
+                in request.query_params.getlist('filter')
+            ],
+            cursor_values=cursor_values,
+            limit=limit
+        )
+
+        with core_utils.PostgreSQLCursor(db_schema=request.user.id) as (psql_conn, psql_cursor):
+            try:
+                psql_cursor.execute(sql_query)
+            except (psycopg2.DataError, psycopg2.ProgrammingError) as e:
+                # E.g. a filter or cursor value that cannot be coerced into the
+                # column type, or 'like' on a non-text column.
+                return Response(
+                    f'Request is not valid: {str(e)}',
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            if request.accepted_renderer.format == 'arrow':
+                sink = pa.BufferOutputStream()
+                (writer, write_columns) = table_export.arrow_stream_writer(
+                    sink,
+                    psql_cursor.description[:len(projection)]
+                )
+                cursor_values = table_query.fetch_columnar_page(
+                    psql_cursor,
+                    len(projection),
+                    limit,
+                    write_columns
+                )
+                writer.close()
+
+                response = Response(
+                    sink.getvalue().to_pybytes(),
+                    status=status.HTTP_200_OK
+                )
+                if cursor_values is not None:
+                    response['X-Next-Cursor'] = table_query.encode_cursor(
+                        cursor_values
+                    )
+                return response
+
+            if request.accepted_renderer.format == 'columnar':
+                data = [[] for column_name in projection]
+
+                def _extend_columns(columns):
+                    for (values, batch_values) in zip(data, columns):
+                        values.extend(batch_values)
+
+                cursor_values = table_query.fetch_columnar_page(
+                    psql_cursor,
+                    len(projection),
+                    limit,
+                    _extend_columns
+                )
+                return Response(
+                    {
+                        'relation_name': relation_name,
+                        'columns': projection,
+                        'num_rows': len(data[0]) if data else 0,
+                        'data': data,
+                        'next_cursor': (
+                            table_query.encode_cursor(cursor_values)
+                            if cursor_values is not None
+                            else None
+                        )
+                    },
+                    status=status.HTTP_200_OK
+                )
+
+            rows = psql_cursor.fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = table_query.encode_cursor(
+                list(rows[-1][len(projection):])
+            )
+
+        return Response(
+            {
+                'relation_name': relation_name,
+                'columns': projection,
+                'rows': [
+                    list(row[:len(projection)])
+                    for row
+                    in rows
+                ],
+                'next_cursor': next_cursor
+            },
+            status=status.HTTP_200_OK
+        )
+
+
+class CreateIndexView(APIView):
+    """
+    Handles 'CREATE INDEX CONCURRENTLY' on tables and materialized views via
+    API.
+    """
+
+    def post(self, request, *args, **kwargs):
+        """
+        Handles the HTTP POST request.
+
+        Indexes are built with 'CONCURRENTLY', so reads, writes, and cron
+        refreshes against the relation are not blocked while the index builds.
+        Supported methods are 'btree' (default), 'brin', 'gin', and 'hash'.
+        '"unique": true' is only allowed for 'btree'. See 'tables/indexes.py'.
+
+        Builds of large relations can outlast an HTTP request. Passing
+        '"asynchronous": true' queues the build for the ingest workers started
+        by 'python manage.py startingestworkers' and returns HTTP 202 Accepted
+        right away. Poll 'tables/indexes/builds/<id>/' for the phase of the
+        build, and its live progress while it runs.
+
+        Example usage:
+
+        - curl \
+            --header "Content-Type: application/json" \
+            --header "Authorization: JWT $JWT_ACCESS_TOKEN" \
+            --method POST \
+            --data '{"relation_name": "sample_table", "columns": ["SomeNumber"], "method": "brin", "asynchronous": true}' \
+            https://api.tinydevcrm.com/tables/indexes/create/
+        """
+        def _validate(request):
+            """
+            Validates request data.
+
+            Args:
+                rest_framework.request.Request
+
+            Returns:
+                (bool, dict): (Request is valid, reasons)
+            """
+            checks = {
+                'all_required_keys_are_present': True,
+                'relation_is_indexable': True,
+                'index_definition_is_valid': True,
+                'index_name_is_valid': True,
+                'index_name_is_available': True
+            }
+
+            relation_name = request.data.get('relation_name')
+            if not relation_name or not request.data.get('columns'):
+                checks['all_required_keys_are_present'] = False
+                return (
+                    False,
+                    checks
+                )
+
+            checks['relation_is_indexable'] = table_indexes.relation_kind(
+                request.user.id,
+                relation_name
+            ) in table_indexes.INDEXABLE_RELKINDS
+            if not checks['relation_is_indexable']:
+                return (
+                    False,
+                    checks
+                )
+
+            column_names = [
+                column_name
+                for (column_name, type_oid)
+                in table_export.relation_columns(request.user.id, relation_name)
+            ]
+            try:
+                index = table_ingest.parse_indexes(
+                    [{
+                        key: request.data[key]
+                        for key
+                        in ('columns', 'method', 'unique')
+                        if key in request.data
+                    }],
+                    column_names
+                )[0]
+            except (Exception, ValueError) as e:
+                checks['index_definition_is_valid'] = False
+                return (
+                    False,
+                    checks
+                )
+
+            index_name = request.data.get(
+                'index_name',
+                table_ingest.index_name(relation_name, index.columns)
+            )
+            if (
+                type(index_name) is not str or
+                not index_name or
+                len(index_name.encode('utf-8')) > 63
+            ):
+                checks['index_name_is_valid'] = False
+            else:
+                checks['index_name_is_available'] = table_indexes.relation_kind(
+                    request.user.id,
+                    index_name
+                ) is None
+
+            return (
+                all(checks.values()),
+                checks
+            )
+
+        (is_valid, validation_checks) = _validate(request)
+        if not is_valid:
+            return Response(
+                f'Request is not valid: {str(validation_checks)}',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        relation_name = request.data.get('relation_name')
+        definition = {
+            'columns': request.data['columns'],
+            'method': str(request.data.get('method', 'btree')).lower(),
+            'unique': bool(request.data.get('unique', False))
+        }
+        index = table_ingest.parse_indexes(
+            [definition],
+            definition['columns']
+        )[0]
+        index_name = request.data.get(
+            'index_name',
+            table_ingest.index_name(relation_name, index.columns)
+        )
+
+        if request.data.get('asynchronous', False) in (True, 'true'):
+            index_build = models.IndexBuild.objects.create(
+                relation_name=relation_name,
+                index_name=index_name,
+                definition=definition,
+                user_id=request.user.id
+            )
+            table_utils.notify_ingest_workers(index_build.id)
+
+            return Response(
+                serializers.IndexBuildSerializer(index_build).data,
+                status=status.HTTP_202_ACCEPTED
+            )
+
+        try:
+            table_indexes.build_index(
+                request.user.id,
+                relation_name,
+                index,
+                index_name
+            )
+        except (psycopg2.Error, ValueError) as e:
+            # E.g. duplicate values for a unique index, no GIN operator class
+            # for the column type, or a concurrent build of the same name.
+            return Response(
+                f'Index build failed: {str(e)}',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(
+            {
+                'relation_name': relation_name,
+                'index_name': index_name,
+                'definition': definition
+            },
+            status=status.HTTP_201_CREATED
+        )
+
+
+class DropIndexView(APIView):
+    """
+    Handles 'DROP INDEX CONCURRENTLY' via API.
+    """
+
+    def post(self, request, *args, **kwargs):
+        """
+        Handles the HTTP POST request.
+
+        Use 'tables/indexes/' to find unused indexes worth dropping.
+
+        Example usage:
+
+        - curl \
+            --header "Content-Type: application/json" \
+            --header "Authorization: JWT $JWT_ACCESS_TOKEN" \
+            --method POST \
+            --data '{"index_name": "sample_table_SomeNumber_idx"}' \
+            https://api.tinydevcrm.com/tables/indexes/drop/
+        """
+        def _validate(request):
+            """
+            Validates request data.
+
+            Args:
+                rest_framework.request.Request
+
+            Returns:
+                (bool, dict): (Request is valid, reasons)
+            """
+            checks = {
+                'all_required_keys_are_present': True,
+                'index_exists': True
+            }
+
+            if not request.data.get('index_name'):
+                checks['all_required_keys_are_present'] = False
+
+            checks['index_exists'] = bool(request.data.get('index_name')) and table_indexes.index_exists(
+                request.user.id,
+                request.data.get('index_name')
+            )
+
+            return (
+                all(checks.values()),
+                checks
+            )
+
+        (is_valid, validation_checks) = _validate(request)
+        if not is_valid:
+            return Response(
+                f'Request is not valid: {str(validation_checks)}',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            table_indexes.drop_index(
+                request.user.id,
+                request.data.get('index_name')
+            )
+        except psycopg2.Error as e:
+            # E.g. the index backs a primary key or unique constraint.
+            return Response(
+                f'Index drop failed: {str(e)}',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(
+            {
+                'index_name': request.data.get('index_name')
+            },
+            status=status.HTTP_200_OK
+        )
+
+
+class IndexUsageView(APIView):
+    """
+    Handles reporting index size and usage via API.
+    """
+
+    def get(self, request, *args, **kwargs):
+        """
+        Handles the HTTP GET request.
+
+        Lists every index in the user schema, least scanned and largest first,
+        from 'pg_stat_user_indexes'. Indexes that have never been scanned and
+        do not enforce uniqueness are flagged '"unused": true'; they cost write
+        and refresh time without speeding up any query.
+
+        Optional query parameter 'relation_name' limits the report to one table
+        or materialized view.
+
+        Example usage:
+
+        - curl \
+            --header "Authorization: JWT $JWT_ACCESS_TOKEN" \
+            https://api.tinydevcrm.com/tables/indexes/
+        """
+        return Response(
+            table_indexes.index_usage_report(
+                request.user.id,
+                relation_name=request.query_params.get('relation_name')
+            ),
+            status=status.HTTP_200_OK
+        )
+
+
+class IndexBuildDetailView(APIView):
+    """
+    Handles polling the status of an asynchronous index build via API.
+    """
+
+    def get(self, request, build_id, *args, **kwargs):
+        """
+        Handles the HTTP GET request.
+
+        While the build runs, 'progress' holds the current phase and block /
+        tuple counts from 'pg_stat_progress_create_index'.
+
+        Example usage:
+
+        - curl \
+            --header "Authorization: JWT $JWT_ACCESS_TOKEN" \
+            https://api.tinydevcrm.com/tables/indexes/builds/1/
+        """
+        index_build = models.IndexBuild.objects.filter(
+            id=build_id,
+            user=request.user.id
+        ).first()
+
+        if index_build is None:
+            return Response(
+                f'Index build {build_id} does not exist.',
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        response_data = dict(serializers.IndexBuildSerializer(index_build).data)
+        response_data['progress'] = (
+            table_indexes.index_build_progress(index_build.backend_pid)
+            if (
+                index_build.phase == models.EnumIndexBuildPhases.BUILDING and
+                index_build.backend_pid is not None
+            )
+            else None
+        )
+
+        return Response(
+            response_data,
+            status=status.HTTP_200_OK
+        )
+
+
+class ColumnProfilesView(APIView):
+    """
+    Handles reporting the column profiles of a table via API.
+    """
+
+    def get(self, request, *args, **kwargs):
+        """
+        Handles the HTTP GET request.
+
+        Returns one profile per column of the table, as of the last ingest into
+        it: row count, null count and fraction, minimum and maximum, and the
+        planner's estimate of the number of distinct values. Use these to pick
+        filter and index columns without scanning the table.
+
+        Example usage:
+
+        - curl \
+            --header "Authorization: JWT $JWT_ACCESS_TOKEN" \
+            https://api.tinydevcrm.com/tables/profiles/?table_name=sample_table
+        """
+        table = models.Table.objects.filter(
+            user=request.user.id,
+            table_name=request.query_params.get('table_name')
+        ).order_by('-id').first()
+
+        if table is None:
+            return Response(
+                f'Table {request.query_params.get("table_name")} does not exist.',
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        return Response(
+            serializers.ColumnProfileSerializer(
+                table.column_profiles.order_by('id'),
+                many=True
+            ).data,
+            status=status.HTTP_200_OK
+        )
+
+
+class IngestDetailView(APIView):
+    """
+    Handles polling the status of an asynchronous ingest via API.
+    """
+
+    def get(self, request, ingest_id, *args, **kwargs):
+        """
+        Handles the HTTP GET request.
+
+        Example usage:
+
+        - curl \
+            --header "Authorization: JWT $JWT_ACCESS_TOKEN" \
+            https://api.tinydevcrm.com/tables/ingests/1/
+        """
+        ingest = models.Ingest.objects.filter(
+            id=ingest_id,
+            user=request.user.id
+        ).first()
+
+        if ingest is None:
+            return Response(
+                f'Ingest {ingest_id} does not exist.',
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        return Response(
+            serializers.IngestSerializer(ingest).data,
+            status=status.HTTP_200_OK
         )
@@ -0,0 +1,589 @@
+"""
+Ingest worker definition. Kept separate from the 'startingestworkers' command,
+like 'channels_app/broker.py', so that a single ingest can be run from within
+`python manage.py shell` while debugging.
+
+Each worker process claims queued ingests from the 'tables_ingest' table and
+loads them one at a time. Queued pipeline refreshes (the 'jobs_pipelinerun'
+table) and index builds (the 'tables_indexbuild' table) are run by the same
+workers whenever no ingest is waiting. Idle workers LISTEN on a PostgreSQL
+channel so that newly queued jobs are picked up immediately.
+"""
+
+import datetime
+import os
+import select
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db import transaction
+from django.utils import timezone
+import psycopg2
+from psycopg2 import sql
+
+from core import app_logging
+from core import utils as core_utils
+from jobs import pipelines as job_pipelines
+from . import indexes as table_indexes
+from . import ingest as table_ingest
+from . import models
+from . import partitioning as table_partitioning
+from . import profiles as table_profiles
+from . import uploads as table_uploads
+from . import utils as table_utils
+
+
+# How long an idle worker waits on the ingest channel before polling the queue
+# anyway.
+POLL_INTERVAL_SECONDS = 5
+
+# Minimum interval between progress writes to the Ingest model.
+PROGRESS_INTERVAL_SECONDS = 2
+
+# Interval between heartbeats of a running ingest. Must stay well below
+# TABLES_INGEST_STALE_SECONDS.
+HEARTBEAT_INTERVAL_SECONDS = 30
+
+
+class IngestProgress(object):
+    """
+    Accumulates ingest progress and periodically writes it back to the Ingest
+    model, so that 'tables/ingests/<id>/' reflects a running load.
+
+    NOTE: Progress is written with the Django database connection, which is in
+    autocommit mode and separate from the load transaction, so it is visible to
+    clients before the load commits.
+    """
+
+    def __init__(self, ingest_id):
+        self.ingest_id = ingest_id
+        self.rows_copied = 0
+        self.bytes_read = 0
+        self.last_flushed = time.monotonic()
+
+    def __call__(self, num_rows, num_bytes):
+        self.rows_copied += num_rows
+        self.bytes_read += num_bytes
+        if time.monotonic() - self.last_flushed >= PROGRESS_INTERVAL_SECONDS:
+            self.flush()
+
+    def flush(self):
+        models.Ingest.objects.filter(id=self.ingest_id).update(
+            rows_copied=self.rows_copied,
+            bytes_read=self.bytes_read
+        )
+        self.last_flushed = time.monotonic()
+
+
+class IngestHeartbeat(threading.Thread):
+    """
+    Touches the 'updated' field of a loading ingest every
+    HEARTBEAT_INTERVAL_SECONDS, so that a long load reporting no progress, e.g.
+    a parallel load or an index build, is not mistaken for one whose worker
+    died. See claim_next_ingest().
+    """
+
+    def __init__(self, ingest_id):
+        super().__init__(name=f'ingest-heartbeat-{ingest_id}', daemon=True)
+        self.ingest_id = ingest_id
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(HEARTBEAT_INTERVAL_SECONDS):
+                models.Ingest.objects.filter(
+                    id=self.ingest_id,
+                    phase=models.EnumIngestPhases.LOADING
+                ).update(updated=timezone.now())
+        finally:
+            # Django opens a separate database connection for every thread.
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def set_phase(ingest, phase, **fields):
+    """
+    Updates the phase, and any other given fields, of an ingest.
+    """
+    ingest.phase = phase
+    for (key, value) in fields.items():
+        setattr(ingest, key, value)
+    ingest.save(update_fields=['phase', 'updated'] + list(fields.keys()))
+
+
+def claim_next_ingest():
+    """
+    Claims the oldest queued ingest, if any, or failing that, the oldest ingest
+    left in phase 'LOADING' by a worker that died, i.e. without a heartbeat for
+    TABLES_INGEST_STALE_SECONDS. Loads run in one transaction, which the dead
+    worker's connection rolled back, so they are simply run again.
+
+    'SKIP LOCKED' lets several workers poll the queue concurrently without
+    blocking on, or double-claiming, the same ingest.
+
+    Returns:
+        models.Ingest, or None if the queue is empty.
+    """
+    stale_before = timezone.now() - datetime.timedelta(
+        seconds=settings.TABLES_INGEST_STALE_SECONDS
+    )
+    with transaction.atomic():
+        ingest = models.Ingest.objects.select_for_update(
+            skip_locked=True
+        ).filter(
+            phase=models.EnumIngestPhases.QUEUED
+        ).order_by(
+            'created'
+        ).first()
+
+        if ingest is None:
+            ingest = models.Ingest.objects.select_for_update(
+                skip_locked=True
+            ).filter(
+                phase=models.EnumIngestPhases.LOADING,
+                updated__lt=stale_before
+            ).order_by(
+                'created'
+            ).first()
+            if ingest is not None:
+                app_logging.get_ingest_worker_logger().warning(
+                    f'Reclaiming ingest {ingest.id}, last updated {ingest.updated}.'
+                )
+
+        if ingest is None:
+            return None
+
+        set_phase(ingest, models.EnumIngestPhases.LOADING)
+        return ingest
+
+
+def load_datafile(psql_cursor, ingest, file_abspath, progress, profiler=None):
+    """
+    Loads a saved DataFile into a new table, within the caller's transaction
+    (except for parallel loads, which manage their own connections).
+
+    Parquet rows loaded with binary 'COPY' are profiled into 'profiler'.
+
+    Returns:
+        int: Number of rows copied.
+    """
+    unlogged = ingest.options.get('unlogged', False)
+    indexes = table_ingest.parse_indexes(
+        ingest.options.get('indexes', []),
+        [column_def['column_name'] for column_def in ingest.columns]
+    )
+    partition = (
+        table_partitioning.parse_partitioning(
+            ingest.options['partitioning'],
+            table_ingest.parse_columns(ingest.columns)
+        )
+        if ingest.options.get('partitioning')
+        else None
+    )
+
+    if ingest.ingest_mode == models.EnumIngestModes.PARALLEL:
+        # NOTE: Parallel loads commit over their own connections, and report
+        # progress only once every row group is loaded. A worker that died
+        # mid-load leaves its staging table behind, named after the ingest.
+        staging_table_name = f'temp_{str(ingest.user_id)}_staged_{ingest.id}'
+        psql_cursor.execute(
+            sql.SQL('DROP TABLE IF EXISTS {staging_table_name}').format(
+                staging_table_name=sql.Identifier(staging_table_name)
+            )
+        )
+        psql_cursor.connection.commit()
+        rows_copied = table_ingest.copy_parquet_parallel(
+            ingest.user_id,
+            ingest.table_name,
+            ingest.columns,
+            file_abspath,
+            ingest.options.get('parallelism', 1),
+            staging_table_name,
+            indexes=indexes,
+            unlogged=unlogged,
+            partition=partition,
+            profiler=profiler
+        )
+        progress(rows_copied, ingest.bytes_total)
+        return rows_copied
+
+    if ingest.file_format == models.EnumFileFormats.CSV:
+        columns = table_ingest.parse_columns(ingest.columns)
+        psql_cursor.execute(
+            table_ingest.create_table_sql(
+                ingest.table_name,
+                columns,
+                unlogged=unlogged
+            )
+        )
+        rows_copied = table_ingest.copy_csv(
+            psql_cursor,
+            ingest.table_name,
+            columns,
+            table_ingest.read_file_chunks(
+                file_abspath,
+                on_progress=progress,
+                compression=ingest.options.get('compression')
+            ),
+            delimiter=ingest.options.get('delimiter', ','),
+            header=ingest.options.get('header', True)
+        )
+    elif ingest.ingest_mode == models.EnumIngestModes.STREAM:
+        columns = table_ingest.parse_columns(ingest.columns)
+        parquet_file = table_ingest.open_parquet_path(
+            file_abspath,
+            compression=ingest.options.get('compression')
+        )
+        # Compressed resumable uploads are only checked against their columns
+        # here, once decompressed. See 'tables/views.py' CompleteUploadView.
+        mismatches = (
+            table_ingest.missing_parquet_columns(parquet_file, columns) +
+            table_ingest.incompatible_parquet_columns(parquet_file, columns)
+        )
+        if mismatches:
+            raise ValueError(
+                f'Columns do not match Parquet file: {str(mismatches)}'
+            )
+        table_ingest.create_table(
+            psql_cursor,
+            ingest.table_name,
+            columns,
+            unlogged=unlogged,
+            partition=partition,
+            parquet_file=parquet_file
+        )
+        rows_copied = table_ingest.copy_parquet(
+            psql_cursor,
+            ingest.table_name,
+            columns,
+            parquet_file,
+            on_progress=progress,
+            profiler=profiler
+        )
+    else:
+        rows_copied = table_ingest.copy_parquet_fdw(
+            psql_cursor,
+            ingest.table_name,
+            table_ingest.parse_columns(ingest.columns),
+            file_abspath,
+            f'temp_{str(ingest.user_id)}_ingest_{ingest.id}',
+            unlogged=unlogged
+        )
+
+    table_ingest.finalize_table(
+        psql_cursor,
+        ingest.table_name,
+        indexes=indexes,
+        unlogged=unlogged
+    )
+    return rows_copied
+
+
+def merge_datafile(psql_cursor, ingest, file_abspath, progress, profiler=None):
+    """
+    Appends or upserts a saved Parquet DataFile into an existing table, within
+    the caller's transaction, profiling the loaded rows into 'profiler'.
+
+    Returns:
+        (int, int, int): Rows copied, inserted, and updated.
+    """
+    return table_ingest.merge_parquet(
+        psql_cursor,
+        ingest.table_name,
+        table_ingest.parse_columns(ingest.columns),
+        table_ingest.open_parquet_path(
+            file_abspath,
+            compression=ingest.options.get('compression')
+        ),
+        f'temp_{str(ingest.user_id)}_merged_{ingest.id}',
+        upsert_keys=ingest.options.get('upsert_keys', []),
+        on_progress=progress,
+        profiler=profiler
+    )
+
+
+def verify_content_hash(ingest, file_abspath):
+    """
+    Hashes a DataFile assembled from a resumable upload, whose chunks arrived
+    over several requests, and checks it against the 'content_hash' the upload
+    was started with, if any. DataFiles saved from a single request were hashed
+    as they streamed in, and are left alone.
+
+    Raises:
+        ValueError: File does not match the upload 'content_hash'.
+    """
+    datafile = ingest.datafile
+    if datafile.content_hash:
+        return
+
+    content_hash = table_uploads.file_sha256(file_abspath)
+    expected_hash = ingest.options.get('content_hash')
+    if expected_hash and expected_hash != content_hash:
+        raise ValueError(
+            f'File SHA-256 {content_hash} does not match the upload content_hash {expected_hash}.'
+        )
+    datafile.content_hash = content_hash
+    datafile.save(update_fields=['content_hash'])
+
+
+def remove_datafile(datafile):
+    """
+    Deletes a DataFile model and its underlying file.
+    """
+    file_abspath = os.path.abspath(os.path.join(
+        settings.MEDIA_ROOT,
+        str(datafile.file)
+    ))
+    datafile.delete()
+    # Deleting the data model does not delete the file. Do that separately.
+    if os.path.exists(file_abspath):
+        os.remove(file_abspath)
+
+
+def ingest_profiler(ingest):
+    """
+    Returns a ColumnProfiler to fill while an ingest streams, or None if its
+    column profiles are to be built from a scan of the table instead: for CSV
+    and 'parquet_fdw' loads, which never decode rows in Python, and for upserts,
+    which can overwrite the current minimum or maximum of a column.
+    """
+    if (
+        ingest.file_format != models.EnumFileFormats.PARQUET or
+        ingest.ingest_mode == models.EnumIngestModes.FDW or
+        ingest.write_mode == models.EnumWriteModes.UPSERT
+    ):
+        return None
+    return table_profiles.ColumnProfiler([
+        column_def['column_name']
+        for column_def
+        in ingest.columns
+    ])
+
+
+def save_ingest_profiles(ingest, profiler):
+    """
+    Records the column profiles of the table an ingest loaded. Failures are
+    only logged, since the ingest itself has already committed.
+    """
+    try:
+        if ingest.write_mode == models.EnumWriteModes.CREATE:
+            table_profiles.save_column_profiles(
+                models.Table.objects.filter(
+                    user=ingest.user_id,
+                    table_name=ingest.table_name
+                ).order_by('-id').first(),
+                profiler
+            )
+        else:
+            table_profiles.profile_merged_rows(
+                ingest.user_id,
+                ingest.table_name,
+                profiler
+            )
+    except Exception:
+        app_logging.get_ingest_worker_logger().exception(
+            f'Profiling columns of ingest {ingest.id} failed.'
+        )
+
+
+def run_ingest(ingest):
+    """
+    Runs one claimed ingest to completion, recording success or failure on the
+    Ingest model. Never raises, so that one bad upload doesn't take down the
+    worker.
+    """
+    logger = app_logging.get_ingest_worker_logger()
+    logger.info(f'Starting ingest {ingest.id} into table {ingest.table_name}.')
+
+    datafile = ingest.datafile
+    progress = IngestProgress(ingest.id)
+    profiler = ingest_profiler(ingest)
+    heartbeat = IngestHeartbeat(ingest.id)
+    heartbeat.start()
+
+    try:
+        file_abspath = os.path.join(
+            settings.MEDIA_ROOT,
+            datafile.file.name
+        )
+        verify_content_hash(ingest, file_abspath)
+
+        merge_counts = {}
+        with core_utils.PostgreSQLCursor(db_schema=ingest.user_id) as (psql_conn, psql_cursor):
+            if ingest.write_mode == models.EnumWriteModes.CREATE:
+                rows_copied = load_datafile(
+                    psql_cursor,
+                    ingest,
+                    file_abspath,
+                    progress,
+                    profiler=profiler
+                )
+            else:
+                (rows_copied, rows_inserted, rows_updated) = merge_datafile(
+                    psql_cursor,
+                    ingest,
+                    file_abspath,
+                    progress,
+                    profiler=profiler
+                )
+                merge_counts = {
+                    'rows_inserted': rows_inserted,
+                    'rows_updated': rows_updated
+                }
+            progress.flush()
+            set_phase(ingest, models.EnumIngestPhases.FINALIZING)
+            psql_conn.commit()
+
+        if ingest.write_mode == models.EnumWriteModes.CREATE:
+            models.Table.objects.create(
+                table_name=ingest.table_name,
+                user_id=ingest.user_id,
+                content_hash=datafile.content_hash,
+                source_columns=ingest.columns
+            )
+        else:
+            table_utils.forget_content_hash(ingest.user_id, ingest.table_name)
+        save_ingest_profiles(ingest, profiler)
+
+        set_phase(
+            ingest,
+            models.EnumIngestPhases.SUCCEEDED,
+            rows_copied=rows_copied,
+            bytes_read=ingest.bytes_total,
+            **merge_counts
+        )
+        logger.info(f'Ingest {ingest.id} copied {rows_copied} rows.')
+    except Exception as e:
+        logger.exception(f'Ingest {ingest.id} failed.')
+        set_phase(
+            ingest,
+            models.EnumIngestPhases.FAILED,
+            error=str(e)
+        )
+    finally:
+        heartbeat.stop()
+        if datafile is not None:
+            remove_datafile(datafile)
+
+
+def claim_next_index_build():
+    """
+    Claims the oldest queued index build, if any. See claim_next_ingest().
+
+    Returns:
+        models.IndexBuild, or None if the queue is empty.
+    """
+    with transaction.atomic():
+        index_build = models.IndexBuild.objects.select_for_update(
+            skip_locked=True
+        ).filter(
+            phase=models.EnumIndexBuildPhases.QUEUED
+        ).order_by(
+            'created'
+        ).first()
+
+        if index_build is None:
+            return None
+
+        set_phase(index_build, models.EnumIndexBuildPhases.BUILDING)
+        return index_build
+
+
+def run_index_build(index_build):
+    """
+    Runs one claimed index build to completion, recording success or failure
+    on the IndexBuild model. Never raises, like run_ingest().
+    """
+    logger = app_logging.get_ingest_worker_logger()
+    logger.info(f'Starting index build {index_build.id} of {index_build.index_name}.')
+
+    def _record_backend_pid(backend_pid):
+        index_build.backend_pid = backend_pid
+        index_build.save(update_fields=['backend_pid', 'updated'])
+
+    try:
+        index = table_ingest.parse_indexes(
+            [index_build.definition],
+            index_build.definition['columns']
+        )[0]
+        table_indexes.build_index(
+            index_build.user_id,
+            index_build.relation_name,
+            index,
+            index_build.index_name,
+            on_started=_record_backend_pid
+        )
+        set_phase(index_build, models.EnumIndexBuildPhases.SUCCEEDED)
+        logger.info(f'Index build {index_build.id} succeeded.')
+    except Exception as e:
+        logger.exception(f'Index build {index_build.id} failed.')
+        set_phase(
+            index_build,
+            models.EnumIndexBuildPhases.FAILED,
+            error=str(e)
+        )
+
+
+def claim_and_run_next_job():
+    """
+    Claims and runs the oldest queued ingest, or failing that, the oldest
+    queued pipeline refresh (see 'jobs/pipelines.py'), or failing that, the
+    oldest queued index build.
+
+    Returns:
+        bool: Whether there was a job to run.
+    """
+    ingest = claim_next_ingest()
+    if ingest is not None:
+        run_ingest(ingest)
+        return True
+
+    pipeline_run = job_pipelines.claim_next_pipeline_run()
+    if pipeline_run is not None:
+        job_pipelines.run_pipeline_run(pipeline_run)
+        return True
+
+    index_build = claim_next_index_build()
+    if index_build is not None:
+        run_index_build(index_build)
+        return True
+
+    return False
+
+
+def ingest_worker_proc():
+    """
+    Task definition for one ingest worker process. Runs forever, draining the
+    ingest and index build queues and then waiting for a notification or the
+    poll interval.
+    """
+    logger = app_logging.get_ingest_worker_logger()
+
+    with core_utils.PostgreSQLCursor() as (psql_conn, psql_cursor):
+        psql_conn.set_isolation_level(
+            psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT
+        )
+        psql_cursor.execute(
+            sql.SQL('LISTEN {channel}').format(
+                channel=sql.Identifier(table_utils.INGEST_CHANNEL_NAME)
+            )
+        )
+
+        while True:
+            while claim_and_run_next_job():
+                pass
+
+            # If Linux select() syscall returns empty, then poll the queue
+            # again anyway.
+            if select.select([psql_conn], [], [], POLL_INTERVAL_SECONDS) == ([], [], []):
+                logger.debug('No queued ingests yet.')
+            else:
+                psql_conn.poll()
+                # Notifications only wake the worker up; the queue itself is
+                # the source of truth.
+                psql_conn.notifies.clear()
@@ -0,0 +1,256 @@
+"""
+View dependency graph helpers for views service.
+
+Materialized views may select from other materialized views. Scheduled
+independently, a downstream view can refresh before its upstream does, and
+serve stale data until the next tick. Each view therefore records the relations
+it selects from in the ViewDependency model, which together form a directed
+acyclic graph over a user's views, so that a whole graph can be refreshed
+upstream first (see 'jobs/pipelines.py').
+
+Dependencies are read from the PostgreSQL catalog right after the view is
+created, rather than by parsing its SQL: the rewrite rule behind every view
+records a 'pg_depend' entry for each relation its query references, including
+ones hidden in subqueries and CTEs. Incrementally maintained views depend on
+their source table.
+
+See: https://www.postgresql.org/docs/12/catalog-pg-depend.html
+"""
+
+from psycopg2 import sql
+
+from . import incremental as views_incremental
+from . import models
+from . import utils as views_utils
+
+
+def relation_dependencies(psql_cursor, view_name):
+    """
+    Returns the relations a view in the current schema selects from, within
+    the caller's transaction.
+
+    Returns:
+        list((str, str)): Schema and relation name of each relation.
+    """
+    psql_cursor.execute(
+        sql.SQL(
+            'SELECT DISTINCT n.nspname, c.relname '
+            'FROM pg_rewrite r '
+            'JOIN pg_class v ON v.oid = r.ev_class '
+            'JOIN pg_namespace vn ON vn.oid = v.relnamespace '
+            "JOIN pg_depend d ON d.classid = 'pg_rewrite'::regclass AND d.objid = r.oid AND d.refclassid = 'pg_class'::regclass "
+            'JOIN pg_class c ON c.oid = d.refobjid '
+            'JOIN pg_namespace n ON n.oid = c.relnamespace '
+            'WHERE vn.nspname = current_schema() AND v.relname = {view_name} AND c.oid <> v.oid '
+            'ORDER BY n.nspname, c.relname'
+        ).format(
+            view_name=sql.Literal(view_name)
+        )
+    )
+    return psql_cursor.fetchall()
+
+
+def record_dependencies(view, relations):
+    """
+    Records the ViewDependency models of a newly created view. Relations that
+    are views of the same user become upstream nodes of the graph.
+
+    Args:
+        models.MaterializedView
+        list((str, str)): Schema and relation name of each relation.
+
+    Returns:
+        list(models.ViewDependency)
+    """
+    upstream_views = {
+        upstream.view_name: upstream
+        for upstream
+        in models.MaterializedView.objects.filter(
+            user=view.user_id,
+            view_name__in=[relation_name for (schema_name, relation_name) in relations]
+        ).exclude(
+            id=view.id
+        )
+    }
+    return models.ViewDependency.objects.bulk_create([
+        models.ViewDependency(
+            view=view,
+            schema_name=schema_name,
+            relation_name=relation_name,
+            upstream=(
+                upstream_views.get(relation_name)
+                if schema_name == str(view.user_id)
+                else None
+            )
+        )
+        for (schema_name, relation_name)
+        in relations
+    ])
+
+
+def upstream_graph(view):
+    """
+    Returns the part of the dependency graph a view depends on, directly or
+    transitively, including the view itself.
+
+    Returns:
+        dict: Set of upstream view IDs, by view ID.
+    """
+    graph = {}
+    frontier = [view.id]
+    while frontier:
+        edges = models.ViewDependency.objects.filter(
+            view__in=frontier,
+            upstream__isnull=False
+        ).values_list('view', 'upstream')
+        for view_id in frontier:
+            graph.setdefault(view_id, set())
+        for (view_id, upstream_id) in edges:
+            graph[view_id].add(upstream_id)
+        frontier = list(set(
+            upstream_id
+            for (view_id, upstream_id)
+            in edges
+            if upstream_id not in graph
+        ))
+    return graph
+
+
+def topological_order(graph):
+    """
+    Orders the views of a dependency graph so that every view comes after all
+    of its upstream views.
+
+    Args:
+        dict: Set of upstream view IDs, by view ID, see upstream_graph().
+
+    Returns:
+        list(int)
+
+    Raises:
+        ValueError: The graph has a cycle.
+    """
+    order = []
+    remaining = {
+        view_id: set(upstream_ids)
+        for (view_id, upstream_ids)
+        in graph.items()
+    }
+    while remaining:
+        ready = sorted(
+            view_id
+            for (view_id, upstream_ids)
+            in remaining.items()
+            if not upstream_ids
+        )
+        if not ready:
+            raise ValueError(f'Dependency graph has a cycle between views {sorted(remaining.keys())}')
+        for view_id in ready:
+            del remaining[view_id]
+        for upstream_ids in remaining.values():
+            upstream_ids.difference_update(ready)
+        order.extend(ready)
+    return order
+
+
+def view_refresh_sql(view):
+    """
+    Returns the statement refreshing a MaterializedView model according to
+    its refresh mode.
+    """
+    if view.refresh_mode == models.EnumRefreshModes.INCREMENTAL:
+        return views_incremental.view_refresh_sql(view)
+    return views_utils.refresh_materialized_view_sql(
+        view.user_id,
+        view.view_name,
+        concurrently=(
+            view.refresh_mode == models.EnumRefreshModes.CONCURRENT
+        )
+    )
+
+
+def source_signature_sql(view):
+    """
+    Returns an expression summarizing the current state of every source
+    relation of a view, that changes whenever any of them is written to.
+
+    For each relation, and each partition of a partitioned table, the
+    signature holds:
+
+    - 'pg_relation_filenode()', which changes whenever the relation is
+      rewritten, e.g. by 'TRUNCATE' or a plain 'REFRESH MATERIALIZED VIEW'.
+    - The 'n_tup_ins', 'n_tup_upd', and 'n_tup_del' counters of
+      'pg_stat_user_tables', which count every row written, including by
+      'REFRESH MATERIALIZED VIEW CONCURRENTLY'.
+
+    NOTE: The statistics collector reports counters up to half a second after
+    the writing transaction commits, so a change that commits just before a
+    tick may only be picked up on the following tick. A statistics reset also
+    changes the signature, costing one unnecessary refresh.
+
+    Returns:
+        psycopg2.sql.Composed, or None if the view has no recorded
+            dependencies, e.g. a 'VALUES' query.
+    """
+    relations = [
+        sql.SQL('to_regclass(format({format}, {schema_name}, {relation_name}))').format(
+            format=sql.Literal('%I.%I'),
+            schema_name=sql.Literal(dependency.schema_name),
+            relation_name=sql.Literal(dependency.relation_name)
+        )
+        for dependency
+        in view.dependencies.order_by('schema_name', 'relation_name')
+    ]
+    if not relations:
+        return None
+
+    return sql.SQL(
+        '(SELECT string_agg(concat_ws({separator}, c.oid, pg_relation_filenode(c.oid), s.n_tup_ins, s.n_tup_upd, s.n_tup_del), {delimiter} ORDER BY c.oid) '
+        'FROM pg_class c LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid '
+        'WHERE c.oid = ANY(ARRAY[{relations}]) OR c.oid IN ({partitions}))'
+    ).format(
+        separator=sql.Literal(':'),
+        delimiter=sql.Literal(','),
+        relations=sql.SQL(', ').join(relations),
+        partitions=sql.SQL(' UNION ALL ').join(
+            sql.SQL('SELECT relid FROM pg_partition_tree({relation})').format(
+                relation=relation
+            )
+            for relation
+            in relations
+        )
+    )
+
+
+def refresh_if_changed_sql(view, refresh):
+    """
+    Returns an anonymous PL/pgSQL block that refreshes a view only if its
+    source signature (see source_signature_sql()) differs from the one
+    recorded at its last refresh, and then records the new signature on the
+    MaterializedView model.
+
+    Views without recorded dependencies, or whose sources no longer exist, are
+    refreshed unconditionally.
+
+    Args:
+        models.MaterializedView
+        psycopg2.sql.Composable: Statements refreshing the view, see
+            'jobs/utils.py' refresh_statement_sql().
+
+    NOTE: The refresh runs within the block, so its statements must not return
+    rows.
+    """
+    return sql.SQL(
+        'DO $gate$ DECLARE gate_signature TEXT; BEGIN '
+        'gate_signature := {signature}; '
+        'IF gate_signature IS NULL OR gate_signature IS DISTINCT FROM (SELECT source_signature FROM {views} WHERE id = {view_id}) THEN '
+        '{refresh}; '
+        'UPDATE {views} SET source_signature = gate_signature WHERE id = {view_id}; '
+        'END IF; '
+        'END $gate$'
+    ).format(
+        signature=source_signature_sql(view) or sql.SQL('NULL'),
+        views=sql.Identifier('public', models.MaterializedView._meta.db_table),
+        view_id=sql.Literal(view.id),
+        refresh=refresh
+    )
@@ -0,0 +1,428 @@
+"""
+Incremental view maintenance helpers for views service.
+
+A materialized view is recomputed from scratch on every refresh, so refreshing
+a daily rollup over a table that only ever gains a few rows between cron ticks
+costs as much as the first computation. Views defined as one of two shapes over
+a single append-only table can instead be kept in a plain result table that
+only ever merges in the rows appended since the last refresh:
+
+- Aggregates: 'GROUP BY' columns with 'sum', 'count', 'min', or 'max'
+  aggregates. Each of these combines with the aggregate of newly appended
+  rows, without revisiting old rows; e.g. the new sum is the old sum plus the
+  sum of the delta, and the new maximum is the greater of the two. Delta groups
+  are merged with 'INSERT ... ON CONFLICT DO UPDATE' against a unique index on
+  the 'GROUP BY' columns.
+- Filters: a projection of the rows matching 'column:operator:value' filters
+  (see 'tables/query.py'), to which newly appended matching rows are inserted.
+
+Rows already merged are tracked with a high-water mark per source table: the
+greatest value of a watermark column (e.g. an increasing ID, or an insertion
+timestamp), stored in the IncrementalSource model. Each refresh reads rows
+above the mark, merges them, and advances the mark, all in one statement, so
+refresh cost scales with the number of appended rows rather than the size of
+the table. That takes an index on the watermark column, which is built
+together with the result table unless the source table already has one.
+
+NOTE: Sources must be append-only. Updates and deletes of rows that were
+already merged are never seen. The watermark column must also increase in
+commit order; rows committed with a value below the current high-water mark
+are skipped. Bulk loads and appends through 'tables/append/' commit each file
+in one transaction, so a column filled in load order qualifies.
+
+NOTE: Rows whose 'GROUP BY' columns are NULL are left out, since NULLs never
+conflict in a unique index, and would add a new group on every refresh.
+"""
+
+import collections
+
+from psycopg2 import sql
+
+from tables import ingest as table_ingest
+from tables import query as table_query
+from tables import utils as table_utils
+from . import models
+
+
+AGGREGATE_FUNCTIONS = (
+    'sum',
+    'count',
+    'min',
+    'max',
+)
+
+# Column families (see 'tables/ingest.py' COLUMN_TYPES) each aggregate accepts.
+AGGREGATE_FUNCTION_FAMILIES = {
+    'sum': ('integer', 'float'),
+    'count': ('integer', 'float', 'boolean', 'text', 'date', 'timestamp'),
+    'min': ('integer', 'float', 'text', 'date', 'timestamp'),
+    'max': ('integer', 'float', 'text', 'date', 'timestamp'),
+}
+
+# Column families a high-water mark can be kept on.
+WATERMARK_FAMILIES = (
+    'integer',
+    'date',
+    'timestamp',
+)
+
+# Index access methods that serve the range scan of rows above a high-water
+# mark. BRIN suits append-only tables, whose watermark column increases with
+# physical row order.
+WATERMARK_INDEX_METHODS = (
+    'btree',
+    'brin',
+)
+
+IncrementalDefinition = collections.namedtuple(
+    'IncrementalDefinition',
+    ['source_table', 'watermark_column', 'group_by', 'aggregates', 'filters', 'columns']
+)
+
+AggregateDefinition = collections.namedtuple(
+    'AggregateDefinition',
+    ['function', 'column', 'name']
+)
+
+
+def parse_definition(definition_data, source_columns):
+    """
+    Converts the incremental view JSON contract into a definition.
+
+    The contract is a dict like {"source_table": "orders",
+    "watermark_column": "id", "group_by": ["region"], "aggregates":
+    [{"function": "sum", "column": "amount", "name": "total_amount"},
+    {"function": "count", "name": "order_count"}], "filters":
+    ["status:eq:paid"]} for aggregates, or {"source_table": "orders",
+    "watermark_column": "id", "columns": ["id", "amount"], "filters":
+    ["amount:gte:100"]} for filters. "columns" defaults to every column.
+
+    Args:
+        dict: Incremental view dict.
+        list(ColumnDefinition): Columns of the source table.
+
+    Returns:
+        IncrementalDefinition
+
+    Raises:
+        ValueError: Definition is malformed, or does not suit the source.
+    """
+    if type(definition_data) is not dict:
+        raise ValueError('Incremental definition must be a dict.')
+    if set(definition_data.keys()) - set(IncrementalDefinition._fields):
+        raise ValueError(f'Unrecognized incremental definition keys: {definition_data}')
+
+    columns_by_name = {
+        column.column_name: column
+        for column
+        in source_columns
+    }
+
+    watermark_column = definition_data.get('watermark_column')
+    if watermark_column not in columns_by_name:
+        raise ValueError(f'Unknown watermark column: {watermark_column}')
+    if columns_by_name[watermark_column].family not in WATERMARK_FAMILIES:
+        raise ValueError(f'Watermark column must be of a family in {WATERMARK_FAMILIES}')
+
+    group_by = definition_data.get('group_by', [])
+    aggregate_data = definition_data.get('aggregates', [])
+    columns = definition_data.get('columns', [])
+    for names in (group_by, aggregate_data, columns):
+        if type(names) is not list:
+            raise ValueError('Group by, aggregates, and columns must be lists.')
+    for column_name in group_by + columns:
+        if column_name not in columns_by_name:
+            raise ValueError(f'Unknown column: {column_name}')
+    if bool(group_by) != bool(aggregate_data):
+        raise ValueError('Aggregates and group by columns must be given together.')
+    if group_by and columns:
+        raise ValueError('Columns only apply to filter views; aggregate views output their group by columns and aggregates.')
+
+    aggregates = []
+    for item in aggregate_data:
+        if type(item) is not dict or set(item.keys()) - set(AggregateDefinition._fields):
+            raise ValueError(f'Malformed aggregate: {item}')
+        function = str(item.get('function', '')).lower()
+        if function not in AGGREGATE_FUNCTIONS:
+            raise ValueError(f'Unsupported aggregate function: {function}')
+        column_name = item.get('column')
+        if column_name is None and function != 'count':
+            raise ValueError(f'Aggregate function {function} requires a column.')
+        if column_name is not None and (
+            column_name not in columns_by_name or
+            columns_by_name[column_name].family not in AGGREGATE_FUNCTION_FAMILIES[function]
+        ):
+            raise ValueError(f'Cannot {function} column: {column_name}')
+        name = item.get('name')
+        if type(name) is not str or not name or len(name.encode('utf-8')) > 63:
+            raise ValueError(f'Aggregate requires a name of at most 63 bytes: {item}')
+        aggregates.append(AggregateDefinition(function, column_name, name))
+
+    output_names = group_by + [aggregate.name for aggregate in aggregates]
+    if len(set(output_names)) != len(output_names):
+        raise ValueError('Output column names must be unique.')
+
+    filters = definition_data.get('filters', [])
+    if type(filters) is not list:
+        raise ValueError('Filters must be a list.')
+    for expression in filters:
+        table_query.parse_filter(str(expression), list(columns_by_name.keys()))
+
+    return IncrementalDefinition(
+        source_table=definition_data.get('source_table'),
+        watermark_column=watermark_column,
+        group_by=group_by,
+        aggregates=aggregates,
+        filters=[str(expression) for expression in filters],
+        columns=columns
+    )
+
+
+def _aggregate_sql(aggregate):
+    return sql.SQL('{function}({column}) AS {name}').format(
+        # Whitelisted by 'parse_definition()'.
+        function=sql.SQL(aggregate.function),
+        column=(
+            sql.Identifier(aggregate.column)
+            if aggregate.column is not None
+            else sql.SQL('*')
+        ),
+        name=sql.Identifier(aggregate.name)
+    )
+
+
+def _merge_sql(aggregate):
+    """
+    Returns the 'ON CONFLICT DO UPDATE' assignment combining a stored
+    aggregate with the aggregate of the delta ('EXCLUDED').
+    """
+    name = sql.Identifier(aggregate.name)
+    if aggregate.function == 'count':
+        expression = sql.SQL('result.{name} + EXCLUDED.{name}')
+    elif aggregate.function == 'sum':
+        # 'sum()' over only NULLs is NULL, rather than 0.
+        expression = sql.SQL('COALESCE(result.{name} + EXCLUDED.{name}, result.{name}, EXCLUDED.{name})')
+    elif aggregate.function == 'min':
+        expression = sql.SQL('LEAST(result.{name}, EXCLUDED.{name})')
+    else:
+        expression = sql.SQL('GREATEST(result.{name}, EXCLUDED.{name})')
+    return sql.SQL('{name} = ').format(name=name) + expression.format(name=name)
+
+
+def output_columns(definition, column_names):
+    """
+    Returns the column names of the result table of a definition.
+
+    Args:
+        IncrementalDefinition
+        list(str): Columns of the source table.
+    """
+    if definition.group_by:
+        return definition.group_by + [
+            aggregate.name
+            for aggregate
+            in definition.aggregates
+        ]
+    return definition.columns or column_names
+
+
+def delta_select_sql(definition, relation, column_names):
+    """
+    Returns the 'SELECT' computing a definition over a relation, e.g. the rows
+    appended since the last refresh.
+
+    Args:
+        IncrementalDefinition
+        psycopg2.sql.Composable: Relation to select from.
+        list(str): Columns of the source table.
+
+    Returns:
+        psycopg2.sql.Composed
+    """
+    conditions = [
+        table_query.parse_filter(expression, column_names)
+        for expression
+        in definition.filters
+    ] + [
+        sql.SQL('{column} IS NOT NULL').format(
+            column=sql.Identifier(column_name)
+        )
+        for column_name
+        in definition.group_by
+    ]
+    where = (
+        sql.SQL(' WHERE ') + sql.SQL(' AND ').join(conditions)
+        if conditions
+        else sql.SQL('')
+    )
+
+    if not definition.group_by:
+        return sql.SQL('SELECT {columns} FROM {relation}').format(
+            columns=sql.SQL(', ').join(
+                sql.Identifier(column_name)
+                for column_name
+                in output_columns(definition, column_names)
+            ),
+            relation=relation
+        ) + where
+
+    group_by = sql.SQL(', ').join(
+        sql.Identifier(column_name)
+        for column_name
+        in definition.group_by
+    )
+    return sql.SQL('SELECT {group_by}, {aggregates} FROM {relation}').format(
+        group_by=group_by,
+        aggregates=sql.SQL(', ').join(
+            _aggregate_sql(aggregate)
+            for aggregate
+            in definition.aggregates
+        ),
+        relation=relation
+    ) + where + sql.SQL(' GROUP BY {group_by}').format(group_by=group_by)
+
+
+def create_result_table_sql(schema_name, view_name, definition, column_names):
+    """
+    Returns a 'CREATE TABLE ... AS ... WITH NO DATA' statement creating the
+    empty result table of a definition, with the output column types PostgreSQL
+    infers for it.
+    """
+    return sql.SQL('CREATE TABLE {view_name} AS {select} WITH NO DATA').format(
+        view_name=sql.Identifier(str(schema_name), view_name),
+        select=delta_select_sql(
+            definition,
+            sql.Identifier(str(schema_name), definition.source_table),
+            column_names
+        )
+    )
+
+
+def has_watermark_index(psql_cursor, definition):
+    """
+    Checks whether the source table of a definition has a non-partial B-tree or
+    BRIN index led by its watermark column, within the caller's transaction.
+    Without one, every refresh scans the whole source table for the rows above
+    the high-water mark.
+    """
+    psql_cursor.execute(
+        sql.SQL(
+            'SELECT EXISTS('
+            'SELECT 1 FROM pg_index i '
+            'JOIN pg_class c ON c.oid = i.indrelid '
+            'JOIN pg_namespace n ON n.oid = c.relnamespace '
+            'JOIN pg_class ic ON ic.oid = i.indexrelid '
+            'JOIN pg_am am ON am.oid = ic.relam '
+            'JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0] '
+            'WHERE n.nspname = current_schema() AND c.relname = {source_table} '
+            'AND a.attname = {watermark_column} AND am.amname IN {methods} AND i.indpred IS NULL'
+            ')'
+        ).format(
+            source_table=sql.Literal(definition.source_table),
+            watermark_column=sql.Literal(definition.watermark_column),
+            methods=sql.Literal(WATERMARK_INDEX_METHODS)
+        )
+    )
+    return psql_cursor.fetchone()[0]
+
+
+def watermark_index_sql(definition):
+    """
+    Returns the 'CREATE INDEX' statement for a B-tree index on the watermark
+    column of the source table of a definition.
+    """
+    return table_ingest.create_index_sql(
+        definition.source_table,
+        table_ingest.IndexDefinition([definition.watermark_column], 'btree', False)
+    )
+
+
+def refresh_sql(schema_name, view_name, definition, column_names, source):
+    """
+    Returns the single statement that merges rows appended to the source table
+    since the last refresh into the result table, and advances the high-water
+    mark.
+
+    The IncrementalSource row is locked first, so that overlapping refreshes
+    run one after another instead of merging the same rows twice. Every
+    relation is schema-qualified, since 'pg_cron' does not run with the user's
+    'search_path'.
+
+    Args:
+        str: User schema.
+        str: Result table name.
+        IncrementalDefinition
+        list(str): Columns of the source table.
+        models.IncrementalSource: Tracked source.
+
+    Returns:
+        psycopg2.sql.Composed
+    """
+    source_relation = sql.Identifier(
+        'public',
+        models.IncrementalSource._meta.db_table
+    )
+    watermark_column = sql.Identifier(definition.watermark_column)
+
+    insert = sql.SQL('INSERT INTO {view_name} AS result ({columns}) {select}').format(
+        view_name=sql.Identifier(str(schema_name), view_name),
+        columns=sql.SQL(', ').join(
+            sql.Identifier(column_name)
+            for column_name
+            in output_columns(definition, column_names)
+        ),
+        select=delta_select_sql(
+            definition,
+            sql.Identifier('new_rows'),
+            column_names
+        )
+    )
+    if definition.group_by:
+        insert += sql.SQL(' ON CONFLICT ({group_by}) DO UPDATE SET {assignments}').format(
+            group_by=sql.SQL(', ').join(
+                sql.Identifier(column_name)
+                for column_name
+                in definition.group_by
+            ),
+            assignments=sql.SQL(', ').join(
+                _merge_sql(aggregate)
+                for aggregate
+                in definition.aggregates
+            )
+        )
+
+    return sql.SQL(
+        'WITH watermark AS ('
+        'SELECT high_water_mark::{watermark_type} AS value FROM {source_relation} WHERE id = {source_id} FOR UPDATE'
+        '), new_rows AS ('
+        'SELECT * FROM {source_table} WHERE (SELECT value FROM watermark) IS NULL OR {watermark_column} > (SELECT value FROM watermark)'
+        '), merged AS ({insert}) '
+        'UPDATE {source_relation} SET high_water_mark = COALESCE((SELECT max({watermark_column})::text FROM new_rows), high_water_mark), refreshed = NOW() '
+        'WHERE id = {source_id}'
+    ).format(
+        # Canonical type name, whitelisted by 'parse_columns()'.
+        watermark_type=sql.SQL(source.watermark_type),
+        source_relation=source_relation,
+        source_id=sql.Literal(source.id),
+        source_table=sql.Identifier(str(schema_name), definition.source_table),
+        watermark_column=watermark_column,
+        insert=insert
+    )
+
+
+def view_refresh_sql(view):
+    """
+    Returns the refresh statement of an incrementally maintained
+    MaterializedView model, e.g. to schedule with 'cron.schedule'.
+    """
+    source = view.incremental_sources.get()
+    source_columns = table_ingest.parse_columns(
+        table_utils.table_columns(str(view.user_id), source.table_name)
+    )
+    return refresh_sql(
+        view.user_id,
+        view.view_name,
+        parse_definition(view.definition, source_columns),
+        [column.column_name for column in source_columns],
+        source
+    )
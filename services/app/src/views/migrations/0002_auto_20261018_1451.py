@@ -0,0 +1,24 @@
+# Generated by Django 3.0.4 on 2026-10-18 14:51
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('views', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materializedview',
+            name='refresh_mode',
+            field=models.CharField(choices=[('STANDARD', 'Plain refresh, blocking reads until it commits'), ('CONCURRENT', 'Concurrent refresh against a unique index, never blocking reads')], default='STANDARD', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='unique_key',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=63), blank=True, default=list, size=None),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.0.4 on 2026-10-18 14:53
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('views', '0002_auto_20261018_1451'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materializedview',
+            name='definition',
+            field=django.contrib.postgres.fields.jsonb.JSONField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='materializedview',
+            name='refresh_mode',
+            field=models.CharField(choices=[('STANDARD', 'Plain refresh, blocking reads until it commits'), ('CONCURRENT', 'Concurrent refresh against a unique index, never blocking reads'), ('INCREMENTAL', 'Maintained table, merging only rows appended to its source')], default='STANDARD', max_length=16),
+        ),
+        migrations.CreateModel(
+            name='IncrementalSource',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table_name', models.CharField(max_length=255)),
+                ('watermark_column', models.CharField(max_length=63)),
+                ('watermark_type', models.CharField(max_length=64)),
+                ('high_water_mark', models.TextField(blank=True, null=True)),
+                ('refreshed', models.DateTimeField(blank=True, null=True)),
+                ('view', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='incremental_sources', to='views.MaterializedView')),
+            ],
+        ),
+    ]
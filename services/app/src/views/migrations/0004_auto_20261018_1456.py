@@ -0,0 +1,29 @@
+# Generated by Django 3.0.4 on 2026-10-18 14:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('views', '0003_auto_20261018_1453'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materializedview',
+            name='last_refreshed',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ViewDependency',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('schema_name', models.CharField(max_length=63)),
+                ('relation_name', models.CharField(max_length=255)),
+                ('upstream', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='downstream_dependencies', to='views.MaterializedView')),
+                ('view', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dependencies', to='views.MaterializedView')),
+            ],
+        ),
+    ]
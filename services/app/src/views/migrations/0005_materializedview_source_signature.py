@@ -0,0 +1,18 @@
+# Generated by Django 3.0.4 on 2026-10-18 14:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('views', '0004_auto_20261018_1456'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materializedview',
+            name='source_signature',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.0.4 on 2026-10-18 15:03
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('views', '0005_materializedview_source_signature'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materializedview',
+            name='estimated_cost',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='estimated_rows',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='last_refresh_duration',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='plan',
+            field=django.contrib.postgres.fields.jsonb.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -2,11 +2,22 @@
 Django models for views service.
 """
 
+from django.contrib.postgres import fields as psql_fields
 from django.db import models
+from django.utils.translation import gettext_lazy as _
 
 from authentication import models as auth_models
 
 
+# NOTE: Python-based enum.Enum type underneath the hood, that may map to enum
+# types using the Django ORM:
+# https://schinckel.net/2019/09/18/postgres-enum-types-in-django/
+class EnumRefreshModes(models.TextChoices):
+    STANDARD = 'STANDARD',_('Plain refresh, blocking reads until it commits')
+    CONCURRENT = 'CONCURRENT',_('Concurrent refresh against a unique index, never blocking reads')
+    INCREMENTAL = 'INCREMENTAL',_('Maintained table, merging only rows appended to its source')
+
+
 class MaterializedView(models.Model):
     """
     Django model for materialized view. This model is important for describing
@@ -24,3 +35,86 @@ class MaterializedView(models.Model):
         on_delete=models.PROTECT,
         to_field='id'
     )
+    # Columns of the unique index that 'REFRESH MATERIALIZED VIEW
+    # CONCURRENTLY' matches old and new rows on. Empty for views refreshed with
+    # a plain 'REFRESH MATERIALIZED VIEW'.
+    unique_key = psql_fields.ArrayField(
+        models.CharField(max_length=63),
+        default=list,
+        blank=True
+    )
+    refresh_mode = models.CharField(
+        max_length=16,
+        choices=EnumRefreshModes.choices,
+        default=EnumRefreshModes.STANDARD
+    )
+    # Definition of an incrementally maintained view, see 'views/incremental.py'.
+    # Empty for views created from a SQL query.
+    definition = psql_fields.JSONField(null=True, blank=True)
+    # When this view was last refreshed by a pipeline refresh or a refresh gated
+    # on source changes; see 'jobs/pipelines.py' and 'views/dependencies.py'.
+    last_refreshed = models.DateTimeField(null=True, blank=True)
+    # Modification counters of the source relations as of the last gated
+    # refresh, see 'views/dependencies.py' source_signature_sql().
+    source_signature = models.TextField(null=True, blank=True)
+    # Planner estimates for the view query at creation, and the shape of its
+    # plan, see 'views/utils.py' explain_query().
+    estimated_cost = models.FloatField(null=True, blank=True)
+    estimated_rows = models.FloatField(null=True, blank=True)
+    plan = psql_fields.JSONField(null=True, blank=True)
+    # Wall-clock duration of the last refresh in milliseconds, to compare
+    # against the estimated cost. Set at creation, then by every scheduled
+    # refresh; see 'jobs/utils.py' refresh_statement_sql().
+    last_refresh_duration = models.FloatField(null=True, blank=True)
+
+
+class ViewDependency(models.Model):
+    """
+    Django model for one relation a materialized view selects from, as recorded
+    by PostgreSQL when the view was created. Together, these form the
+    dependency graph of a user's views; see 'views/dependencies.py'.
+    """
+    view = models.ForeignKey(
+        MaterializedView,
+        on_delete=models.CASCADE,
+        to_field='id',
+        related_name='dependencies'
+    )
+    schema_name = models.CharField(max_length=63)
+    relation_name = models.CharField(max_length=255)
+    # Set if the relation is itself a tracked view, i.e. an upstream node of
+    # the dependency graph, rather than a table.
+    upstream = models.ForeignKey(
+        MaterializedView,
+        on_delete=models.CASCADE,
+        to_field='id',
+        null=True,
+        blank=True,
+        related_name='downstream_dependencies'
+    )
+
+
+class IncrementalSource(models.Model):
+    """
+    Django model for one append-only source table of an incrementally maintained
+    view, and the high-water mark of the rows already merged into the view.
+
+    NOTE: The underlying PostgreSQL table is updated by the maintenance
+    statement scheduled with 'cron.schedule', outside the Django ORM. See
+    'views/incremental.py'.
+    """
+    view = models.ForeignKey(
+        MaterializedView,
+        on_delete=models.PROTECT,
+        to_field='id',
+        related_name='incremental_sources'
+    )
+    table_name = models.CharField(max_length=255)
+    watermark_column = models.CharField(max_length=63)
+    # Canonical PostgreSQL type of the watermark column, that the stored
+    # high-water mark is cast back to.
+    watermark_type = models.CharField(max_length=64)
+    # Text form of the greatest watermark column value merged so far; NULL until
+    # the first refresh.
+    high_water_mark = models.TextField(null=True, blank=True)
+    refreshed = models.DateTimeField(null=True, blank=True)
@@ -15,3 +15,21 @@ class MaterializedViewSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.MaterializedView
         fields = "__all__"
+
+
+class IncrementalSourceSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the IncrementalSource model.
+    """
+    class Meta:
+        model = models.IncrementalSource
+        fields = "__all__"
+
+
+class ViewDependencySerializer(serializers.ModelSerializer):
+    """
+    Serializer for the ViewDependency model.
+    """
+    class Meta:
+        model = models.ViewDependency
+        fields = "__all__"
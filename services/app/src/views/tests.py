@@ -1,3 +1,258 @@
-from django.test import TestCase
+"""
+Tests for views service.
+"""
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from tables import ingest as table_ingest
+from . import dependencies as views_dependencies
+from . import incremental as views_incremental
+from . import utils as views_utils
+
+
+class ParseDefinitionTests(SimpleTestCase):
+    """
+    Checks the incremental view JSON contract.
+    """
+
+    source_columns = [
+        table_ingest.ColumnDefinition('id', 'BIGINT', 'integer'),
+        table_ingest.ColumnDefinition('created', 'TIMESTAMP', 'timestamp'),
+        table_ingest.ColumnDefinition('region', 'TEXT', 'text'),
+        table_ingest.ColumnDefinition('amount', 'DOUBLE PRECISION', 'float'),
+    ]
+
+    def parse(self, definition_data):
+        return views_incremental.parse_definition(
+            definition_data,
+            self.source_columns
+        )
+
+    def test_aggregates(self):
+        definition = self.parse({
+            'source_table': 'orders',
+            'watermark_column': 'id',
+            'group_by': ['region'],
+            'aggregates': [
+                {'function': 'SUM', 'column': 'amount', 'name': 'total_amount'},
+                {'function': 'count', 'name': 'order_count'}
+            ],
+            'filters': ['amount:gte:100']
+        })
+        self.assertEqual(definition.source_table, 'orders')
+        self.assertEqual(definition.watermark_column, 'id')
+        self.assertEqual(definition.group_by, ['region'])
+        self.assertEqual(
+            definition.aggregates,
+            [
+                views_incremental.AggregateDefinition('sum', 'amount', 'total_amount'),
+                views_incremental.AggregateDefinition('count', None, 'order_count')
+            ]
+        )
+        self.assertEqual(definition.filters, ['amount:gte:100'])
+        self.assertEqual(definition.columns, [])
+
+    def test_filters(self):
+        definition = self.parse({
+            'source_table': 'orders',
+            'watermark_column': 'created',
+            'columns': ['id', 'amount'],
+            'filters': ['region:eq:emea']
+        })
+        self.assertEqual(definition.group_by, [])
+        self.assertEqual(definition.aggregates, [])
+        self.assertEqual(definition.columns, ['id', 'amount'])
+        self.assertEqual(definition.filters, ['region:eq:emea'])
+
+    def test_invalid_definitions(self):
+        valid = {
+            'source_table': 'orders',
+            'watermark_column': 'id',
+            'group_by': ['region'],
+            'aggregates': [{'function': 'sum', 'column': 'amount', 'name': 'total'}]
+        }
+        for (reason, changes) in (
+            ('unknown key', {'having': 'x'}),
+            ('unknown watermark column', {'watermark_column': 'missing'}),
+            ('text watermark column', {'watermark_column': 'region'}),
+            ('unknown group by column', {'group_by': ['missing']}),
+            ('group by without aggregates', {'aggregates': []}),
+            ('aggregates without group by', {'group_by': []}),
+            ('columns of an aggregate view', {'columns': ['id']}),
+            ('unsupported function', {'aggregates': [{'function': 'avg', 'column': 'amount', 'name': 'a'}]}),
+            ('sum of text', {'aggregates': [{'function': 'sum', 'column': 'region', 'name': 'a'}]}),
+            ('sum without column', {'aggregates': [{'function': 'sum', 'name': 'a'}]}),
+            ('missing name', {'aggregates': [{'function': 'count'}]}),
+            ('name too long', {'aggregates': [{'function': 'count', 'name': 'a' * 64}]}),
+            ('duplicate output name', {'aggregates': [{'function': 'count', 'name': 'region'}]}),
+            ('invalid filter', {'filters': ['missing:eq:1']}),
+        ):
+            with self.subTest(reason=reason):
+                with self.assertRaises(ValueError):
+                    self.parse(dict(valid, **changes))
+
+    def test_not_a_dict(self):
+        with self.assertRaises(ValueError):
+            self.parse(['orders'])
+
+
+class TopologicalOrderTests(SimpleTestCase):
+    """
+    Checks the ordering of view dependency graphs, upstream first.
+    """
+
+    def test_empty(self):
+        self.assertEqual(views_dependencies.topological_order({}), [])
+
+    def test_chain(self):
+        self.assertEqual(
+            views_dependencies.topological_order({3: {2}, 2: {1}, 1: set()}),
+            [1, 2, 3]
+        )
+
+    def test_diamond(self):
+        order = views_dependencies.topological_order({
+            4: {2, 3},
+            3: {1},
+            2: {1},
+            1: set()
+        })
+        self.assertEqual(order, [1, 2, 3, 4])
+
+    def test_independent_views_by_id(self):
+        self.assertEqual(
+            views_dependencies.topological_order({5: set(), 2: set(), 9: {5}}),
+            [2, 5, 9]
+        )
+
+    def test_graph_is_not_modified(self):
+        graph = {2: {1}, 1: set()}
+        views_dependencies.topological_order(graph)
+        self.assertEqual(graph, {2: {1}, 1: set()})
+
+    def test_cycle(self):
+        with self.assertRaises(ValueError):
+            views_dependencies.topological_order({1: {3}, 2: {1}, 3: {2}, 4: set()})
+
+
+class FakeCursor:
+    """
+    Stands in for a 'psycopg2' cursor, returning canned rows for any query.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def execute(self, query):
+        self.queries.append(query)
+
+    def fetchall(self):
+        return self.rows
+
+
+class GuaranteedKeysTests(SimpleTestCase):
+    """
+    Checks which keys canned 'EXPLAIN (VERBOSE, FORMAT JSON)' plans guarantee.
+    """
+
+    def scan(self, node_type='Seq Scan'):
+        return {
+            'Node Type': node_type,
+            'Relation Name': 'orders',
+            'Schema': '1',
+            'Alias': 'o',
+            'Output': ['o.id', 'o.region', 'o.amount']
+        }
+
+    def test_group_by(self):
+        plan = {
+            'Node Type': 'Sort',
+            'Output': ['o.region', '(sum(o.amount))'],
+            'Plans': [{
+                'Node Type': 'Aggregate',
+                'Strategy': 'Hashed',
+                'Partial Mode': 'Simple',
+                'Group Key': ['o.region'],
+                'Output': ['o.region', 'sum(o.amount)'],
+                'Plans': [self.scan()]
+            }]
+        }
+        psql_cursor = FakeCursor([])
+        self.assertEqual(
+            views_utils.guaranteed_keys(psql_cursor, plan),
+            [['o.region']]
+        )
+        self.assertEqual(psql_cursor.queries, [])
+
+    def test_grouping_sets(self):
+        plan = {
+            'Node Type': 'Aggregate',
+            'Strategy': 'Mixed',
+            'Group Key': ['o.region'],
+            'Grouping Sets': [{'Group Keys': [['o.region'], []]}],
+            'Output': ['o.region', 'sum(o.amount)'],
+            'Plans': [self.scan()]
+        }
+        self.assertEqual(views_utils.guaranteed_keys(FakeCursor([]), plan), [])
+
+    def test_partial_aggregate(self):
+        plan = {
+            'Node Type': 'Aggregate',
+            'Partial Mode': 'Partial',
+            'Group Key': ['o.region'],
+            'Output': ['o.region', 'PARTIAL sum(o.amount)'],
+            'Plans': [self.scan()]
+        }
+        self.assertEqual(views_utils.guaranteed_keys(FakeCursor([]), plan), [])
+
+    def test_scan_of_indexed_relation(self):
+        plan = {
+            'Node Type': 'Limit',
+            'Output': ['o.id', 'o.region', 'o.amount'],
+            'Plans': [self.scan('Index Scan')]
+        }
+        self.assertEqual(
+            views_utils.guaranteed_keys(FakeCursor([[['o.id']]]), plan),
+            [['o.id']]
+        )
+
+    def test_distinct(self):
+        plan = {
+            'Node Type': 'Unique',
+            'Output': ['o.region', 'o.amount'],
+            'Plans': [{
+                'Node Type': 'Sort',
+                'Output': ['o.region', 'o.amount'],
+                'Sort Key': ['o.region', 'o.amount'],
+                'Plans': [self.scan()]
+            }]
+        }
+        self.assertEqual(
+            views_utils.guaranteed_keys(FakeCursor([[['o.id']]]), plan),
+            [['o.id'], ['o.region', 'o.amount']]
+        )
+
+    def test_join(self):
+        plan = {
+            'Node Type': 'Hash Join',
+            'Output': ['o.id', 'c.name'],
+            'Plans': [
+                self.scan(),
+                {
+                    'Node Type': 'Hash',
+                    'Output': ['c.id', 'c.name'],
+                    'Plans': [dict(self.scan(), **{'Relation Name': 'customers', 'Alias': 'c'})]
+                }
+            ]
+        }
+        self.assertEqual(views_utils.guaranteed_keys(FakeCursor([[['o.id']]]), plan), [])
+
+    def test_function_scan(self):
+        plan = {
+            'Node Type': 'Function Scan',
+            'Function Name': 'generate_series',
+            'Alias': 'g',
+            'Output': ['g']
+        }
+        self.assertEqual(views_utils.guaranteed_keys(FakeCursor([]), plan), [])
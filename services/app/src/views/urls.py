@@ -12,5 +12,15 @@ urlpatterns = [
         'create/',
         views.CreateMaterializedViewAPIView().as_view(),
         name='view_create'
+    ),
+    path(
+        'create/incremental/',
+        views.CreateIncrementalViewAPIView().as_view(),
+        name='view_create_incremental'
+    ),
+    path(
+        'dependencies/',
+        views.ViewDependenciesAPIView().as_view(),
+        name='view_dependencies'
     )
 ]
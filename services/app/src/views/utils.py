@@ -2,9 +2,37 @@
 Utility classes, methods, and variables for views service.
 """
 
+import json
+
+from django.conf import settings
 from psycopg2 import sql
 
 from core import utils as core_utils
+from . import models
+
+
+# Plan nodes that never duplicate the rows of their only child, so that keys
+# unique below them stay unique. See guaranteed_keys().
+KEY_PRESERVING_NODE_TYPES = (
+    'Sort',
+    'Incremental Sort',
+    'Limit',
+    'Unique',
+    'Materialize',
+    'Gather',
+    'Gather Merge',
+)
+
+# Plan nodes that scan one relation, each row at most once.
+SCAN_NODE_TYPES = (
+    'Seq Scan',
+    'Index Scan',
+    'Index Only Scan',
+    'Bitmap Heap Scan',
+)
+
+# Alias of the subquery infer_unique_key() plans a view query as.
+INFERENCE_SUBQUERY_ALIAS = 'inferred'
 
 
 def materialized_view_exists(schemaname, matviewname):
@@ -21,3 +49,247 @@ def materialized_view_exists(schemaname, matviewname):
         view_exists = psql_cursor.fetchone()[0]
 
         return view_exists
+
+
+def view_columns(psql_cursor, view_name):
+    """
+    Returns the columns of a materialized view in the current schema, in
+    order, within the caller's transaction.
+
+    Returns:
+        list((str, bool)): Column name, and whether its type has a default
+            btree operator class, i.e. can be part of a unique index.
+    """
+    psql_cursor.execute(
+        sql.SQL(
+            'SELECT a.attname, EXISTS(SELECT 1 FROM pg_opclass oc JOIN pg_am am ON am.oid = oc.opcmethod WHERE am.amname = {method} AND oc.opcdefault AND oc.opcintype = a.atttypid) '
+            'FROM pg_attribute a '
+            'JOIN pg_class c ON c.oid = a.attrelid '
+            'JOIN pg_namespace n ON n.oid = c.relnamespace '
+            'WHERE n.nspname = current_schema() AND c.relname = {view_name} AND a.attnum > 0 AND NOT a.attisdropped '
+            'ORDER BY a.attnum'
+        ).format(
+            method=sql.Literal('btree'),
+            view_name=sql.Literal(view_name)
+        )
+    )
+    return psql_cursor.fetchall()
+
+
+def relation_unique_keys(psql_cursor, schema_name, relation_name, alias):
+    """
+    Returns the columns of every non-partial unique index over plain columns of
+    a relation, within the caller's transaction, as 'EXPLAIN (VERBOSE)'
+    deparses them for a scan of the relation under the given alias, e.g.
+    't."SomeNumber"'.
+
+    Returns:
+        list(list(str)): Key column expressions, narrowest index first.
+    """
+    psql_cursor.execute(
+        sql.SQL(
+            'SELECT array_agg(quote_ident({alias}) || {separator} || quote_ident(a.attname::text) ORDER BY a.attnum) '
+            'FROM pg_index i '
+            'JOIN pg_class c ON c.oid = i.indrelid '
+            'JOIN pg_namespace n ON n.oid = c.relnamespace '
+            'JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY((i.indkey::int2[])[0:i.indnkeyatts - 1]) '
+            'WHERE n.nspname = {schema_name} AND c.relname = {relation_name} '
+            'AND i.indisunique AND i.indpred IS NULL AND i.indexprs IS NULL '
+            'GROUP BY i.indexrelid, i.indnkeyatts '
+            'ORDER BY i.indnkeyatts, i.indexrelid'
+        ).format(
+            alias=sql.Literal(alias),
+            separator=sql.Literal('.'),
+            schema_name=sql.Literal(schema_name),
+            relation_name=sql.Literal(relation_name)
+        )
+    )
+    return [row[0] for row in psql_cursor.fetchall()]
+
+
+def guaranteed_keys(psql_cursor, plan):
+    """
+    Returns the sets of output expressions a query plan guarantees to be unique
+    over its rows, within the caller's transaction: the 'GROUP BY' keys of a
+    top-level aggregate, or the unique index keys of the one relation scanned,
+    and failing those, every output expression of a 'DISTINCT'.
+
+    Sorts, limits, and other nodes that never duplicate the rows of their only
+    child are looked through. Anything else (joins, unions, set-returning
+    functions, grouping sets, ...) guarantees nothing here.
+
+    Args:
+        psycopg2.cursor
+        dict: Top-level plan node from explain_query(..., verbose=True).
+
+    Returns:
+        list(list(str)): Key expressions, as deparsed in 'Output'.
+    """
+    node = plan
+    distinct_keys = []
+    while (
+        node['Node Type'] in KEY_PRESERVING_NODE_TYPES and
+        len(node.get('Plans', [])) == 1
+    ):
+        # A sorted 'DISTINCT' (or 'DISTINCT ON') never emits the same row
+        # twice.
+        if node['Node Type'] == 'Unique' and node.get('Output'):
+            distinct_keys.append(node['Output'])
+        node = node['Plans'][0]
+
+    if node['Node Type'] in ('Aggregate', 'Group'):
+        if (
+            node.get('Group Key') and
+            'Grouping Sets' not in node and
+            node.get('Partial Mode', 'Simple') != 'Partial'
+        ):
+            return [node['Group Key']] + distinct_keys
+        return distinct_keys
+
+    if node['Node Type'] in SCAN_NODE_TYPES and 'Relation Name' in node:
+        return relation_unique_keys(
+            psql_cursor,
+            node['Schema'],
+            node['Relation Name'],
+            node['Alias']
+        ) + distinct_keys
+    return distinct_keys
+
+
+def infer_unique_key(psql_cursor, view_name, sql_query):
+    """
+    Infers a unique key for a freshly created materialized view, within the
+    caller's transaction.
+
+    Only keys the view query guarantees are inferred, from its plan (see
+    guaranteed_keys()): the 'GROUP BY' columns of an aggregate, the columns of
+    a unique index on the table it selects from, if the view selects them
+    as-is, or the whole row of a 'SELECT DISTINCT'. Rows that merely happen to
+    be unique when the view is created are not enough, since later refreshes
+    may produce duplicates and fail.
+
+    NOTE: The query is planned as a subquery, so that 'EXPLAIN (VERBOSE)'
+    qualifies column references in 'Output' the same way as in 'Group Key'.
+
+    Returns:
+        list(str): Key columns, or None if the query guarantees no key over
+            columns that can be indexed.
+    """
+    columns = view_columns(psql_cursor, view_name)
+    plan = explain_query(
+        psql_cursor,
+        f'SELECT * FROM ({sql_query}) AS {INFERENCE_SUBQUERY_ALIAS}',
+        verbose=True
+    )
+    # Maps each output expression to the first view column selecting it.
+    # Output expressions past the view columns are sort keys not selected.
+    output_columns = {}
+    for (expression, column) in zip(plan.get('Output', []), columns):
+        output_columns.setdefault(expression, column)
+
+    for key in guaranteed_keys(psql_cursor, plan):
+        if all(
+            expression in output_columns and output_columns[expression][1]
+            for expression
+            in key
+        ):
+            return [output_columns[expression][0] for expression in key]
+    return None
+
+
+def refresh_materialized_view_sql(schemaname, matviewname, concurrently=False):
+    """
+    Returns a schema-qualified 'REFRESH MATERIALIZED VIEW' statement.
+
+    'CONCURRENTLY' computes the new contents alongside the old, and merges the
+    difference in by the view's unique index under an 'EXCLUSIVE' lock, which
+    still admits 'SELECT'. A plain refresh takes an 'ACCESS EXCLUSIVE' lock
+    instead, blocking every read for its whole duration.
+
+    See: https://www.postgresql.org/docs/12/sql-refreshmaterializedview.html
+    """
+    return sql.SQL('REFRESH MATERIALIZED VIEW {concurrently}{view_name}').format(
+        concurrently=sql.SQL('CONCURRENTLY ' if concurrently else ''),
+        view_name=sql.Identifier(str(schemaname), matviewname)
+    )
+
+
+def plan_shape(plan):
+    """
+    Returns the shape of an 'EXPLAIN (FORMAT JSON)' plan node and its children:
+    node types, the relations scanned, join types, and the estimated cost and
+    rows of each node, without the remaining planner detail.
+    """
+    shape = {
+        'node_type': plan['Node Type'],
+        'total_cost': plan['Total Cost'],
+        'plan_rows': plan['Plan Rows']
+    }
+    if 'Relation Name' in plan:
+        shape['relation_name'] = plan['Relation Name']
+    if 'Join Type' in plan:
+        shape['join_type'] = plan['Join Type']
+    if plan.get('Plans'):
+        shape['plans'] = [
+            plan_shape(child)
+            for child
+            in plan['Plans']
+        ]
+    return shape
+
+
+def explain_query(psql_cursor, sql_query, verbose=False):
+    """
+    Plans a view query with 'EXPLAIN (FORMAT JSON)', without running it,
+    within the caller's transaction.
+
+    Args:
+        psycopg2.cursor
+        str: Validated view query, see 'views/views.py'.
+        bool: Plan with 'VERBOSE', which adds the 'Output' expressions and
+            schema of every node.
+
+    Returns:
+        dict: Top-level plan node.
+
+    See: https://www.postgresql.org/docs/12/sql-explain.html
+    """
+    # NOTE: Interpolated like the 'CREATE MATERIALIZED VIEW' statement itself,
+    # since the query is raw SQL.
+    psql_cursor.execute(
+        sql.SQL('EXPLAIN (%sFORMAT JSON) %s' % (
+            'VERBOSE, ' if verbose else '',
+            sql_query
+        ))
+    )
+    explain_output = psql_cursor.fetchone()[0]
+    if isinstance(explain_output, str):
+        explain_output = json.loads(explain_output)
+    return explain_output[0]['Plan']
+
+
+def cost_budget(user):
+    """
+    Returns the upper bound on the estimated cost of a user's view queries.
+    """
+    if user.view_cost_budget is not None:
+        return user.view_cost_budget
+    return settings.VIEWS_MAX_ESTIMATED_COST
+
+
+def record_refresh_sql(view):
+    """
+    Returns the statement recording when the current refresh of a
+    MaterializedView model happened, and how long it took, to run last within
+    the same top-level statement as the refresh, e.g. a PL/pgSQL block.
+
+    NOTE: 'statement_timestamp()' stays at the start of the top-level
+    statement, while 'clock_timestamp()' keeps moving.
+    """
+    return sql.SQL(
+        'UPDATE {views} SET last_refreshed = NOW(), last_refresh_duration = 1000 * extract(epoch FROM clock_timestamp() - statement_timestamp()) '
+        'WHERE id = {view_id}'
+    ).format(
+        views=sql.Identifier('public', models.MaterializedView._meta.db_table),
+        view_id=sql.Literal(view.id)
+    )
@@ -2,14 +2,23 @@
 Views service custom API views.
 """
 
+import time
+
+from django.db import transaction
+import psycopg2
 from psycopg2 import sql
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from core import utils as core_utils
+from tables import ingest as table_ingest
+from tables import utils as table_utils
+from . import dependencies as views_dependencies
+from . import incremental as views_incremental
 from . import utils as views_utils
 
+from . import models
 from . import serializers
 
 
@@ -34,6 +43,28 @@ class CreateMaterializedViewAPIView(APIView):
             --method POST \
             --data '{"view_name": "\"1\".\"sample_view\"", "sql_query": "SELECT * FROM \"1\".\"sample_table\""}' \
             https://api.tinydevcrm.com/views/create/
+
+        Views are refreshed with 'REFRESH MATERIALIZED VIEW CONCURRENTLY' by
+        default ('"refresh_mode": "CONCURRENT"'), so that scheduled refreshes
+        never block reads. That requires a unique index over plain columns, which
+        is built together with the view, in the same transaction:
+
+        - '"unique_key": ["SomeNumber"]' names the key columns. The view is not
+          created if they are not unique.
+        - Otherwise, the key is inferred from the plan of the query, only where
+          the query guarantees it: the 'GROUP BY' columns of an aggregate, a
+          unique index of the table selected from, or the whole row of a
+          'SELECT DISTINCT'. Views without a guaranteed key fall back to
+          '"refresh_mode": "STANDARD"', unless '"unique_key"' is given.
+
+        Passing '"refresh_mode": "STANDARD"' skips the unique index, for views
+        that are cheap to refresh and rarely read.
+
+        Since the query runs again on every scheduled refresh, it is planned
+        with 'EXPLAIN' first, and rejected if its estimated total cost exceeds
+        the user's cost budget (VIEWS_MAX_ESTIMATED_COST by default). The
+        estimated cost and rows, and the shape of the plan, are kept on the
+        view, together with the duration of its latest refresh.
         """
         def _validate(request):
             """
@@ -49,6 +80,8 @@ class CreateMaterializedViewAPIView(APIView):
                 'all_required_keys_are_present': True,
                 'query_starts_with_select_tables_or_values': True,
                 'query_does_not_contain_semicolons': True,
+                'refresh_mode_is_valid': True,
+                'unique_key_is_valid': True,
                 'view_does_not_exist': True
             }
 
@@ -75,6 +108,23 @@ class CreateMaterializedViewAPIView(APIView):
             if ';' in sql_query:
                 checks['query_does_not_contain_semicolons'] = False
 
+            refresh_mode = request.data.get(
+                'refresh_mode',
+                models.EnumRefreshModes.CONCURRENT
+            )
+            if refresh_mode not in models.EnumRefreshModes.values:
+                checks['refresh_mode_is_valid'] = False
+
+            unique_key = request.data.get('unique_key')
+            if unique_key is not None and (
+                refresh_mode != models.EnumRefreshModes.CONCURRENT or
+                type(unique_key) is not list or
+                not unique_key or
+                not all(type(column_name) is str for column_name in unique_key) or
+                len(set(unique_key)) != len(unique_key)
+            ):
+                checks['unique_key_is_valid'] = False
+
             checks['view_does_not_exist'] = not views_utils.materialized_view_exists(
                 str(request.user.id),
                 request.data.get('view_name')
@@ -93,7 +143,22 @@ class CreateMaterializedViewAPIView(APIView):
         view_name = request.data.get('view_name')
         sql_query_request = request.data.get('sql_query')
 
+        refresh_mode = request.data.get(
+            'refresh_mode',
+            models.EnumRefreshModes.CONCURRENT
+        )
+        unique_key = request.data.get('unique_key')
+
         with core_utils.PostgreSQLCursor(db_schema=request.user.id) as (psql_conn, psql_cursor):
+            plan = views_utils.explain_query(psql_cursor, sql_query_request)
+            budget = views_utils.cost_budget(request.user)
+            if plan['Total Cost'] > budget:
+                psql_conn.rollback()
+                return Response(
+                    f'Estimated query cost {plan["Total Cost"]} exceeds cost budget {budget}. Plan: {str(views_utils.plan_shape(plan))}',
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
             sql_statement = sql.SQL(
                 'CREATE MATERIALIZED VIEW {view_name} AS %s WITH DATA'
             ).format(
@@ -102,21 +167,337 @@ class CreateMaterializedViewAPIView(APIView):
             sql_statement = sql_statement.as_string(psql_conn)
             sql_statement = sql_statement % sql_query_request
 
+            create_started = time.monotonic()
             psql_cursor.execute(
                 sql.SQL(sql_statement)
             )
+            create_duration = 1000 * (time.monotonic() - create_started)
+
+            # NOTE: The view and its unique index are committed together, so
+            # a view is never left without the index its refreshes rely on.
+            if refresh_mode == models.EnumRefreshModes.CONCURRENT:
+                if unique_key is None:
+                    unique_key = views_utils.infer_unique_key(
+                        psql_cursor,
+                        view_name,
+                        sql_query_request
+                    )
+                else:
+                    column_names = [
+                        column_name
+                        for (column_name, indexable)
+                        in views_utils.view_columns(psql_cursor, view_name)
+                    ]
+                    unknown_columns = [
+                        column_name
+                        for column_name
+                        in unique_key
+                        if column_name not in column_names
+                    ]
+                    if unknown_columns:
+                        psql_conn.rollback()
+                        return Response(
+                            f'Unique key references unknown columns: {str(unknown_columns)}',
+                            status=status.HTTP_400_BAD_REQUEST
+                        )
+
+            if refresh_mode == models.EnumRefreshModes.CONCURRENT and unique_key:
+                try:
+                    psql_cursor.execute(
+                        table_ingest.create_index_sql(
+                            view_name,
+                            table_ingest.IndexDefinition(unique_key, 'btree', True)
+                        )
+                    )
+                except (psycopg2.IntegrityError, psycopg2.ProgrammingError) as e:
+                    psql_conn.rollback()
+                    return Response(
+                        f'Could not build unique index on {str(unique_key)}: {str(e)}',
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+            else:
+                refresh_mode = models.EnumRefreshModes.STANDARD
+                unique_key = []
+
+            relations = views_dependencies.relation_dependencies(
+                psql_cursor,
+                view_name
+            )
             psql_conn.commit()
 
             view_serializer = serializers.MaterializedViewSerializer(
                 data={
                     'view_name': view_name,
-                    'user': request.user.id
+                    'user': request.user.id,
+                    'unique_key': unique_key,
+                    'refresh_mode': refresh_mode,
+                    'estimated_cost': plan['Total Cost'],
+                    'estimated_rows': plan['Plan Rows'],
+                    'plan': views_utils.plan_shape(plan),
+                    'last_refresh_duration': create_duration
                 }
             )
             if view_serializer.is_valid():
-                view_serializer.save()
+                views_dependencies.record_dependencies(
+                    view_serializer.save(),
+                    relations
+                )
 
         return Response(
             view_serializer.data,
             status=status.HTTP_201_CREATED
         )
+
+
+class CreateIncrementalViewAPIView(APIView):
+    """
+    Handles creating incrementally maintained views via API.
+    """
+
+    def post(self, request, *args, **kwargs):
+        """
+        Handles the HTTP POST request.
+
+        Creates a result table computed from an aggregate or filter over one
+        append-only table, recorded as a materialized view with
+        '"refresh_mode": "INCREMENTAL"'. Jobs created for it with
+        'jobs/create/' merge only the rows appended to the source table since
+        the previous refresh, tracked by a high-water mark on
+        '"watermark_column"', instead of recomputing the whole view. Unless
+        the source table already has a B-tree or BRIN index led by that
+        column, one is built in the same transaction as the result table, so
+        that refreshes only read the appended rows. See 'views/incremental.py'
+        for the definition contract and its caveats.
+
+        Example:
+
+        - curl \
+            --header "Content-Type: application/json" \
+            --header "Authorization: JWT $JWT_ACCESS_TOKEN" \
+            --method POST \
+            --data '{"view_name": "sales_by_region", "definition": {"source_table": "orders", "watermark_column": "id", "group_by": ["region"], "aggregates": [{"function": "sum", "column": "amount", "name": "total_amount"}, {"function": "count", "name": "order_count"}], "filters": ["status:eq:paid"]}}' \
+            https://api.tinydevcrm.com/views/create/incremental/
+        """
+        def _validate(request):
+            """
+            Validates request.
+
+            Args:
+                rest_framework.request.Request
+
+            Returns:
+                (bool, dict): (Request is valid, reasons)
+            """
+            checks = {
+                'all_required_keys_are_present': True,
+                'source_table_exists': True,
+                'view_does_not_exist': True
+            }
+
+            definition_data = request.data.get('definition')
+            if (
+                not request.data.get('view_name') or
+                type(definition_data) is not dict or
+                not definition_data.get('source_table')
+            ):
+                checks['all_required_keys_are_present'] = False
+                return (all(checks.values()), checks)
+
+            checks['source_table_exists'] = table_utils.table_exists(
+                str(request.user.id),
+                definition_data.get('source_table')
+            )
+
+            checks['view_does_not_exist'] = not (
+                views_utils.materialized_view_exists(
+                    str(request.user.id),
+                    request.data.get('view_name')
+                ) or
+                table_utils.table_exists(
+                    str(request.user.id),
+                    request.data.get('view_name')
+                )
+            )
+
+            return (all(checks.values()), checks)
+
+        (is_valid_request, validation_checks) = _validate(request)
+
+        if not is_valid_request:
+            return Response(
+                f'Request did not pass validation. Checks: {str(validation_checks)}',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        view_name = request.data.get('view_name')
+        definition_data = request.data.get('definition')
+
+        try:
+            source_columns = table_ingest.parse_columns(
+                table_utils.table_columns(
+                    str(request.user.id),
+                    definition_data['source_table']
+                )
+            )
+            definition = views_incremental.parse_definition(
+                definition_data,
+                source_columns
+            )
+        except (ValueError, psycopg2.Error) as e:
+            return Response(
+                f'Incremental definition is not valid: {str(e)}',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        column_names = [column.column_name for column in source_columns]
+        # Filter views keep the columns the source had when they were created,
+        # even if more are added to it later.
+        if not definition.group_by:
+            definition = definition._replace(
+                columns=views_incremental.output_columns(definition, column_names)
+            )
+            definition_data = dict(definition_data, columns=definition.columns)
+        watermark_type = [
+            column.column_type
+            for column
+            in source_columns
+            if column.column_name == definition.watermark_column
+        ][0]
+
+        # The high-water mark row must be committed before the first refresh,
+        # which locks and advances it from its own connection.
+        with transaction.atomic():
+            view = models.MaterializedView.objects.create(
+                view_name=view_name,
+                user=request.user,
+                unique_key=definition.group_by,
+                refresh_mode=models.EnumRefreshModes.INCREMENTAL,
+                definition=definition_data
+            )
+            source = models.IncrementalSource.objects.create(
+                view=view,
+                table_name=definition.source_table,
+                watermark_column=definition.watermark_column,
+                watermark_type=watermark_type
+            )
+
+        try:
+            with core_utils.PostgreSQLCursor(db_schema=request.user.id) as (psql_conn, psql_cursor):
+                psql_cursor.execute(
+                    views_incremental.create_result_table_sql(
+                        request.user.id,
+                        view_name,
+                        definition,
+                        column_names
+                    )
+                )
+                if definition.group_by:
+                    psql_cursor.execute(
+                        table_ingest.create_index_sql(
+                            view_name,
+                            table_ingest.IndexDefinition(definition.group_by, 'btree', True)
+                        )
+                    )
+                if not views_incremental.has_watermark_index(psql_cursor, definition):
+                    psql_cursor.execute(
+                        views_incremental.watermark_index_sql(definition)
+                    )
+                # The first refresh starts from an empty high-water mark, and
+                # so computes the whole view.
+                psql_cursor.execute(
+                    views_incremental.refresh_sql(
+                        request.user.id,
+                        view_name,
+                        definition,
+                        column_names,
+                        source
+                    )
+                )
+                psql_conn.commit()
+        except psycopg2.Error as e:
+            source.delete()
+            view.delete()
+            return Response(
+                f'Could not create incremental view: {str(e)}',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        views_dependencies.record_dependencies(
+            view,
+            [(str(request.user.id), definition.source_table)]
+        )
+
+        source.refresh_from_db()
+        response_data = dict(serializers.MaterializedViewSerializer(view).data)
+        response_data['incremental_sources'] = [
+            serializers.IncrementalSourceSerializer(source).data
+        ]
+
+        return Response(
+            response_data,
+            status=status.HTTP_201_CREATED
+        )
+
+
+class ViewDependenciesAPIView(APIView):
+    """
+    Handles reading the dependency graph of a view via API.
+    """
+
+    def get(self, request, *args, **kwargs):
+        """
+        Handles the HTTP GET request.
+
+        Returns the relations a view selects from ('upstream'), the views that
+        select from it ('downstream'), and the order in which a pipeline
+        refresh of the view refreshes it and every view it depends on
+        ('refresh_order'). See 'views/dependencies.py'.
+
+        Example:
+
+        - curl \
+            --header "Authorization: JWT $JWT_ACCESS_TOKEN" \
+            --method GET \
+            "https://api.tinydevcrm.com/views/dependencies/?view_name=sample_view"
+        """
+        view = models.MaterializedView.objects.filter(
+            user=request.user.id,
+            view_name=request.query_params.get('view_name')
+        ).first()
+        if view is None:
+            return Response(
+                f'Materialized view {request.query_params.get("view_name")} does not exist.',
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        view_names = dict(
+            models.MaterializedView.objects.filter(
+                user=request.user.id
+            ).values_list('id', 'view_name')
+        )
+        try:
+            refresh_order = [
+                view_names[view_id]
+                for view_id
+                in views_dependencies.topological_order(
+                    views_dependencies.upstream_graph(view)
+                )
+            ]
+        except ValueError as e:
+            refresh_order = None
+
+        return Response(
+            {
+                'view_name': view.view_name,
+                'upstream': serializers.ViewDependencySerializer(
+                    view.dependencies.all(),
+                    many=True
+                ).data,
+                'downstream': sorted(set(
+                    models.ViewDependency.objects.filter(
+                        upstream=view
+                    ).values_list('view__view_name', flat=True)
+                )),
+                'refresh_order': refresh_order
+            },
+            status=status.HTTP_200_OK
+        )
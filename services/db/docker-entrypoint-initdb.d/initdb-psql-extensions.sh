@@ -30,3 +30,9 @@ CREATE EXTENSION IF NOT EXISTS parquet_fdw;
 CREATE SERVER parquet_srv FOREIGN DATA WRAPPER parquet_fdw;
 CREATE USER MAPPING FOR $PGUSER SERVER parquet_srv OPTIONS (user '$PGUSER');
 EOSQL
+
+# Create the 'btree_gin' PostgreSQL extension, so that GIN indexes can be built
+# on scalar columns via the tables service index API.
+PGPASSWORD=$POSTGRES_PASSWORD psql -U $POSTGRES_USER -d $POSTGRES_DB <<- EOSQL
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+EOSQL